@@ -0,0 +1,142 @@
+"""
+Managed process pool for mesh analysis.
+
+Heavy analysis jobs run in pre-warmed worker processes so they never block
+the event loop. Small uncompressed STL files are analyzed on a thread of
+this process, where dispatch to a worker would cost more than the analysis
+itself; their work is bounded by the file size. Compressed and archived
+files (.gz, .zst, .3mf) and OBJ always go to the pool, however small: a few
+kilobytes on disk can expand to gigabytes.
+
+Every job has a timeout. A pool job enforces it itself: an interval timer
+in the worker raises TimeoutError in the job, so only that job stops and
+the worker stays warm for the next one. A caller that times out (or goes
+away) cancels its job if it is still queued and otherwise just stops
+waiting. The pool is only replaced, and warmed again, when it is broken
+(a worker died). A thread cannot be stopped, so a timed-out inline job only
+stops waiting.
+
+Configuration (environment):
+    ANALYSIS_WORKERS           number of worker processes (default: CPU count - 1)
+    ANALYSIS_INLINE_MAX_BYTES  STL files up to this size are analyzed inline (default: 2 MB)
+    ANALYSIS_TIMEOUT           per-job timeout in seconds (default: 120)
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+INLINE_MAX_BYTES = int(os.environ.get('ANALYSIS_INLINE_MAX_BYTES', 2 * 1024 * 1024))
+ANALYSIS_TIMEOUT = float(os.environ.get('ANALYSIS_TIMEOUT', 120))
+# Formats whose work is proportional to the size on disk
+INLINE_EXTENSIONS = ('.stl',)
+
+_executor = None
+_workers = 0
+
+
+def _warm_worker():
+    """Import the numeric stack once per worker instead of once per job"""
+    import numpy  # noqa: F401
+    import stl  # noqa: F401
+    import mesh_analysis  # noqa: F401
+    import mesh_slicing  # noqa: F401
+    import mesh_integrity  # noqa: F401
+    import mesh_preview  # noqa: F401
+    import mesh_thumbnail  # noqa: F401
+    import mesh_orientation  # noqa: F401
+
+
+def _ping():
+    return os.getpid()
+
+
+def _run_timed(timeout: float, func, *args):
+    """Worker side: run func(*args), raising TimeoutError inside it once `timeout` seconds have passed"""
+    def expire(signum, frame):
+        raise TimeoutError(f"Analysis took longer than {timeout:g} s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _create_executor(workers: int) -> ProcessPoolExecutor:
+    # spawn: forking a process that already runs motor/uvicorn threads is unsafe
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_warm_worker,
+    )
+
+
+async def _warm(executor: ProcessPoolExecutor, workers: int):
+    await asyncio.gather(*[asyncio.wrap_future(executor.submit(_ping)) for _ in range(workers)])
+
+
+async def start(workers: int = None):
+    """Start the pool and wait until every worker has finished warming up"""
+    global _executor, _workers
+    if _executor is not None:
+        return
+    _workers = workers or ANALYSIS_WORKERS
+    _executor = _create_executor(_workers)
+    await _warm(_executor, _workers)
+
+
+async def shutdown():
+    global _executor
+    if _executor is not None:
+        executor, _executor = _executor, None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def runs_inline(file_path: str) -> bool:
+    """Small uncompressed STL: analyzed on a thread instead of a worker process"""
+    return (str(file_path).lower().endswith(INLINE_EXTENSIONS)
+            and os.path.getsize(file_path) <= INLINE_MAX_BYTES)
+
+
+async def _replace_broken(executor: ProcessPoolExecutor):
+    """Replace a broken pool with a new, warmed one (once, however many jobs saw it break)"""
+    global _executor
+    if executor is not _executor:
+        return
+    _executor = _create_executor(_workers)
+    executor.shutdown(wait=False, cancel_futures=True)
+    await _warm(_executor, _workers)
+
+
+async def run_analysis(func, file_path: str, *args, timeout: float = None):
+    """
+    Run func(file_path, *args) inline or in the pool depending on file type and size
+    Args:
+        func: Module-level (picklable) analysis function
+        file_path: Path to the mesh file; its type and size decide where the job runs
+        timeout: Seconds the job may run (default: ANALYSIS_TIMEOUT)
+    Raises:
+        asyncio.TimeoutError / TimeoutError if the job did not finish in time
+    """
+    timeout = timeout or ANALYSIS_TIMEOUT
+    if _executor is None or runs_inline(file_path):
+        # Small STL, or the pool is not started (e.g. scripts): a thread keeps the event loop free
+        return await asyncio.wait_for(asyncio.to_thread(func, file_path, *args), timeout)
+
+    for attempt in range(2):
+        executor = _executor
+        future = executor.submit(_run_timed, timeout, func, file_path, *args)
+        try:
+            # Queued time counts too; a job still queued by then is cancelled with the wait
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory): every job of that pool fails, retry once
+            await _replace_broken(executor)
+            if attempt:
+                raise
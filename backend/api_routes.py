@@ -1,14 +1,35 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Request, Header
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, ValidationError
+from typing import Any, List, Optional
 from datetime import datetime
 import os
+import shutil
 import hashlib
-import aiofiles
+import uuid
 from pathlib import Path
 from bson import ObjectId
-from stl import mesh
 import numpy as np
+from mesh_analysis import (is_analyzable, UPLOAD_EXTENSIONS, ANALYSIS_VERSION,
+                           analyze_mesh, fingerprints_match, rebase_stats)
+from mesh_slicing import analyze_with_layers, complete_analysis
+from mesh_orientation import orient_mesh
+from mesh_integrity import describe_problems
+from mesh_preview import write_preview
+from mesh_thumbnail import write_thumbnail
+from plate_packing import plan_plates
+from print_scheduler import scheduler, PRINTING_STATUS, QUEUED_STATUSES, SCHEDULED_STATUSES
+import analysis_pool
+from mesh_cache import mesh_cache
+import pricing
+from pricing_snapshot import pricing_store
+from pricing_simulation import order_columns, simulate
+from order_repricing import order_repricer
+from upload_ingest import receive_form, inspect_file, extract_archive, UploadRejected, MAX_ORDER_PARTS
+import resumable_uploads
+import mesh_tokens
+import asyncio
 
 # This will be set by server.py
 db = None
@@ -16,6 +37,13 @@ db = None
 def set_db(database):
     global db
     db = database
+    mesh_cache.set_db(database)
+    resumable_uploads.set_db(database, UPLOAD_DIR)
+    mesh_tokens.set_db(database)
+    scheduler.set_db(database)
+    pricing_store.set_db(database)
+    order_columns.set_db(database)
+    order_repricer.set_db(database)
 
 router = APIRouter()
 
@@ -40,6 +68,7 @@ async def get_materials():
 @router.post("/api/materials", response_model=MaterialResponse)
 async def create_material(material: Material):
     result = await db.materials.insert_one(material.dict())
+    await pricing_store.reload()
     return MaterialResponse(id=str(result.inserted_id), **material.dict())
 
 @router.put("/api/materials/{material_id}", response_model=MaterialResponse)
@@ -47,6 +76,9 @@ async def update_material(material_id: str, material: Material):
     result = await db.materials.update_one({"_id": ObjectId(material_id)}, {"$set": material.dict()})
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Material not found")
+    await pricing_store.reload()
+    # Open orders of this material get its new price in the background
+    order_repricer.schedule([material_id])
     return MaterialResponse(id=material_id, **material.dict())
 
 @router.delete("/api/materials/{material_id}")
@@ -54,6 +86,7 @@ async def delete_material(material_id: str):
     result = await db.materials.delete_one({"_id": ObjectId(material_id)})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Material not found")
+    await pricing_store.reload()
     return {"message": "Material deleted"}
 
 # ============ GALLERY ============
@@ -167,150 +200,336 @@ async def get_contact_info():
 # ============ ORDERS ============
 UPLOAD_DIR = Path("/app/backend/uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
+# Parts listed one by one in the Telegram notification of a multi-part order
+PART_LINES_IN_MESSAGE = 8
 
-def calculate_stl_volume_and_weight(file_path: str, material_density: float = 1.24) -> dict:
+async def get_mesh_stats(file_path: str, file_hash: Optional[str] = None,
+                         file_name: Optional[str] = None) -> dict:
+    """Geometry stats for a mesh file, served from the analysis cache when possible"""
+    cached = await mesh_cache.get(file_hash) if file_hash else None
+    if cached and cached['stats'].get('version', 1) >= ANALYSIS_VERSION:
+        return dict(cached['stats'])
+    
+    if file_hash and not cached:
+        # The fused pass yields the fingerprint with the stats. A re-exported copy (other format,
+        # triangle order or position) of an analyzed model reuses the rest of its analysis
+        stats = await analysis_pool.run_analysis(analyze_mesh, file_path)
+        match = await find_same_geometry(stats['fingerprint'])
+        if match:
+            source_hash, source = match
+            stats = rebase_stats(source['stats'], stats['fingerprint'])
+            await mesh_cache.put(file_hash, {"stats": stats, "fileUrl": file_path, "fileName": file_name,
+                                             "sameGeometryAs": source_hash})
+            share_mesh_artifacts(source_hash, file_hash)
+            return dict(stats)
+        # Layer profile and integrity passes; large files run in the analysis pool
+        stats = await analysis_pool.run_analysis(complete_analysis, file_path, stats)
+    else:
+        # Streaming passes over the mesh (stats, then layer profile); large files run in the analysis pool
+        stats = await analysis_pool.run_analysis(analyze_with_layers, file_path)
+    if cached:
+        # Analyzed by an older version: refresh the entry with the current fields
+        await mesh_cache.update(file_hash, {"stats": stats})
+    elif file_hash:
+        await mesh_cache.put(file_hash, {"stats": stats, "fileUrl": file_path, "fileName": file_name})
+    return dict(stats)
+
+async def find_same_geometry(fingerprint: Optional[dict]):
+    """(file hash, cache entry) of an analyzed mesh with a matching fingerprint, or None"""
+    if not fingerprint:
+        return None
+    for digest, entry in await mesh_cache.fingerprint_candidates(fingerprint['triangles']):
+        stats = entry['stats']
+        if (stats.get('version', 1) >= ANALYSIS_VERSION
+                and fingerprints_match(stats.get('fingerprint'), fingerprint)):
+            return digest, entry
+    return None
+
+def upload_path(file_name: str) -> Path:
+    # Unique even for the same file name uploaded within the same second
+    return UPLOAD_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}_{file_name}"
+
+async def receive_upload(request: Request, file_error, max_files: int = 1):
+    """
+    Stream a multipart upload to UPLOAD_DIR while it is received
+    Args:
+        file_error: callable(file name) -> error message for a refused file, or None
+    Returns:
+        (form fields, [(file_path, file name, sha256 hex digest)])
+    """
+    def file_path_for(file_name: str) -> Path:
+        error = file_error(file_name)
+        if error:
+            raise UploadRejected(error)
+        return upload_path(file_name)
+
+    try:
+        # Single pass: body pieces go to disk, the hash and the STL header check
+        fields, files = await receive_form(request, file_path_for, max_files=max_files)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return fields, [(Path(f['path']), f['fileName'], f['sha256']) for f in files]
+
+def remove_files(paths):
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+def model_file_error(file_name: str) -> Optional[str]:
+    if not file_name.lower().endswith(UPLOAD_EXTENSIONS):
+        return "Only STL, OBJ and 3MF files supported (STL may be .gz/.zst compressed)"
+    return None
+
+async def calculate_stl_volume_and_weight(file_path: str, material_density: float = 1.24,
+                                          file_hash: Optional[str] = None,
+                                          file_name: Optional[str] = None) -> dict:
     """
     Calculate volume and weight from STL file
     Args:
         file_path: Path to STL file
         material_density: Material density in g/cm³ (default PLA: 1.24)
+        file_hash: SHA-256 of the file, used as the analysis cache key
+        file_name: Original file name, kept with the cache entry
     Returns:
-        dict with volume_cm3, weight_g, dimensions
+        dict with volume_cm3, weight_g (solid), dimensions, layers and the mesh_analysis stats
     """
     try:
-        # Load STL file
-        stl_mesh = mesh.Mesh.from_file(file_path)
-        
-        # Calculate volume using mesh method (in cubic units from STL file)
-        volume, cog, inertia = stl_mesh.get_mass_properties()
-        
-        # Convert from mm³ to cm³ (assuming STL is in mm)
-        volume_cm3 = volume / 1000
-        
-        # Calculate weight in grams
-        weight_g = volume_cm3 * material_density
-        
-        # Get bounding box dimensions
-        mins = stl_mesh.vectors.reshape(-1, 3).min(axis=0)
-        maxs = stl_mesh.vectors.reshape(-1, 3).max(axis=0)
-        dimensions = {
-            'x': float(maxs[0] - mins[0]),
-            'y': float(maxs[1] - mins[1]),
-            'z': float(maxs[2] - mins[2])
-        }
+        stats = await get_mesh_stats(file_path, file_hash, file_name)
         
-        return {
-            'volume_cm3': float(volume_cm3),
-            'weight_g': float(weight_g),
-            'dimensions': dimensions
-        }
+        # Calculate weight in grams (STL units are mm)
+        stats['weight_g'] = stats['volume_cm3'] * material_density
+        return stats
     except Exception as e:
-        print(f"Error calculating STL properties: {e}")
+        print(f"Error calculating STL properties: {e!r}")
         return None
 
+def parse_float(value, default: float) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+class OrderForm(BaseModel):
+    """Order fields of an upload form"""
+    materialId: Optional[str] = None
+    materialName: Optional[str] = None
+    materialColor: Optional[str] = None
+    operatorChoice: bool = False
+    purpose: Optional[str] = None
+    loads: Optional[str] = None
+    customerPhone: Optional[str] = None
+    customerName: Optional[str] = None
+    scale: Optional[str] = '1'
+    infill: Optional[str] = '20'
+    layerHeight: Optional[str] = '0.2'
+    clientPrice: Optional[str] = None
+    clientWeight: Optional[str] = None
+    clientTime: Optional[str] = None
+
+def parse_order_form(fields: dict, files: list) -> OrderForm:
+    """Validate the order fields; the uploaded files are removed if they are invalid"""
+    try:
+        return OrderForm(**fields)
+    except ValidationError as e:
+        remove_files(file_path for file_path, _, _ in files)
+        raise RequestValidationError(e.errors())
+
 @router.post("/api/orders/upload")
-async def upload_file(
-    file: UploadFile = File(...),
-    materialId: Optional[str] = Form(None),
-    materialName: Optional[str] = Form(None),
-    materialColor: Optional[str] = Form(None),
-    operatorChoice: bool = Form(False),
-    purpose: Optional[str] = Form(None),
-    loads: Optional[str] = Form(None),
-    customerPhone: Optional[str] = Form(None),
-    customerName: Optional[str] = Form(None),
-    scale: Optional[str] = Form('1'),
-    infill: Optional[str] = Form('20'),
-    layerHeight: Optional[str] = Form('0.2'),
-    clientPrice: Optional[str] = Form(None),
-    clientWeight: Optional[str] = Form(None),
-    clientTime: Optional[str] = Form(None)
+async def upload_file(request: Request):
+    """Multipart form: `file` (or `meshToken` from /api/quotes/analyze) and the OrderForm fields"""
+    fields, files = await receive_upload(request, model_file_error)
+    form = parse_order_form(fields, files)
+    meshToken = fields.get('meshToken')
+    if meshToken:
+        # File was already uploaded through /api/quotes/analyze
+        remove_files(file_path for file_path, _, _ in files)
+        file_hash, entry = await resolve_mesh_token(meshToken)
+        file_path = Path(entry['fileUrl'])
+        file_name = entry.get('fileName') or file_path.name
+    elif files:
+        file_path, file_name, file_hash = files[0]
+    else:
+        raise HTTPException(status_code=400, detail="Either file or meshToken is required")
+    
+    return await create_order([(file_path, file_name, file_hash)], **form.dict())
+
+def part_file_error(file_name: str) -> Optional[str]:
+    if not file_name.lower().endswith(UPLOAD_EXTENSIONS + ('.zip',)):
+        return f"{file_name}: only STL, OBJ, 3MF and ZIP files supported"
+    return None
+
+@router.post("/api/orders/upload-parts")
+async def upload_parts(request: Request):
+    """
+    One order for an assembly: several model files and/or zip archives of them
+    Multipart form: `files` and the OrderForm fields (without clientWeight / clientTime)
+    """
+    fields, files = await receive_upload(request, part_file_error, max_files=MAX_ORDER_PARTS)
+    form = parse_order_form(fields, files)
+    if not files:
+        raise HTTPException(status_code=400, detail="At least one model file is required")
+    parts = []
+    archive_path = None
+    try:
+        for file_path, file_name, file_hash in files:
+            if file_name.lower().endswith('.zip'):
+                archive_path = file_path if len(files) == 1 else None
+                try:
+                    members = await asyncio.to_thread(extract_archive, file_path, str(file_path)[:-len('.zip')])
+                except UploadRejected as e:
+                    raise HTTPException(status_code=e.status_code, detail=e.detail)
+                finally:
+                    if not archive_path:
+                        os.remove(file_path)
+                parts += [(Path(m['path']), m['name'], m['sha256']) for m in members]
+            else:
+                parts.append((file_path, file_name, file_hash))
+            if len(parts) > MAX_ORDER_PARTS:
+                raise HTTPException(status_code=400, detail=f"Too many model files in one order (max {MAX_ORDER_PARTS})")
+    except BaseException:
+        remove_files([file_path for file_path, _, _ in files + parts] + [archive_path])
+        raise
+    
+    order_name = files[0][1] if len(files) == 1 and len(parts) > 1 else None
+    return await create_order(
+        parts, **form.dict(exclude={'clientWeight', 'clientTime'}),
+        orderName=order_name, archivePath=archive_path
+    )
+
+async def analyze_order_part(file_path: Path, file_name: str, file_hash: Optional[str],
+                             material_density: float, scale: Optional[str],
+                             infill: Optional[str], layerHeight: Optional[str]) -> dict:
+    """Weight, print time, supports, mesh integrity and thumbnail of one model file"""
+    part = {
+        "fileName": file_name,
+        "fileUrl": str(file_path),
+        "fileHash": file_hash,
+        "weight": None,
+        "printTime": None,
+        "supportWeight": None,
+        "meshIntegrity": None,
+        "thumbnailHash": None,
+        "dimensions": None,
+        "analysisVersion": None
+    }
+    if not is_analyzable(file_name):
+        return part
+    
+    stl_props = await calculate_stl_volume_and_weight(str(file_path), material_density, file_hash, file_name)
+    if stl_props:
+        # Shell + infill weight and path-length print time from the layer profile
+        part.update(pricing.part_estimates(
+            stl_props, material_density,
+            parse_float(scale, 1.0), parse_float(infill, 20), layerHeight
+        ))
+        part["meshIntegrity"] = stl_props.get('integrity')
+        part["dimensions"] = stl_props['dimensions']
+        part["analysisVersion"] = stl_props.get('version')
+        if file_hash and await ensure_thumbnail(file_hash, str(file_path), stl_props['bbox']):
+            part["thumbnailHash"] = file_hash
+    return part
+
+def total_of(parts: list, field: str):
+    values = [part[field] for part in parts if part[field] is not None]
+    return sum(values) if values else None
+
+async def create_order(
+    parts: list,
+    materialId: Optional[str] = None,
+    materialName: Optional[str] = None,
+    materialColor: Optional[str] = None,
+    operatorChoice: bool = False,
+    purpose: Optional[str] = None,
+    loads: Optional[str] = None,
+    customerPhone: Optional[str] = None,
+    customerName: Optional[str] = None,
+    scale: Optional[str] = '1',
+    infill: Optional[str] = '20',
+    layerHeight: Optional[str] = '0.2',
+    clientPrice: Optional[str] = None,
+    clientWeight: Optional[str] = None,
+    clientTime: Optional[str] = None,
+    orderName: Optional[str] = None,
+    archivePath: Optional[Path] = None
 ):
-    if not file.filename.lower().endswith(('.stl', '.obj')):
-        raise HTTPException(status_code=400, detail="Only STL and OBJ files supported")
+    """
+    Analyze the stored model files of an order, save it and notify Telegram
+    Args:
+        parts: (file_path, file_name, file_hash) of every model file; all parts
+               are analyzed concurrently on the analysis pool
+        orderName: Display name of a multi-part order (default: "N деталей")
+        archivePath: Uploaded zip the parts came from, sent to the operator on request
+    """
+    # One snapshot prices the whole order, even if settings change meanwhile
+    snapshot = pricing_store.snapshot
+    material = snapshot.material(materialId)
+    material_density = pricing.material_density(material)
     
-    file_path = UPLOAD_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-    async with aiofiles.open(file_path, 'wb') as out_file:
-        content = await file.read()
-        await out_file.write(content)
+    # Auto-calculate volume and weight of every part at once
+    part_results = await asyncio.gather(*[
+        analyze_order_part(file_path, file_name, file_hash, material_density, scale, infill, layerHeight)
+        for file_path, file_name, file_hash in parts
+    ])
     
-    # Auto-calculate volume and weight from STL
-    calculated_weight = None
-    calculated_time = None
-    estimated_cost = None
+    # Calculate cost if we have material
+    if material:
+        for part in part_results:
+            part["estimatedCost"] = (snapshot.order_cost(part["weight"], part["printTime"], material)
+                                     if part["weight"] is not None else None)
+    else:
+        for part in part_results:
+            part["estimatedCost"] = None
     
-    if file.filename.lower().endswith('.stl'):
-        # Get material density
-        material_density = 1.24  # Default PLA
-        material_type_from_db = 'PLA'
-        material = None  # Initialize material variable
-        
-        if materialId and len(materialId) == 24:  # Valid ObjectId
-            try:
-                material = await db.materials.find_one({"_id": ObjectId(materialId)})
-                if material:
-                    material_type_from_db = material.get('type', 'PLA')
-                    # Map material types to densities (g/cm³)
-                    density_map = {
-                        'PLA': 1.24,
-                        'ABS': 1.04,
-                        'PETG': 1.27,
-                        'TPU': 1.21,
-                        'Nylon': 1.14,
-                        'ASA': 1.07
-                    }
-                    material_density = density_map.get(material_type_from_db, 1.24)
-            except:
-                pass  # Use default density
-        
-        stl_props = calculate_stl_volume_and_weight(str(file_path), material_density)
-        
-        if stl_props:
-            calculated_weight = stl_props['weight_g']
-            # Estimate print time based on volume (rough estimate: 1cm³ = 5 minutes)
-            calculated_time = (stl_props['volume_cm3'] * 5) / 60  # Convert to hours
-            
-            # Calculate cost if we have material
-            if materialId and material:
-                settings = await db.print_settings.find_one()
-                if not settings:
-                    settings = {
-                        "electricityCost": 3.15,  # Lei per 1000 Watts
-                        "printerPower": 300,      # Watts
-                        "markup": 2,              # Multiplier
-                        "laborCost": 10           # Depreciation per hour
-                    }
-                
-                weight_kg = calculated_weight / 1000
-                material_cost = weight_kg * material.get('price', 290)
-                # Electricity: (Watts / 1000) * hours * rate
-                electricity_cost = (settings['printerPower'] / 1000) * calculated_time * settings['electricityCost']
-                depreciation_cost = calculated_time * settings['laborCost']
-                
-                subtotal = material_cost + electricity_cost + depreciation_cost
-                multiplier = settings['markup'] if settings['markup'] >= 1 else 2
-                estimated_cost = subtotal * multiplier
+    calculated_weight = total_of(part_results, "weight")
+    calculated_time = total_of(part_results, "printTime")
+    support_weight = total_of(part_results, "supportWeight")
+    estimated_cost = total_of(part_results, "estimatedCost")
     
-    order_data = {
-        "fileName": file.filename,
-        "fileUrl": str(file_path),
+    if len(part_results) == 1:
+        main = part_results[0]
+        order_data = dict(main)
+    else:
+        # Largest part stands for the whole order in lists and notifications
+        main = max(part_results, key=lambda part: part["weight"] or 0)
+        order_data = {
+            "fileName": orderName or f"{len(part_results)} деталей",
+            "fileUrl": str(archivePath) if archivePath else None,
+            "fileHash": None,
+            "weight": calculated_weight,
+            "printTime": calculated_time,
+            "supportWeight": support_weight,
+            "meshIntegrity": None,
+            "thumbnailHash": main["thumbnailHash"],
+            "dimensions": None,
+            "analysisVersion": min((part["analysisVersion"] or 0) for part in part_results),
+            "estimatedCost": estimated_cost,
+            "parts": part_results
+        }
+    file_name = order_data["fileName"]
+    thumbnail_hash = order_data["thumbnailHash"]
+    thumbnail_path = THUMBNAIL_DIR / f"{thumbnail_hash}.png" if thumbnail_hash else None
+    problems = [
+        (part["fileName"], describe_problems(part["meshIntegrity"]))
+        for part in part_results
+        if part["meshIntegrity"] and not part["meshIntegrity"]['ok']
+    ]
+    
+    order_data.update({
         "materialId": materialId,
         "materialName": materialName,
         "materialColor": materialColor,
         "operatorChoice": operatorChoice,
         "purpose": purpose,
         "loads": loads,
-        "weight": calculated_weight,
-        "printTime": calculated_time,
-        "estimatedCost": estimated_cost,
         "status": "pending",
         "uploadDate": datetime.utcnow(),
         "customerPhone": customerPhone,
         "customerName": customerName,
         "scale": scale,
         "infill": infill,
-        "layerHeight": layerHeight
-    }
+        "layerHeight": layerHeight,
+        "pricingVersion": snapshot.version
+    })
     
     result = await db.orders.insert_one(order_data)
     order_id = str(result.inserted_id)
@@ -324,58 +543,16 @@ async def upload_file(
         if TELEGRAM_TOKEN and TELEGRAM_CHAT_ID:
             bot = telegram.Bot(token=TELEGRAM_TOKEN)
             
-            # ===== НАСТРОЙКИ СЕБЕСТОИМОСТИ (как в таблице) =====
-            ELECTRICITY_COST_PER_KW = 20      # MDL за кВт в час
-            PRINTER_POWER_WATTS = 350          # Мощность принтера в ваттах
-            PRINTER_AMORTIZATION_PER_HOUR = 22 # Амортизация принтера MDL/час
-            MARKUP_COEFFICIENT = 1.3           # Наценка 30%
-            
-            # Цены материалов (MDL/кг)
-            MATERIAL_PRICES = {
-                'PLA': 290, 'PETG': 320, 'ABS': 300, 'TPU': 450, 'Nylon': 550
-            }
-            
-            # Скорость печати (г/час) по высоте слоя
-            PRINT_SPEEDS = {
-                '0.15': 15, '0.2': 25, '0.28': 35, '0.32': 45
-            }
-            
-            # Рассчитываем себестоимость для админа
-            plastic_cost = 0
-            electricity_cost = 0
-            amortization_cost = 0
+            # Себестоимость для админа по тем же настройкам, что и цена на сайте
             print_time_hours = 0
-            base_cost = 0
+            costs = None
             final_price = 0
             
             if calculated_weight:
-                # Получаем тип материала из названия или из БД
-                material_type = 'PLA'
-                if materialName:
-                    # Определяем тип из названия материала
-                    for mat_type in ['PETG', 'ABS', 'TPU', 'Nylon', 'PLA']:
-                        if mat_type.upper() in materialName.upper():
-                            material_type = mat_type
-                            break
-                
-                material_price = MATERIAL_PRICES.get(material_type, 290)
-                print_speed = PRINT_SPEEDS.get(layerHeight, 25)
-                
-                # Время печати
-                print_time_hours = calculated_weight / print_speed
-                
-                # Себестоимость пластика
-                plastic_cost = (calculated_weight / 1000) * material_price
-                
-                # Себестоимость электричества
-                electricity_cost = print_time_hours * (PRINTER_POWER_WATTS / 1000) * ELECTRICITY_COST_PER_KW
-                
-                # Амортизация
-                amortization_cost = print_time_hours * PRINTER_AMORTIZATION_PER_HOUR
-                
-                # Итого себестоимость
-                base_cost = plastic_cost + electricity_cost + amortization_cost
-                final_price = round(base_cost * MARKUP_COEFFICIENT)
+                print_time_hours = calculated_time or pricing.estimate_print_time(
+                    calculated_weight, pricing.print_speed(layerHeight))
+                costs = snapshot.cost(calculated_weight, print_time_hours, material)
+                final_price = round(float(costs['totalCost']))
             
             # Use client-side calculated price if provided (more accurate with infill)
             display_price = final_price
@@ -387,12 +564,13 @@ async def upload_file(
                     display_price = int(float(clientPrice))
                 except:
                     pass
-            if clientWeight:
+            # Client weight/time only when the server could not slice the model
+            if clientWeight and not calculated_weight:
                 try:
                     display_weight = float(clientWeight)
                 except:
                     pass
-            if clientTime:
+            if clientTime and not calculated_time:
                 try:
                     display_time = float(clientTime)
                 except:
@@ -400,7 +578,7 @@ async def upload_file(
             
             message = f"""🔔 <b>Новый заказ #{order_id}</b>
 
-📄 <b>Файл:</b> {file.filename}
+📄 <b>Файл:</b> {file_name}
 🎨 <b>Материал:</b> {materialName if materialName else 'Выбор оператора'}
 """
             if materialColor:
@@ -419,16 +597,28 @@ async def upload_file(
                 message += f"📋 <b>Назначение:</b> {purpose}\n"
             if loads:
                 message += f"📊 <b>Нагрузки:</b> {loads}\n"
+            if support_weight:
+                message += f"🧱 <b>Поддержки:</b> ~{round(support_weight, 1)}г (включены в вес)\n"
+            if len(part_results) > 1:
+                message += f"🧩 <b>Детали ({len(part_results)}):</b>\n"
+                for part in part_results[:PART_LINES_IN_MESSAGE]:
+                    details = f"{round(part['weight'], 1)}г, {round(part['printTime'], 1)}ч" if part['weight'] else "не рассчитано"
+                    message += f"  • {part['fileName']}: {details}\n"
+                if len(part_results) > PART_LINES_IN_MESSAGE:
+                    message += f"  … и ещё {len(part_results) - PART_LINES_IN_MESSAGE}\n"
+            for part_name, part_problems in problems:
+                where = f" ({part_name})" if len(part_results) > 1 else ""
+                message += f"⚠️ <b>Проблемы сетки{where}:</b> {', '.join(part_problems)}\n"
             
             # ===== СЕБЕСТОИМОСТЬ (ТОЛЬКО ДЛЯ АДМИНА) =====
-            if calculated_weight and plastic_cost > 0:
+            if costs and costs['materialCost'] > 0:
                 message += f"""
 ━━━━━━━━━━━━━━━━━━
 💵 <b>СЕБЕСТОИМОСТЬ:</b>
-🧵 Пластик: <code>{round(plastic_cost)} MDL</code>
-⚡ Электричество: <code>{round(electricity_cost)} MDL</code>
-🔧 Амортизация: <code>{round(amortization_cost)} MDL</code>
-📊 <b>Итого себест.:</b> <code>{round(base_cost)} MDL</code>
+🧵 Пластик: <code>{round(float(costs['materialCost']))} MDL</code>
+⚡ Электричество: <code>{round(float(costs['electricityCost']))} MDL</code>
+🔧 Амортизация: <code>{round(float(costs['laborCost']))} MDL</code>
+📊 <b>Итого себест.:</b> <code>{round(float(costs['subtotal']))} MDL</code>
 ━━━━━━━━━━━━━━━━━━"""
             
             # Show the price that client sees on the website
@@ -457,7 +647,7 @@ async def upload_file(
             
             # Add material selection buttons if operator choice
             if operatorChoice:
-                materials = await db.materials.find().to_list(10)
+                materials = snapshot.materials
                 mat_buttons = []
                 for mat in materials[:3]:  # Max 3 materials in one row
                     mat_buttons.append(
@@ -466,25 +656,146 @@ async def upload_file(
                 if mat_buttons:
                     keyboard.insert(1, mat_buttons)
             
+            if thumbnail_path or len(part_results) > 1:
+                # The model files themselves are sent only when the operator asks for them
+                keyboard.append([InlineKeyboardButton("📎 Файл модели", callback_data=f"sendfile_{order_id}")])
+            
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            with open(file_path, 'rb') as f:
-                await bot.send_document(
-                    chat_id=TELEGRAM_CHAT_ID, 
-                    document=f, 
-                    caption=message, 
-                    parse_mode='HTML',
-                    reply_markup=reply_markup
-                )
+            if thumbnail_path:
+                with open(thumbnail_path, 'rb') as f:
+                    await bot.send_photo(
+                        chat_id=TELEGRAM_CHAT_ID,
+                        photo=f,
+                        caption=message,
+                        parse_mode='HTML',
+                        reply_markup=reply_markup
+                    )
+            else:
+                with open(order_data['fileUrl'] or main['fileUrl'], 'rb') as f:
+                    await bot.send_document(
+                        chat_id=TELEGRAM_CHAT_ID, 
+                        document=f, 
+                        caption=message, 
+                        parse_mode='HTML',
+                        reply_markup=reply_markup
+                    )
     except Exception as e:
         print(f"Telegram error: {e}")
     
-    return {"success": True, "orderId": order_id, "message": "Файл загружен"}
+    response = {"success": True, "orderId": order_id, "message": "Файл загружен"}
+    if len(part_results) > 1:
+        response.update({
+            "parts": [
+                {field: part[field] for field in ("fileName", "weight", "printTime", "supportWeight", "estimatedCost")}
+                for part in part_results
+            ],
+            "weight": calculated_weight,
+            "printTime": calculated_time,
+            "estimatedCost": estimated_cost
+        })
+    return response
+
+# ============ RESUMABLE UPLOADS ============
+class UploadSessionCreate(BaseModel):
+    fileName: str
+    totalSize: int  # bytes
+    chunkSize: int = resumable_uploads.DEFAULT_CHUNK_BYTES
+
+class UploadFinalizeRequest(OrderForm):
+    """Order fields sent when a resumable upload is finalized"""
+
+def upload_session_status(session: dict) -> dict:
+    return {
+        "sessionId": session['_id'],
+        "fileName": session['fileName'],
+        "totalSize": session['totalSize'],
+        "chunkSize": session['chunkSize'],
+        "chunkCount": session['chunkCount'],
+        "receivedChunks": sorted(session['received']),
+        "missingChunks": resumable_uploads.missing_chunks(session),
+        "expiresAt": session['expiresAt'].isoformat()
+    }
+
+async def find_upload_session(session_id: str) -> dict:
+    session = await resumable_uploads.get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    return session
+
+@router.post("/api/uploads")
+async def create_upload_session(request: UploadSessionCreate):
+    """Start a resumable upload"""
+    if not request.fileName.lower().endswith(UPLOAD_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Only STL, OBJ and 3MF files supported (STL may be .gz/.zst compressed)")
+    try:
+        session = await resumable_uploads.create_session(request.fileName, request.totalSize, request.chunkSize)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return upload_session_status(session)
+
+@router.get("/api/uploads/{session_id}")
+async def get_upload_session(session_id: str):
+    """Which chunks the server already has"""
+    return upload_session_status(await find_upload_session(session_id))
+
+@router.put("/api/uploads/{session_id}/chunks/{index}")
+async def put_upload_chunk(session_id: str, index: int, request: Request,
+                           x_chunk_sha256: str = Header(...)):
+    """Store chunk `index` (raw body); X-Chunk-SHA256 is the hex digest of the body"""
+    session = await find_upload_session(session_id)
+    try:
+        await resumable_uploads.write_chunk(session, index, request.stream(), x_chunk_sha256)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return {"success": True, "index": index}
+
+@router.post("/api/uploads/{session_id}/finalize")
+async def finalize_upload_session(session_id: str, request: UploadFinalizeRequest):
+    """Assemble the file, analyze it and create the order"""
+    session = await resumable_uploads.begin_finalize(session_id)
+    if not session:
+        await find_upload_session(session_id)
+        raise HTTPException(status_code=409, detail="Upload is already being finalized")
+    missing = resumable_uploads.missing_chunks(session)
+    if missing:
+        await resumable_uploads.cancel_finalize(session_id)
+        raise HTTPException(status_code=409, detail={"message": "Upload incomplete", "missingChunks": missing})
+    
+    part_path = resumable_uploads.part_path(session_id)
+    try:
+        info = await asyncio.to_thread(inspect_file, part_path, session['fileName'])
+    except UploadRejected as e:
+        await resumable_uploads.remove_session(session_id)
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    file_path = upload_path(session['fileName'])
+    await resumable_uploads.complete_session(session, file_path)
+    return await create_order([(file_path, session['fileName'], info['sha256'])], **request.dict())
+
+@router.delete("/api/uploads/{session_id}")
+async def cancel_upload_session(session_id: str):
+    await find_upload_session(session_id)
+    await resumable_uploads.remove_session(session_id)
+    return {"message": "Upload session deleted"}
 
 @router.get("/api/orders")
 async def get_orders():
     orders = await db.orders.find().sort("uploadDate", -1).to_list(100)
-    return [{"id": str(o['_id']), "fileName": o['fileName'], "materialName": o.get('materialName'), "status": o['status'], "uploadDate": o['uploadDate'].isoformat()} for o in orders]
+    return [{"id": str(o['_id']), "fileName": o['fileName'], "materialName": o.get('materialName'), "status": o['status'],
+             "uploadDate": o['uploadDate'].isoformat(),
+             "thumbnailUrl": f"/api/orders/{o['_id']}/thumbnail" if o.get('thumbnailHash') else None} for o in orders]
+
+@router.get("/api/orders/{order_id}/thumbnail")
+async def get_order_thumbnail(order_id: str):
+    """Shaded PNG thumbnail of an order's (largest) part"""
+    if not ObjectId.is_valid(order_id):
+        raise HTTPException(status_code=404, detail="Order not found")
+    order = await db.orders.find_one({"_id": ObjectId(order_id)}, {"thumbnailHash": 1})
+    thumbnail_path = order and order.get('thumbnailHash') and THUMBNAIL_DIR / f"{order['thumbnailHash']}.png"
+    if not thumbnail_path or not thumbnail_path.exists():
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    return FileResponse(thumbnail_path, media_type="image/png", headers=IMMUTABLE_CACHE)
 
 @router.get("/api/orders/{order_id}/status")
 async def get_order_status(order_id: str):
@@ -503,7 +814,8 @@ async def get_order_status(order_id: str):
             "finalCost": order.get('finalCost'),
             "priceModifiedDate": order.get('priceModifiedDate').isoformat() if order.get('priceModifiedDate') else None,
             "approvedDate": order.get('approvedDate').isoformat() if order.get('approvedDate') else None,
-            "completedDate": order.get('completedDate').isoformat() if order.get('completedDate') else None
+            "completedDate": order.get('completedDate').isoformat() if order.get('completedDate') else None,
+            "eta": schedule_eta(order)
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -533,6 +845,7 @@ async def confirm_order_with_customer(order_id: str, data: ConfirmOrderData):
                 "orderedDate": datetime.utcnow()
             }}
         )
+        await reschedule()
         
         # Get order info
         order = await db.orders.find_one({"_id": ObjectId(order_id)})
@@ -631,6 +944,7 @@ async def telegram_webhook(update: TelegramUpdate):
                     {"_id": ObjectId(order_id)},
                     {"$set": {"status": "approved", "approvedDate": datetime.utcnow()}}
                 )
+                await reschedule()
                 
                 # Get order info
                 order = await db.orders.find_one({"_id": ObjectId(order_id)})
@@ -689,6 +1003,7 @@ async def telegram_webhook(update: TelegramUpdate):
                     {"_id": ObjectId(order_id)},
                     {"$set": {"status": "completed", "completedDate": datetime.utcnow()}}
                 )
+                await reschedule()
                 
                 # Get order details for SMS
                 order = await db.orders.find_one({"_id": ObjectId(order_id)})
@@ -711,6 +1026,38 @@ async def telegram_webhook(update: TelegramUpdate):
                          f"💡 Отправьте SMS клиенту о готовности заказа"
                 )
             
+            # Send the model file on request
+            elif callback_data.startswith('sendfile_'):
+                order_id = callback_data.replace('sendfile_', '')
+                order = await db.orders.find_one({"_id": ObjectId(order_id)})
+                
+                # The uploaded archive if there is one, else every part file
+                if order and order.get('fileUrl'):
+                    files = [(order['fileUrl'], order.get('fileName'))]
+                else:
+                    files = [(part['fileUrl'], part['fileName']) for part in (order or {}).get('parts', [])]
+                files = [(path, name) for path, name in files if os.path.exists(path)]
+                
+                if files:
+                    await bot.answer_callback_query(
+                        callback_query_id=callback_id,
+                        text="📎 Отправляю файл..."
+                    )
+                    for path, name in files:
+                        with open(path, 'rb') as f:
+                            await bot.send_document(
+                                chat_id=chat_id,
+                                document=f,
+                                filename=name,
+                                caption=f"📄 Файл заказа #{order_id}",
+                                reply_to_message_id=message_id
+                            )
+                else:
+                    await bot.answer_callback_query(
+                        callback_query_id=callback_id,
+                        text="❌ Файл не найден"
+                    )
+            
             # Select material (if operator choice)
             elif callback_data.startswith('selectmat_'):
                 parts = callback_data.replace('selectmat_', '').split('_')
@@ -796,12 +1143,7 @@ async def get_print_settings():
     settings = await db.print_settings.find_one()
     if not settings:
         # Default settings based on Excel formula
-        default = {
-            "electricityCost": 3.15,  # Lei per 1000 Watts (kWh tariff)
-            "printerPower": 300,      # 300 Watts
-            "markup": 2,              # Multiplier x2
-            "laborCost": 10           # 10 Lei depreciation per hour
-        }
+        default = dict(pricing.DEFAULT_SETTINGS)
         result = await db.print_settings.insert_one(default)
         return PrintSettingsResponse(id=str(result.inserted_id), **default)
     return PrintSettingsResponse(id=str(settings['_id']), **{k:v for k,v in settings.items() if k != '_id'})
@@ -811,10 +1153,43 @@ async def update_print_settings(settings: PrintSettings):
     existing = await db.print_settings.find_one()
     if existing:
         await db.print_settings.update_one({"_id": existing['_id']}, {"$set": settings.dict()})
-        return PrintSettingsResponse(id=str(existing['_id']), **settings.dict())
+        settings_id = existing['_id']
     else:
-        result = await db.print_settings.insert_one(settings.dict())
-        return PrintSettingsResponse(id=str(result.inserted_id), **settings.dict())
+        settings_id = (await db.print_settings.insert_one(settings.dict())).inserted_id
+    await pricing_store.reload()
+    order_repricer.schedule()
+    return PrintSettingsResponse(id=str(settings_id), **settings.dict())
+
+class SettingsCandidate(BaseModel):
+    electricityCost: Optional[float] = None
+    printerPower: Optional[float] = None
+    markup: Optional[float] = None
+    laborCost: Optional[float] = None
+
+class SimulateSettingsRequest(BaseModel):
+    candidates: List[SettingsCandidate]
+    statuses: Optional[List[str]] = None  # default: every order
+
+MAX_SIMULATION_CANDIDATES = 50
+
+@router.get("/api/orders/repricing")
+async def get_repricing_status():
+    """Progress of the background repricing of open orders"""
+    return order_repricer.status
+
+@router.post("/api/print-settings/simulate")
+async def simulate_print_settings(request: SimulateSettingsRequest):
+    """
+    Revenue of historic orders under candidate print settings compared with
+    the current ones: totals, per-material deltas and price distributions.
+    Fields a candidate leaves out keep their current value.
+    """
+    if not 1 <= len(request.candidates) <= MAX_SIMULATION_CANDIDATES:
+        raise HTTPException(status_code=400,
+                            detail=f"Between 1 and {MAX_SIMULATION_CANDIDATES} candidate settings allowed")
+    columns = await order_columns.refresh()
+    candidates = [candidate.dict(exclude_none=True) for candidate in request.candidates]
+    return simulate(columns, pricing_store.snapshot, candidates, request.statuses)
 
 # ============ COST CALCULATION ============
 class CalculateCostRequest(BaseModel):
@@ -830,55 +1205,495 @@ class CalculateCostResponse(BaseModel):
     markup: float
     totalCost: float
     currency: str
+    pricingVersion: str
 
 @router.post("/api/calculate-cost", response_model=CalculateCostResponse)
 async def calculate_cost(request: CalculateCostRequest):
-    # Get material
-    material = await db.materials.find_one({"_id": ObjectId(request.materialId)})
+    snapshot = pricing_store.snapshot
+    material = snapshot.material(request.materialId)
     if not material:
         raise HTTPException(status_code=404, detail="Material not found")
     
-    # Get print settings
-    settings = await db.print_settings.find_one()
-    if not settings:
-        settings = {
-            "electricityCost": 3.15,  # Lei per 1000 Watts
-            "printerPower": 300,      # Watts
-            "markup": 2,              # Multiplier
-            "laborCost": 10           # Depreciation per hour
-        }
-    
-    # Calculate costs according to Excel formula:
-    # Material cost = weight (kg) × price per kg
-    weight_kg = request.weight / 1000
-    material_cost = weight_kg * material['price']
+    # (material + electricity + depreciation) × markup, see pricing.cost_breakdown
+    costs = snapshot.cost(request.weight, request.printTime, material)
+    return CalculateCostResponse(
+        **{key: round(float(value), 2) for key, value in costs.items()},
+        currency="Lei",
+        pricingVersion=snapshot.version
+    )
+
+MAX_COST_BATCH_ITEMS = 10000
+
+class CalculateCostBatchRequest(BaseModel):
+    # Validated item by item, so one malformed item does not reject the batch
+    items: List[Any]
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'item'}: {e['msg']}" for e in error.errors())
+
+@router.post("/api/calculate-cost/batch")
+async def calculate_cost_batch(request: CalculateCostBatchRequest):
+    """
+    Cost breakdowns of many (materialId, weight, printTime) items, computed as
+    array operations. Results are in request order; an item that is malformed
+    or cannot be priced gets {index, error} instead of failing the whole batch.
+    """
+    if len(request.items) > MAX_COST_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Up to {MAX_COST_BATCH_ITEMS} items per batch allowed")
     
-    # Electricity cost = (printer power / 1000) × print time × electricity rate
-    # Formula: (Watts / 1000) * hours * (Lei per kWh)
-    electricity_cost = (settings['printerPower'] / 1000) * request.printTime * settings['electricityCost']
+    items = []
+    errors = {}
+    for index, raw in enumerate(request.items):
+        try:
+            items.append(CalculateCostRequest.model_validate(raw))
+        except ValidationError as e:
+            errors[index] = validation_message(e)
+            items.append(None)
     
-    # Depreciation/labor cost = print time × depreciation rate
-    depreciation_cost = request.printTime * settings['laborCost']
+    snapshot = pricing_store.snapshot
+    weight = np.array([item.weight if item else 0 for item in items], dtype=np.float64)
+    print_time = np.array([item.printTime if item else 0 for item in items], dtype=np.float64)
+    price = snapshot.material_prices([item.materialId if item else None for item in items])
+    known = ~np.isnan(price)
+    valid = np.isfinite(weight) & np.isfinite(print_time) & (weight >= 0) & (print_time >= 0)
+    ok = known & valid
     
-    # Subtotal (cost price)
-    subtotal = material_cost + electricity_cost + depreciation_cost
+    costs = pricing.cost_breakdown(np.where(ok, weight, 0), np.where(ok, print_time, 0), np.where(ok, price, 0),
+                                   snapshot.settings)
+    columns = {key: np.round(np.broadcast_to(value, weight.shape), 2).tolist() for key, value in costs.items()}
+    results = []
+    for index in range(len(items)):
+        if index in errors:
+            results.append({"index": index, "error": errors[index]})
+        elif not known[index]:
+            results.append({"index": index, "error": "Material not found"})
+        elif not valid[index]:
+            results.append({"index": index, "error": "Weight and print time must be non-negative numbers"})
+        else:
+            results.append({key: column[index] for key, column in columns.items()})
+    return {"results": results, "currency": "Lei", "pricingVersion": snapshot.version}
+
+
+# ============ QUOTES ============
+# A mesh token is an opaque handle (see mesh_tokens) for the SHA-256 of the uploaded file,
+# the key of its analysis cache entry
+async def resolve_mesh_token(mesh_token: str, require_file: bool = True) -> tuple:
+    """(file digest, analysis cache entry) of a mesh token"""
+    file_hash = await mesh_tokens.resolve(mesh_token)
+    if file_hash:
+        # Tokens from /api/quotes/preview are handed out before the analysis is done
+        await finish_analysis(file_hash)
+    entry = await mesh_cache.get(file_hash) if file_hash else None
+    if not entry or (require_file and not os.path.exists(entry.get('fileUrl') or '')):
+        raise HTTPException(status_code=404, detail="Mesh token expired, please upload the file again")
+    return file_hash, entry
+
+def analyzable_file_error(file_name: str) -> Optional[str]:
+    if not is_analyzable(file_name):
+        return "Only STL, OBJ and 3MF files supported (STL may be .gz/.zst compressed)"
+    return None
+
+async def adopt_quote_file(file_path: Path, file_name: str, file_hash: str):
+    """Keep one stored copy per content; returns the stored file and its cache entry (None if not analyzed)"""
+    cached = await mesh_cache.get(file_hash)
+    if cached and os.path.exists(cached.get('fileUrl') or ''):
+        # Identical bytes are already stored
+        if cached['fileUrl'] != str(file_path):
+            os.remove(file_path)
+        return Path(cached['fileUrl']), cached
+    if cached:
+        await mesh_cache.update(file_hash, {"fileUrl": str(file_path), "fileName": file_name})
+    return file_path, cached
+
+# Analyses of uploaded quote files while they run: file digest -> (file, task)
+pending_analyses = {}
+
+def start_analysis(file_path: Path, file_name: str, file_hash: str) -> asyncio.Task:
+    """Analyze a new quote file in the background; the file is removed if it cannot be analyzed"""
+    if file_hash in pending_analyses:
+        # The same bytes are being analyzed from an earlier upload
+        analyzed_path, task = pending_analyses[file_hash]
+        if analyzed_path != file_path:
+            file_path.unlink(missing_ok=True)
+        return task
+    async def run():
+        try:
+            return await get_mesh_stats(str(file_path), file_hash, file_name)
+        except Exception:
+            file_path.unlink(missing_ok=True)
+            raise
+        finally:
+            pending_analyses.pop(file_hash, None)
+    task = asyncio.create_task(run())
+    pending_analyses[file_hash] = (file_path, task)
+    # Failures are reported to whoever uses the mesh token; do not log them as unretrieved
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+    return task
+
+async def finish_analysis(file_hash: str):
+    """Wait for a running analysis of this digest, if any"""
+    if file_hash in pending_analyses:
+        _, task = pending_analyses[file_hash]
+        try:
+            # Shielded: a client that disconnects must not cancel the analysis for others
+            await asyncio.shield(task)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Could not analyze model: {e}")
+
+@router.post("/api/quotes/analyze")
+async def analyze_quote(request: Request):
+    """Analyze a model once and return a token for re-pricing and ordering (multipart form: `file`)"""
+    _, files = await receive_upload(request, analyzable_file_error)
+    if not files:
+        raise HTTPException(status_code=400, detail="File is required")
+    file_path, file_name, file_hash = files[0]
+    file_path, cached = await adopt_quote_file(file_path, file_name, file_hash)
+    if not cached:
+        start_analysis(file_path, file_name, file_hash)
+    await finish_analysis(file_hash)
     
-    # Final price = subtotal × multiplier
-    multiplier = settings['markup'] if settings['markup'] >= 1 else 2
-    total_cost = subtotal * multiplier
+    entry = await mesh_cache.get(file_hash)
+    # Refreshes entries analyzed by an older version
+    stats = await get_mesh_stats(entry['fileUrl'], file_hash)
+    return {
+        "meshToken": await mesh_tokens.issue(file_hash),
+        "fileName": file_name,
+        "triangles": stats['triangles'],
+        "volume": round(stats['volume_cm3'], 3),
+        "area": round(stats['area_mm2'] / 100, 2),
+        "dimensions": {axis: round(size, 2) for axis, size in stats['dimensions'].items()},
+        "integrity": stats.get('integrity')
+    }
+
+@router.post("/api/quotes/preview")
+async def preview_quote(request: Request):
+    """
+    Store a model and build its preview mesh; returns its token as soon as the
+    preview is ready (GET /api/mesh/{token}/preview) while the analysis goes on
+    in the background (multipart form: `file`)
+    """
+    _, files = await receive_upload(request, analyzable_file_error)
+    if not files:
+        raise HTTPException(status_code=400, detail="File is required")
+    file_path, file_name, file_hash = files[0]
+    file_path, cached = await adopt_quote_file(file_path, file_name, file_hash)
+    preview_path = PREVIEW_DIR / f"{file_hash}.spv"
+    if not preview_path.exists():
+        try:
+            await analysis_pool.run_analysis(write_preview, str(file_path), str(preview_path),
+                                             cached and cached['stats']['bbox'])
+        except Exception as e:
+            if not cached and file_hash not in pending_analyses:
+                file_path.unlink(missing_ok=True)
+            raise HTTPException(status_code=400, detail=f"Could not read model: {e}")
+    if not cached:
+        start_analysis(file_path, file_name, file_hash)
+    return {"meshToken": await mesh_tokens.issue(file_hash), "fileName": file_name}
+
+class QuotePriceRequest(BaseModel):
+    meshToken: str
+    materialId: Optional[str] = None
+    scale: float = 1
+    infill: float = 20
+    layerHeight: str = '0.2'
+
+@router.post("/api/quotes/price")
+async def price_quote(request: QuotePriceRequest):
+    """Re-price an analyzed mesh for new material / scale / infill / layer height"""
+    _, entry = await resolve_mesh_token(request.meshToken, require_file=False)
+    snapshot = pricing_store.snapshot
+    result = snapshot.quote(entry['stats'], snapshot.material(request.materialId),
+                            request.scale, request.infill, request.layerHeight)
+    return {"meshToken": request.meshToken, "materialId": request.materialId, **result}
+
+class QuoteMatrixRequest(BaseModel):
+    meshToken: str
+    scales: Optional[List[float]] = None
+
+@router.post("/api/quotes/matrix")
+async def quote_matrix(request: QuoteMatrixRequest):
+    """
+    Prices for every material × infill × layer height × scale in one response.
+    Values are flat row-major arrays over `shape` (axes in `axes` order), so
+    index = ((m * infills + i) * layerHeights + l) * scales + s
+    """
+    _, entry = await resolve_mesh_token(request.meshToken, require_file=False)
+    snapshot = pricing_store.snapshot
+    materials = snapshot.materials
+    scales = request.scales or pricing.MATRIX_SCALES
+    if not materials:
+        raise HTTPException(status_code=404, detail="No materials configured")
+    if len(scales) > 300 or min(scales) <= 0:
+        raise HTTPException(status_code=400, detail="Up to 300 positive scale values allowed")
     
-    # Markup amount for display
-    markup_amount = total_cost - subtotal
+    matrix = snapshot.price_matrix(entry['stats'], scales=scales)
+    return {
+        "meshToken": request.meshToken,
+        "axes": {
+            "materialId": [str(m['_id']) for m in materials],
+            "infill": pricing.MATRIX_INFILLS,
+            "layerHeight": pricing.MATRIX_LAYER_HEIGHTS,
+            "scale": scales
+        },
+        "shape": list(matrix['totalCost'].shape),
+        "weight": np.round(matrix['weight'], 1).ravel().tolist(),
+        "printTime": np.round(matrix['printTime'], 2).ravel().tolist(),
+        "totalCost": np.round(matrix['totalCost'], 2).ravel().tolist(),
+        "currency": "Lei",
+        "pricingVersion": snapshot.version
+    }
+
+
+class QuoteOrientRequest(BaseModel):
+    meshToken: str
+    materialId: Optional[str] = None
+    scale: float = 1
+    infill: float = 20
+    layerHeight: str = '0.2'
+
+@router.post("/api/quotes/orient")
+async def orient_quote(request: QuoteOrientRequest):
+    """Best print orientation for a mesh token, with quotes as uploaded and as oriented"""
+    if request.scale <= 0:
+        raise HTTPException(status_code=400, detail="Scale must be positive")
+    file_hash, entry = await resolve_mesh_token(request.meshToken)
+    orientation = entry.get('orientation')
+    if (not orientation or orientation['scale'] != request.scale
+            or orientation['stats'].get('version', 1) < ANALYSIS_VERSION):
+        orientation = await analysis_pool.run_analysis(orient_mesh, entry['fileUrl'], request.scale)
+        await mesh_cache.update(file_hash, {"orientation": orientation})
     
-    return CalculateCostResponse(
-        materialCost=round(material_cost, 2),
-        electricityCost=round(electricity_cost, 2),
-        laborCost=round(depreciation_cost, 2),
-        subtotal=round(subtotal, 2),
-        markup=round(markup_amount, 2),
-        totalCost=round(total_cost, 2),
-        currency="Lei"
+    snapshot = pricing_store.snapshot
+    original_stats = await get_mesh_stats(entry['fileUrl'], file_hash)
+    quote_args = (snapshot.material(request.materialId), request.scale, request.infill, request.layerHeight)
+    return {
+        "meshToken": request.meshToken,
+        "rotation": orientation['rotation'],
+        "up": orientation['up'],
+        "candidates": orientation['candidates'],
+        "reoriented": orientation['rotation'] != np.eye(3).tolist(),
+        "best": orientation['best'],
+        "original": orientation['original'],
+        "quote": snapshot.quote(orientation['stats'], *quote_args),
+        "originalQuote": snapshot.quote(original_stats, *quote_args)
+    }
+
+
+# ============ MESH PREVIEWS ============
+PREVIEW_DIR = UPLOAD_DIR / "previews"
+PREVIEW_DIR.mkdir(exist_ok=True)
+# Previews and thumbnails are stored by content hash, and a token or order always
+# points to the same content, so a response never changes
+IMMUTABLE_CACHE = {"Cache-Control": "private, max-age=31536000, immutable"}
+
+@router.get("/api/mesh/{mesh_token}/preview")
+async def get_mesh_preview(mesh_token: str):
+    """Decimated SPV1 preview mesh (see mesh_preview), built once per mesh"""
+    # Served without waiting for an analysis that is still running
+    file_hash = await mesh_tokens.resolve(mesh_token)
+    preview_path = PREVIEW_DIR / f"{file_hash}.spv"
+    if not file_hash or not preview_path.exists():
+        file_hash, entry = await resolve_mesh_token(mesh_token)
+        preview_path = PREVIEW_DIR / f"{file_hash}.spv"
+        await analysis_pool.run_analysis(write_preview, entry['fileUrl'], str(preview_path),
+                                         entry['stats']['bbox'])
+    return FileResponse(preview_path, media_type="application/octet-stream", headers=IMMUTABLE_CACHE)
+
+THUMBNAIL_DIR = UPLOAD_DIR / "thumbnails"
+THUMBNAIL_DIR.mkdir(exist_ok=True)
+
+async def ensure_thumbnail(file_hash: str, file_path: str, bbox: dict):
+    """Path of the PNG thumbnail, rendered on the analysis pool the first time; None on failure"""
+    thumbnail_path = THUMBNAIL_DIR / f"{file_hash}.png"
+    if not thumbnail_path.exists():
+        try:
+            await analysis_pool.run_analysis(write_thumbnail, file_path, str(thumbnail_path), bbox)
+        except Exception as e:
+            print(f"Thumbnail error: {e!r}")
+            return None
+    return thumbnail_path
+
+def share_mesh_artifacts(source_hash: str, target_hash: str):
+    """
+    Reuse the preview and thumbnail of a geometrically identical mesh. The
+    thumbnail is framed by the mesh's own bounding box, so it looks the same
+    for a moved copy; the preview keeps the source's absolute origin, which
+    the viewer drops when it centres the geometry.
+    """
+    for directory, suffix in ((PREVIEW_DIR, ".spv"), (THUMBNAIL_DIR, ".png")):
+        source = directory / f"{source_hash}{suffix}"
+        target = directory / f"{target_hash}{suffix}"
+        if source.exists() and not target.exists():
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copyfile(source, target)
+
+@router.get("/api/mesh/{mesh_token}/thumbnail")
+async def get_mesh_thumbnail(mesh_token: str):
+    """Shaded PNG thumbnail of a mesh"""
+    file_hash, entry = await resolve_mesh_token(mesh_token, require_file=False)
+    thumbnail_path = THUMBNAIL_DIR / f"{file_hash}.png"
+    if not thumbnail_path.exists():
+        if not os.path.exists(entry.get('fileUrl') or ''):
+            raise HTTPException(status_code=404, detail="Mesh token expired, please upload the file again")
+        thumbnail_path = await ensure_thumbnail(file_hash, entry['fileUrl'], entry['stats']['bbox'])
+        if not thumbnail_path:
+            raise HTTPException(status_code=500, detail="Could not render thumbnail")
+    return FileResponse(thumbnail_path, media_type="image/png", headers=IMMUTABLE_CACHE)
+
+
+# ============ PLATE PLANNING ============
+async def plate_parts(order: dict) -> list:
+    """Scaled footprints of every part of an order, for plate_packing"""
+    scale = parse_float(order.get('scale'), 1.0)
+    parts = []
+    for part in order.get('parts') or [order]:
+        dimensions = part.get('dimensions')
+        if not dimensions and part.get('fileHash'):
+            # Orders saved before dimensions were stored: take them from the analysis cache
+            entry = await mesh_cache.get(part['fileHash'])
+            dimensions = entry and entry['stats']['dimensions']
+        if not dimensions:
+            continue
+        parts.append({
+            "orderId": str(order['_id']),
+            "fileName": part.get('fileName'),
+            "width": dimensions['x'] * scale,
+            "depth": dimensions['y'] * scale,
+            "height": dimensions['z'] * scale,
+            "printTime": part.get('printTime'),
+            "material": order.get('materialName'),
+            "color": order.get('materialColor'),
+            "layerHeight": order.get('layerHeight')
+        })
+    return parts
+
+@router.get("/api/plates/plan")
+async def get_plate_plan(status: str = "approved"):
+    """Proposed build plates that batch the parts of orders in a status (default: approved)"""
+    orders = await db.orders.find({"status": status}).sort("uploadDate", 1).to_list(1000)
+    parts = [part for order in orders for part in await plate_parts(order)]
+    plan = plan_plates(parts)
+    plates = [plate for group in plan['groups'] for plate in group['plates']]
+    plan.update({
+        "orders": len(orders),
+        "parts": len(parts),
+        "plates": len(plates),
+        "savedHours": round(sum(plate['savedHours'] for plate in plates), 2)
+    })
+    return plan
+
+
+# ============ PRINT SCHEDULE ============
+class BuildVolume(BaseModel):
+    x: float = 300.0
+    y: float = 300.0
+    z: float = 330.0
+
+class Printer(BaseModel):
+    name: str
+    buildVolume: BuildVolume = BuildVolume()
+    material: Optional[str] = None  # loaded filament (material name)
+    color: Optional[str] = None
+    available: bool = True
+    busyUntil: Optional[datetime] = None  # e.g. maintenance
+
+class PrinterResponse(Printer):
+    id: str
+
+class StartPrintRequest(BaseModel):
+    printerId: str
+
+async def reschedule():
+    """Re-plan the print queue after an event; a failure must not break the caller"""
+    try:
+        await scheduler.replan()
+    except Exception as e:
+        print(f"Scheduler error: {e!r}")
+
+def schedule_eta(order: dict):
+    slot = order.get('schedule')
+    if not slot or order.get('status') not in SCHEDULED_STATUSES:
+        return None
+    return {
+        "printer": slot.get('printerName'),
+        "start": slot['start'].isoformat(),
+        "finish": slot['finish'].isoformat()
+    }
+
+@router.get("/api/printers", response_model=List[PrinterResponse])
+async def get_printers():
+    printers = await db.printers.find().to_list(100)
+    return [PrinterResponse(id=str(p['_id']), **{k:v for k,v in p.items() if k != '_id'}) for p in printers]
+
+@router.post("/api/printers", response_model=PrinterResponse)
+async def create_printer(printer: Printer):
+    result = await db.printers.insert_one(printer.dict())
+    await reschedule()
+    return PrinterResponse(id=str(result.inserted_id), **printer.dict())
+
+@router.put("/api/printers/{printer_id}", response_model=PrinterResponse)
+async def update_printer(printer_id: str, printer: Printer):
+    result = await db.printers.update_one({"_id": ObjectId(printer_id)}, {"$set": printer.dict()})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Printer not found")
+    await reschedule()
+    return PrinterResponse(id=printer_id, **printer.dict())
+
+@router.delete("/api/printers/{printer_id}")
+async def delete_printer(printer_id: str):
+    result = await db.printers.delete_one({"_id": ObjectId(printer_id)})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Printer not found")
+    await reschedule()
+    return {"message": "Printer deleted"}
+
+@router.post("/api/orders/{order_id}/start")
+async def start_print(order_id: str, request: StartPrintRequest):
+    """Mark a queued order as printing on a printer (pins it in the schedule)"""
+    printer = await db.printers.find_one({"_id": ObjectId(request.printerId)})
+    if not printer:
+        raise HTTPException(status_code=404, detail="Printer not found")
+    order = await db.orders.find_one_and_update(
+        {"_id": ObjectId(order_id), "status": {"$in": QUEUED_STATUSES}},
+        {"$set": {"status": PRINTING_STATUS, "printerId": request.printerId, "printStartedAt": datetime.utcnow()}}
+    )
+    if not order:
+        raise HTTPException(status_code=404, detail="No queued order with this id")
+    # The printer now has this order's filament loaded
+    await db.printers.update_one(
+        {"_id": printer['_id']},
+        {"$set": {"material": order.get('materialName'), "color": order.get('materialColor')}}
     )
+    await reschedule()
+    return {"message": "Print started"}
+
+@router.get("/api/schedule")
+async def get_schedule():
+    """Stored plan: the queue of every printer with start/finish times (planned on every queue change)"""
+    orders = await db.orders.find(
+        {"status": {"$in": SCHEDULED_STATUSES}}, {"schedule": 1}
+    ).sort("uploadDate", 1).to_list(None)
+    queues = {}
+    unassigned = []
+    for order in sorted(orders, key=lambda o: o['schedule']['start'] if o.get('schedule') else datetime.max):
+        slot = order.get('schedule')
+        if not slot:
+            unassigned.append(str(order['_id']))
+            continue
+        queues.setdefault(slot['printerId'], {"printer": slot['printerName'], "jobs": []})['jobs'].append({
+            "orderId": str(order['_id']),
+            "start": slot['start'].isoformat(),
+            "finish": slot['finish'].isoformat(),
+            "materialSwap": slot['swap']
+        })
+    finishes = [order['schedule']['finish'] for order in orders if order.get('schedule')]
+    return {
+        "printers": list(queues.values()),
+        "unassigned": unassigned,
+        "makespan": max(finishes).isoformat() if finishes else None
+    }
 
 
 # ============ SHOP ORDERS ============
@@ -0,0 +1,298 @@
+"""
+Offline re-analysis of stored uploads and the orders that use them.
+
+    python backfill_analysis.py [--uploads DIR] [--workers N] [--batch N]
+                                [--pause SECONDS] [--checkpoint FILE] [--all] [--dry-run]
+
+Orders not analyzed by the current ANALYSIS_VERSION (missing weight / print
+time / cost, failed or OBJ analyses, the old volume-based time model) get
+their files re-analyzed, and so does every model file in the uploads folder
+that is not in the analysis cache yet. Files are hashed and analyzed in a
+process pool (one worker per core); files whose hash already has a current
+cache entry reuse it.
+
+Results are written from this process only, in unordered bulk_write batches
+with a pause between batches, so Mongo sees a steady trickle of large
+writes instead of one write per file. A file is appended to the checkpoint
+once everything derived from it is written; a rerun skips those files, so
+an interrupted backfill resumes where it stopped.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+import bson
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+import pricing
+from pricing_snapshot import PricingSnapshot
+from mesh_analysis import ANALYSIS_VERSION, is_analyzable
+from mesh_slicing import analyze_with_layers
+
+ROOT_DIR = Path(__file__).parent
+UPLOAD_DIR = Path("/app/backend/uploads")
+HASH_CHUNK_BYTES = 1024 * 1024
+PROGRESS_SECONDS = 2.0
+
+_fresh_hashes = frozenset()
+
+
+def _init_worker(fresh_hashes):
+    global _fresh_hashes
+    _fresh_hashes = fresh_hashes
+
+
+def _file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def analyze_file(path: str) -> dict:
+    """Worker job: hash the file and analyze it unless the cache already has it"""
+    result = {"path": path, "sha256": None, "stats": None, "cached": False, "error": None}
+    try:
+        result["sha256"] = _file_sha256(path)
+        if result["sha256"] in _fresh_hashes:
+            result["cached"] = True
+        else:
+            result["stats"] = analyze_with_layers(path)
+    except Exception as e:
+        result["error"] = repr(e)
+    return result
+
+
+def resolve_path(file_url, uploads: Path):
+    """Stored path of an order file; files moved with the uploads folder are found by name"""
+    if not file_url:
+        return None
+    if os.path.exists(file_url):
+        return str(file_url)
+    moved = uploads / Path(file_url).name
+    return str(moved) if moved.exists() else None
+
+
+class Backfill:
+    def __init__(self, db, uploads: Path, batch: int, pause: float, checkpoint: Path, dry_run: bool):
+        self.db = db
+        self.uploads = uploads
+        self.batch = batch
+        self.pause = pause
+        self.checkpoint = checkpoint
+        self.dry_run = dry_run
+        self.pricing = PricingSnapshot(list(db.materials.find()), db.print_settings.find_one())
+
+        self.orders = {}       # order id -> {"order": doc, "parts": [part], "paths": [path], "waiting": n}
+        self.path_orders = {}  # path -> [(order id, part index)]
+        self.remaining = {}    # path -> writes still to flush before it can be checkpointed
+        self.cache_ops = []
+        self.order_ops = []
+        self.flushed_paths = []
+        self.failures = 0
+
+    def done_paths(self) -> set:
+        if not self.checkpoint.exists():
+            return set()
+        with open(self.checkpoint) as f:
+            return {json.loads(line)['path'] for line in f if line.strip()}
+
+    def collect(self, reanalyze_all: bool) -> list:
+        """Files to analyze: those of outdated orders, then uncached uploads"""
+        query = {} if reanalyze_all else {"analysisVersion": {"$not": {"$gte": ANALYSIS_VERSION}}}
+        projection = {"fileUrl": 1, "fileName": 1, "parts": 1, "materialId": 1,
+                      "scale": 1, "infill": 1, "layerHeight": 1}
+        for order in self.db.orders.find(query, projection):
+            parts = [dict(part) for part in order.get('parts') or [order]]
+            paths = [resolve_path(part.get('fileUrl'), self.uploads) for part in parts]
+            order_id = str(order['_id'])
+            usable = [(index, path) for index, (part, path) in enumerate(zip(parts, paths))
+                      if path and is_analyzable(part.get('fileName') or path)]
+            if not usable:
+                continue
+            self.orders[order_id] = {"order": order, "parts": parts, "paths": [p for _, p in usable],
+                                     "waiting": len(usable)}
+            for index, path in usable:
+                self.path_orders.setdefault(path, []).append((order_id, index))
+
+        cached = {doc['fileUrl'] for doc in self.db.mesh_analysis.find(
+            {"stats.version": {"$gte": ANALYSIS_VERSION}}, {"fileUrl": 1}) if doc.get('fileUrl')}
+        for entry in sorted(self.uploads.iterdir()):
+            path = str(entry)
+            if entry.is_file() and is_analyzable(entry.name) and path not in cached:
+                self.path_orders.setdefault(path, [])
+
+        done = self.done_paths()
+        paths = [path for path in self.path_orders if path not in done]
+        for path in paths:
+            self.remaining[path] = len(self.path_orders[path]) + 1
+        # Orders whose files were all handled by an earlier run are left alone
+        for order_id in [o for o, item in self.orders.items() if all(p in done for p in item['paths'])]:
+            del self.orders[order_id]
+        return paths
+
+    def fresh_hashes(self) -> frozenset:
+        return frozenset(doc['_id'] for doc in self.db.mesh_analysis.find(
+            {"stats.version": {"$gte": ANALYSIS_VERSION}}, {"_id": 1}))
+
+    def handle(self, result: dict):
+        path = result['path']
+        stats = result['stats']
+        if result['cached']:
+            entry = self.db.mesh_analysis.find_one({"_id": result['sha256']}, {"stats": 1})
+            stats = entry and entry['stats']
+        if result['error'] or not stats:
+            self.failures += 1
+
+        if stats and not result['cached']:
+            now = datetime.utcnow()
+            entry = {"stats": stats, "fileUrl": path, "fileName": Path(path).name}
+            self.cache_ops.append((UpdateOne(
+                {"_id": result['sha256']},
+                {"$set": {**entry, "size": len(bson.encode(entry)), "lastUsed": now},
+                 "$setOnInsert": {"createdAt": now}},
+                upsert=True
+            ), [path]))
+        else:
+            self._written([path])
+
+        for order_id, index in self.path_orders.get(path, []):
+            item = self.orders.get(order_id)
+            if item is None:
+                self._written([path])
+                continue
+            self._update_part(item, index, result, stats)
+            item['waiting'] -= 1
+            if item['waiting'] == 0:
+                self.order_ops.append((self._order_update(order_id, item), item['paths']))
+
+        if len(self.cache_ops) + len(self.order_ops) >= self.batch:
+            self.flush()
+
+    def _update_part(self, item: dict, index: int, result: dict, stats):
+        order = item['order']
+        part = item['parts'][index]
+        if not stats:
+            part["analysisError"] = result['error'] or "analysis failed"
+            return
+        material = self.pricing.material(order.get('materialId'))
+        estimates = pricing.part_estimates(
+            stats, pricing.material_density(material), _parse_float(order.get('scale'), 1.0),
+            _parse_float(order.get('infill'), 20), order.get('layerHeight') or '0.2'
+        )
+        part.update(estimates)
+        part.update({
+            "fileHash": result['sha256'],
+            "meshIntegrity": stats.get('integrity'),
+            "dimensions": stats['dimensions'],
+            "analysisVersion": stats.get('version'),
+            "estimatedCost": (self.pricing.order_cost(estimates['weight'], estimates['printTime'], material)
+                              if material else None)
+        })
+        part.pop("analysisError", None)
+
+    def _order_update(self, order_id: str, item: dict) -> UpdateOne:
+        parts = item['parts']
+        fields = ("weight", "printTime", "supportWeight", "estimatedCost")
+        if item['order'].get('parts'):
+            values = {field: sum(p[field] for p in parts if p.get(field) is not None) if any(
+                p.get(field) is not None for p in parts) else None for field in fields}
+            update = {**values, "parts": parts,
+                      "analysisVersion": min((p.get('analysisVersion') or 0) for p in parts)}
+        else:
+            part = parts[0]
+            update = {key: part.get(key) for key in (*fields, "fileHash", "meshIntegrity", "dimensions",
+                                                     "analysisVersion", "analysisError")}
+        update.update(reanalyzedDate=datetime.utcnow(), pricingVersion=self.pricing.version)
+        return UpdateOne({"_id": ObjectId(order_id)}, {"$set": update})
+
+    def _written(self, paths: list):
+        for path in paths:
+            self.remaining[path] -= 1
+            if self.remaining[path] == 0:
+                self.flushed_paths.append(path)
+
+    def flush(self):
+        for collection, ops in ((self.db.mesh_analysis, self.cache_ops), (self.db.orders, self.order_ops)):
+            if ops and not self.dry_run:
+                collection.bulk_write([op for op, _ in ops], ordered=False)
+            for _, paths in ops:
+                self._written(paths)
+            ops.clear()
+        if self.flushed_paths and not self.dry_run:
+            with open(self.checkpoint, 'a') as f:
+                f.writelines(json.dumps({"path": path}) + "\n" for path in self.flushed_paths)
+        self.flushed_paths.clear()
+        if self.pause:
+            time.sleep(self.pause)
+
+
+def _parse_float(value, default: float) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def run(args):
+    load_dotenv(ROOT_DIR / '.env')
+    db = MongoClient(os.environ['MONGO_URL'])[os.environ['DB_NAME']]
+    backfill = Backfill(db, Path(args.uploads), args.batch, args.pause, Path(args.checkpoint), args.dry_run)
+    paths = backfill.collect(args.all)
+    total = len(paths)
+    print(f"{total} files to analyze ({len(backfill.orders)} orders), {args.workers} workers")
+    if not total:
+        return
+
+    started = last_report = time.monotonic()
+    finished = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(backfill.fresh_hashes(),)) as executor:
+        queue = iter(paths)
+        # A few jobs per worker in flight keeps every core busy without queueing the whole archive
+        running = {executor.submit(analyze_file, path) for path in _take(queue, args.workers * 2)}
+        while running:
+            completed, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in completed:
+                backfill.handle(future.result())
+                finished += 1
+            running |= {executor.submit(analyze_file, path) for path in _take(queue, len(completed))}
+
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_SECONDS or not running:
+                rate = finished / max(now - started, 1e-9)
+                eta = (total - finished) / rate if rate else 0
+                print(f"[{finished}/{total}] {rate:.1f} files/s, ETA {eta / 60:.1f} min, "
+                      f"{backfill.failures} failed", flush=True)
+                last_report = now
+    backfill.flush()
+    print(f"Done: {finished} files, {backfill.failures} failed")
+
+
+def _take(iterator, count: int) -> list:
+    return [path for _, path in zip(range(count), iterator)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-analyze stored uploads and backfill order estimates")
+    parser.add_argument('--uploads', default=str(UPLOAD_DIR), help="uploads folder (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="analysis processes")
+    parser.add_argument('--batch', type=int, default=500, help="writes per bulk_write")
+    parser.add_argument('--pause', type=float, default=0.2, help="seconds to wait after each batch")
+    parser.add_argument('--checkpoint', default=str(ROOT_DIR / 'backfill_checkpoint.jsonl'),
+                        help="progress file used to resume (default: %(default)s)")
+    parser.add_argument('--all', action='store_true', help="re-analyze every order, not only outdated ones")
+    parser.add_argument('--dry-run', action='store_true', help="analyze but write nothing")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
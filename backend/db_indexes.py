@@ -0,0 +1,195 @@
+"""
+Indexes of the hot collections, built at startup, and a query-plan check.
+
+INDEXES declares every index the app relies on; ensure_indexes() builds the
+missing ones (create_index is a no-op for an identical index) and reports
+drift: declared indexes whose key or options differ from the one in the
+database, and undeclared indexes. Drifted indexes are left alone; they are
+rebuilt or dropped by hand (or with --drop-extra for undeclared ones).
+SUPERSEDED lists indexes built by earlier versions that a declared index
+now covers; they are dropped.
+
+HOT_QUERIES lists the queries behind the busy endpoints. check_plans()
+runs explain() on each and fails any whose winning plan scans the whole
+collection. Counts are checked through the equivalent find.
+
+    python db_indexes.py [--check] [--drop-extra]
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from order_repricing import REPRICE_STATUSES
+from print_scheduler import SCHEDULED_STATUSES
+
+ROOT_DIR = Path(__file__).parent
+# Only orders with an email appear in customer lookups
+WITH_EMAIL = {"customerEmail": {"$exists": True}}
+
+# collection -> [(name, keys, options)]
+INDEXES = {
+    "orders": [
+        # Admin order list, newest first
+        ("uploadDate", [("uploadDate", DESCENDING)], {}),
+        # Customer order history
+        ("customerEmail_uploadDate", [("customerEmail", ASCENDING), ("uploadDate", DESCENDING)],
+         {"partialFilterExpression": WITH_EMAIL}),
+        # Completed-order counts for discounts
+        ("customerEmail_status", [("customerEmail", ASCENDING), ("status", ASCENDING)],
+         {"partialFilterExpression": WITH_EMAIL}),
+        # Scheduler, plate planning and repricing queues
+        ("status_uploadDate", [("status", ASCENDING), ("uploadDate", ASCENDING)], {}),
+    ],
+    "telegram_states": [
+        ("chatId", [("chatId", ASCENDING)], {"unique": True}),
+    ],
+    "upload_sessions": [
+        ("expiresAt", [("expiresAt", ASCENDING)], {}),
+    ],
+    "mesh_tokens": [
+        # Mongo deletes tokens once they expire
+        ("expiresAt", [("expiresAt", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    "mesh_analysis": [
+        # Same-geometry candidates, most recently used first (MeshCache.fingerprint_candidates)
+        ("fingerprint_lastUsed", [("stats.fingerprint.triangles", ASCENDING), ("lastUsed", DESCENDING)],
+         {"partialFilterExpression": {"stats.fingerprint.triangles": {"$exists": True}}}),
+        # Least recently used eviction
+        ("lastUsed", [("lastUsed", ASCENDING)], {}),
+    ],
+}
+
+# collection -> {name: declared index that covers it}
+SUPERSEDED = {
+    "mesh_analysis": {
+        # Sparse single-field index the mesh cache built before the indexes were declared here
+        "stats.fingerprint.triangles_1": "fingerprint_lastUsed",
+    },
+}
+
+# (description, collection, filter, sort)
+HOT_QUERIES = [
+    ("admin order list", "orders", {}, [("uploadDate", DESCENDING)]),
+    ("customer order history", "orders", {"customerEmail": "user@example.com"}, [("uploadDate", DESCENDING)]),
+    ("completed orders count", "orders", {"customerEmail": "user@example.com", "status": "completed"}, None),
+    ("print schedule queue", "orders", {"status": {"$in": SCHEDULED_STATUSES}},
+     [("uploadDate", ASCENDING)]),
+    ("plate plan", "orders", {"status": "approved"}, [("uploadDate", ASCENDING)]),
+    ("repricing queue", "orders", {"status": {"$in": REPRICE_STATUSES}, "pricingVersion": {"$ne": ""}}, None),
+    ("telegram state", "telegram_states", {"chatId": 0}, None),
+    ("upload session GC", "upload_sessions", {"expiresAt": {"$lt": datetime.utcnow()}}, None),
+    ("same-geometry candidates", "mesh_analysis", {"stats.fingerprint.triangles": 0}, [("lastUsed", DESCENDING)]),
+    ("cache eviction", "mesh_analysis", {}, [("lastUsed", ASCENDING)]),
+]
+
+
+def _same_index(existing: dict, keys: list, options: dict) -> bool:
+    return (list(existing['key'].items()) == keys
+            and bool(existing.get('unique')) == bool(options.get('unique'))
+            and existing.get('partialFilterExpression') == options.get('partialFilterExpression')
+            and existing.get('expireAfterSeconds') == options.get('expireAfterSeconds'))
+
+
+async def ensure_indexes(db, drop_extra: bool = False) -> dict:
+    """
+    Build missing indexes
+    Returns:
+        dict with created, dropped (superseded), conflicts (name: reason) and
+        extra (collection.name) indexes
+    """
+    report = {"created": [], "dropped": [], "conflicts": {}, "extra": []}
+    for collection_name, declared in INDEXES.items():
+        collection = db[collection_name]
+        existing = {index['name']: index async for index in collection.list_indexes()}
+        names = {name for name, _, _ in declared}
+        superseded = SUPERSEDED.get(collection_name, {})
+        for name, keys, options in declared:
+            label = f"{collection_name}.{name}"
+            current = existing.get(name)
+            if current is not None:
+                if not _same_index(current, keys, options):
+                    report["conflicts"][label] = f"differs from the declared index: {dict(current['key'])}"
+                continue
+            try:
+                await collection.create_index(keys, name=name, **options)
+                report["created"].append(label)
+            except OperationFailure as e:
+                # e.g. the same keys under another name, or duplicates under a unique index
+                report["conflicts"][label] = str(e)
+        for name in existing:
+            if name in superseded and name not in names:
+                # Only once the index that covers it is in place
+                if f"{collection_name}.{superseded[name]}" not in report["conflicts"]:
+                    await collection.drop_index(name)
+                    report["dropped"].append(f"{collection_name}.{name}")
+            elif name != "_id_" and name not in names:
+                report["extra"].append(f"{collection_name}.{name}")
+                if drop_extra:
+                    await collection.drop_index(name)
+    return report
+
+
+def _plan_stages(plan: dict):
+    """(stage, index name) of every stage in a winning plan"""
+    yield plan.get('stage'), plan.get('indexName')
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from _plan_stages(child)
+
+
+async def check_plans(db) -> list:
+    """explain() every hot query; returns (description, ok, indexes used) per query"""
+    results = []
+    for description, collection_name, query, sort in HOT_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = list(_plan_stages(explain['queryPlanner']['winningPlan']))
+        indexes = sorted({index for _, index in stages if index})
+        ok = not any(stage == 'COLLSCAN' for stage, _ in stages)
+        results.append((description, ok, indexes))
+    return results
+
+
+def print_report(report: dict):
+    for label in report["created"]:
+        print(f"Index created: {label}")
+    for label in report["dropped"]:
+        print(f"Superseded index dropped: {label}")
+    for label, reason in report["conflicts"].items():
+        print(f"Index drift: {label} {reason}")
+    for label in report["extra"]:
+        print(f"Index not declared: {label}")
+
+
+async def main(args):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(ROOT_DIR / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    report = await ensure_indexes(db, drop_extra=args.drop_extra)
+    print_report(report)
+    failed = bool(report["conflicts"])
+    if args.check:
+        for description, ok, indexes in await check_plans(db):
+            print(f"{'ok  ' if ok else 'SCAN'} {description}: {', '.join(indexes) or 'no index'}")
+            failed = failed or not ok
+    client.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build declared indexes and report drift")
+    parser.add_argument('--check', action='store_true', help="fail if a hot query plan scans a collection")
+    parser.add_argument('--drop-extra', action='store_true', help="drop indexes that are not declared")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
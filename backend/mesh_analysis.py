@@ -0,0 +1,678 @@
+"""
+Streaming mesh analysis for uploaded 3D models.
+
+Binary STL files are memory-mapped and ASCII STL files are read in chunks,
+so the mesh is never loaded into memory as a whole. Compressed uploads
+(.stl.gz, .stl.zst) and 3MF archives are decompressed on the fly into the
+same block readers; no decompressed copy is written or held in memory.
+OBJ files are parsed in large text blocks into numpy arrays and their
+faces are fan-triangulated vectorially.
+Triangles are processed in fixed-size blocks and every block goes through
+a single vectorized pass that accumulates volume, surface area, bounding
+box, triangle count and the overhang samples used for support estimation.
+
+Fingerprint: the area-weighted moments (orders 0-3) of the triangle
+centroids are sums, so they do not depend on triangle order or file format.
+Taken about the centroid and divided by powers of the RMS radius they
+become translation- and scale-free invariants; two files whose triangle
+counts and invariants agree are treated as the same model re-exported.
+
+Support estimation: faces steeper than OVERHANG_ANGLE (measured from the
+vertical) on the underside need support. Every non-vertical face is
+rasterized onto a SUPPORT_CELL_MM grid in XY and folded, block by block,
+into fixed per-cell aggregates for each facing direction: steep projected
+area and area-weighted height, lowest steep height, lowest and highest
+height of any face. Steep faces within SUPPORT_MIN_GAP_MM of the lowest
+point seen so far rest on the bed and are kept apart from the overhangs.
+Memory grows with the model footprint, not with the triangle count. A
+cell's overhang is supported from the upward-facing surface below it (its
+top when all of it lies below, else its lowest point) or from the bed; the
+support volume is the sum of those columns.
+"""
+import gzip
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+import numpy as np
+
+# Triangles per block: 65536 triangles * 9 floats * 8 bytes ~= 4.5 MB
+BLOCK_TRIANGLES = 65536
+
+# ASCII files are read in chunks of this many bytes
+ASCII_CHUNK_BYTES = 4 * 1024 * 1024
+
+STL_HEADER_BYTES = 84
+
+# Binary STL record: normal, 3 vertices, attribute byte count (50 bytes)
+STL_RECORD_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vectors', '<f4', (3, 3)),
+    ('attr', '<u2'),
+])
+
+_VERTEX_RE = re.compile(rb'vertex\s+(\S+)\s+(\S+)\s+(\S+)')
+
+# Binary STL data is full of control bytes (zero floats, attribute words); text never is
+_TEXT_BYTES = frozenset(range(32, 256)) | {9, 10, 13}
+
+# Guard against decompression bombs
+MAX_DECOMPRESSED_BYTES = int(os.environ.get('MAX_DECOMPRESSED_BYTES', 2 * 1024 * 1024 * 1024))
+
+# 3MF model units to millimetres
+_3MF_UNITS = {
+    'micron': 0.001, 'millimeter': 1.0, 'centimeter': 10.0,
+    'inch': 25.4, 'foot': 304.8, 'meter': 1000.0
+}
+
+# OBJ: vertex lines (first three coordinates), face lines, and both in file order
+_OBJ_VERTEX_RE = re.compile(rb'^v[ \t]+(\S+[ \t]+\S+[ \t]+\S+)', re.MULTILINE)
+_OBJ_FACE_RE = re.compile(rb'^f[ \t]+([^\n]*)', re.MULTILINE)
+_OBJ_KIND_RE = re.compile(rb'^(?:v(?=[ \t]+\S+[ \t]+\S+[ \t]+\S)|f(?=[ \t]))', re.MULTILINE)
+_OBJ_REF_SUFFIX_RE = re.compile(rb'/\S*')
+
+# Bump when analysis results gain fields, so cached stats are recomputed
+ANALYSIS_VERSION = 6
+
+# Overhang threshold (degrees from vertical) and support grid
+OVERHANG_ANGLE = 45
+SUPPORT_CELL_MM = 2.0
+# Overhangs closer than this to the surface below print without support
+SUPPORT_MIN_GAP_MM = 0.3
+# Offset that keeps cell indices positive when packed into one int64 key
+_CELL_OFFSET = 1 << 20
+
+# Fingerprints match when every scale-free invariant agrees within this
+FINGERPRINT_TOLERANCE = 1e-4
+
+ANALYZABLE_EXTENSIONS = ('.stl', '.stl.gz', '.stl.zst', '.3mf', '.obj')
+UPLOAD_EXTENSIONS = ANALYZABLE_EXTENSIONS
+
+
+def is_analyzable(file_name: str) -> bool:
+    return file_name.lower().endswith(ANALYZABLE_EXTENSIONS)
+
+
+def looks_like_ascii_stl(head: bytes) -> bool:
+    return head[:5].lower() == b'solid' and all(b in _TEXT_BYTES for b in head)
+
+
+def binary_triangle_count(file_path: str):
+    """Return triangle count if the file is a well-formed binary STL, else None"""
+    size = os.path.getsize(file_path)
+    if size < STL_HEADER_BYTES:
+        return None
+    with open(file_path, 'rb') as f:
+        f.seek(80)
+        count = int.from_bytes(f.read(4), 'little')
+    if size == STL_HEADER_BYTES + count * STL_RECORD_DTYPE.itemsize:
+        return count
+    return None
+
+
+def iter_binary_stl_blocks(file_path: str, count: int, block_size: int = BLOCK_TRIANGLES):
+    """Yield (n, 3, 3) float64 triangle blocks from a memory-mapped binary STL"""
+    if count == 0:
+        return
+    records = np.memmap(file_path, dtype=STL_RECORD_DTYPE, mode='r',
+                        offset=STL_HEADER_BYTES, shape=(count,))
+    try:
+        for start in range(0, count, block_size):
+            yield np.asarray(records['vectors'][start:start + block_size], dtype=np.float64)
+    finally:
+        del records
+
+
+def iter_ascii_stl_blocks(stream, block_size: int = BLOCK_TRIANGLES,
+                          chunk_bytes: int = ASCII_CHUNK_BYTES, prefix: bytes = b''):
+    """Yield (n, 3, 3) float64 triangle blocks from an ASCII STL byte stream"""
+    tail = prefix
+    pending = np.empty((0, 3), dtype=np.float64)
+    while True:
+        chunk = stream.read(chunk_bytes)
+        if chunk:
+            data = tail + chunk
+            cut = data.rfind(b'\n') + 1
+            data, tail = data[:cut], data[cut:]
+        else:
+            data, tail = tail, b''
+        if data:
+            coords = _VERTEX_RE.findall(data)
+            if coords:
+                vertices = np.array(coords, dtype=np.float64)
+                pending = np.concatenate([pending, vertices]) if len(pending) else vertices
+        usable = (len(pending) // 3) * 3
+        if usable >= block_size * 3 or (not chunk and usable):
+            triangles = pending[:usable].reshape(-1, 3, 3)
+            pending = pending[usable:]
+            for start in range(0, len(triangles), block_size):
+                yield triangles[start:start + block_size]
+        if not chunk:
+            break
+
+
+def _read_exact(stream, size: int) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def iter_stl_stream_blocks(stream, block_size: int = BLOCK_TRIANGLES):
+    """Yield triangle blocks from a non-seekable STL stream (binary or ASCII)"""
+    head = _read_exact(stream, 1024)
+    if looks_like_ascii_stl(head):
+        yield from iter_ascii_stl_blocks(stream, block_size, prefix=head)
+        return
+    if len(head) < STL_HEADER_BYTES:
+        raise ValueError("Not a valid STL stream")
+
+    remaining = int.from_bytes(head[80:84], 'little')
+    pending = head[STL_HEADER_BYTES:]
+    record_bytes = STL_RECORD_DTYPE.itemsize
+    while remaining:
+        count = min(block_size, remaining)
+        data = pending + _read_exact(stream, count * record_bytes - len(pending))
+        pending = b''
+        if len(data) < count * record_bytes:
+            raise ValueError("STL stream is truncated")
+        records = np.frombuffer(data, dtype=STL_RECORD_DTYPE, count=count)
+        yield records['vectors'].astype(np.float64)
+        remaining -= count
+
+
+class _LimitedReader:
+    """File-like wrapper that fails once more than limit bytes were read"""
+
+    def __init__(self, stream, limit: int = MAX_DECOMPRESSED_BYTES):
+        self.stream = stream
+        self.limit = limit
+        self.count = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.count += len(data)
+        if self.count > self.limit:
+            raise ValueError("Decompressed model is too large")
+        return data
+
+
+def _open_zstd(file_path: str):
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd compressed models are not supported on this server")
+    return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+
+
+def _local_tag(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_3mf_blocks(file_path: str, block_size: int = BLOCK_TRIANGLES):
+    """
+    Yield triangle blocks from the mesh objects of a 3MF archive.
+    Vertices of the current object are kept (triangles index into them);
+    triangles are streamed. Build item transforms are not applied.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        models = [name for name in archive.namelist() if name.lower().endswith('.model')]
+        if not models:
+            raise ValueError("3MF archive contains no model")
+        for name in models:
+            with archive.open(name) as member:
+                yield from _iter_3mf_model(_LimitedReader(member), block_size)
+
+
+def _3mf_triangles(vertices: np.ndarray, indices: list) -> np.ndarray:
+    try:
+        refs = np.array(indices, dtype=np.int64)
+    except (TypeError, ValueError):
+        raise ValueError("3MF triangle has an invalid vertex index")
+    if refs.min() < 0 or refs.max() >= len(vertices):
+        raise ValueError("3MF triangle references an undefined vertex")
+    return vertices[refs]
+
+
+def _iter_3mf_model(stream, block_size: int):
+    unit = 1.0
+    coords, vertices, indices = [], None, []
+    # Open elements; each element is removed from its parent once parsed, so
+    # the tree never holds more than the path to the current element
+    open_elements = []
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        tag = _local_tag(elem.tag)
+        if event == 'start':
+            open_elements.append(elem)
+            if tag == 'model':
+                unit = _3MF_UNITS.get(elem.get('unit', 'millimeter'), 1.0)
+            elif tag == 'mesh':
+                coords, vertices, indices = [], None, []
+            continue
+        open_elements.pop()
+        if tag == 'vertex':
+            coords.append((elem.get('x'), elem.get('y'), elem.get('z')))
+        elif tag == 'vertices':
+            vertices = np.array(coords, dtype=np.float64).reshape(-1, 3) * unit
+            coords = []
+        elif tag == 'triangle':
+            if vertices is None:
+                raise ValueError("3MF mesh has triangles before its vertices")
+            indices.append((elem.get('v1'), elem.get('v2'), elem.get('v3')))
+            if len(indices) >= block_size:
+                yield _3mf_triangles(vertices, indices)
+                indices = []
+        elif tag == 'mesh':
+            if indices:
+                yield _3mf_triangles(vertices, indices)
+            indices = []
+        elem.clear()
+        if open_elements:
+            open_elements[-1].remove(elem)
+
+
+def _fan_triangulate(refs: np.ndarray, vertex_counts: np.ndarray) -> np.ndarray:
+    """
+    Fan-triangulate polygons given as flat vertex references
+    Args:
+        refs: Concatenated vertex indices of all faces
+        vertex_counts: Number of vertices of each face (faces with < 3 are dropped)
+    Returns:
+        (n, 3) int64 array of vertex indices
+    """
+    tri_counts = np.maximum(vertex_counts - 2, 0)
+    total = int(tri_counts.sum())
+    if total == 0:
+        return np.empty((0, 3), dtype=np.int64)
+    starts = np.concatenate([[0], np.cumsum(vertex_counts)[:-1]])
+    tri_starts = np.concatenate([[0], np.cumsum(tri_counts)[:-1]])
+    first = np.repeat(starts, tri_counts)
+    # j-th triangle of a face is (v0, v[j+1], v[j+2])
+    j = np.arange(total) - np.repeat(tri_starts, tri_counts)
+    return np.stack([refs[first], refs[first + j + 1], refs[first + j + 2]], axis=1)
+
+
+def iter_obj_blocks(stream, block_size: int = BLOCK_TRIANGLES,
+                    chunk_bytes: int = ASCII_CHUNK_BYTES):
+    """
+    Yield triangle blocks from an OBJ byte stream.
+    Supports n-gon faces, negative (relative) indices and v/vt/vn references.
+    Vertices are kept (faces index into them); faces are streamed.
+    """
+    vertices = np.empty((1024, 3), dtype=np.float64)
+    vertex_count = 0
+    tail = b''
+    while True:
+        chunk = stream.read(chunk_bytes)
+        if chunk:
+            data = tail + chunk
+            cut = data.rfind(b'\n') + 1
+            data, tail = data[:cut], data[cut:]
+        else:
+            data, tail = tail + b'\n', b''
+
+        coords = np.fromstring(b' '.join(_OBJ_VERTEX_RE.findall(data)), sep=' ').reshape(-1, 3)
+        previous_count = vertex_count
+        if vertex_count + len(coords) > len(vertices):
+            grown = np.empty((max(2 * len(vertices), vertex_count + len(coords)), 3))
+            grown[:vertex_count] = vertices[:vertex_count]
+            vertices = grown
+        vertices[vertex_count:vertex_count + len(coords)] = coords
+        vertex_count += len(coords)
+
+        faces = _OBJ_FACE_RE.findall(data)
+        if faces:
+            # Drop /vt/vn parts, end every face with 0 (never a valid OBJ index)
+            text = _OBJ_REF_SUFFIX_RE.sub(b'', b' 0 '.join(faces) + b' 0')
+            flat = np.fromstring(text, dtype=np.int64, sep=' ')
+            ends = flat == 0
+            refs = flat[~ends]
+            face_ids = np.cumsum(ends)[~ends]
+            if (refs < 0).any():
+                # Relative indices count from the vertices defined before each face line
+                kinds = np.frombuffer(b''.join(_OBJ_KIND_RE.findall(data)), dtype=np.uint8)
+                is_vertex = kinds == ord('v')
+                defined = previous_count + np.cumsum(is_vertex)[~is_vertex]
+                refs = np.where(refs > 0, refs - 1, defined[face_ids] + refs)
+            else:
+                refs = refs - 1
+            if refs.min() < 0 or refs.max() >= vertex_count:
+                raise ValueError("OBJ face references an undefined vertex")
+            triangles = _fan_triangulate(refs, np.bincount(face_ids, minlength=len(faces)))
+            for start in range(0, len(triangles), block_size):
+                yield vertices[triangles[start:start + block_size]]
+        if not chunk:
+            break
+
+
+def iter_triangle_blocks(file_path: str, block_size: int = BLOCK_TRIANGLES):
+    """Yield triangle blocks from a model file: STL (binary/ASCII, optionally gzip/zstd), 3MF or OBJ"""
+    name = file_path.lower()
+    if name.endswith('.obj'):
+        with open(file_path, 'rb') as stream:
+            yield from iter_obj_blocks(stream, block_size)
+        return
+    if name.endswith('.3mf'):
+        yield from iter_3mf_blocks(file_path, block_size)
+        return
+    if name.endswith('.gz'):
+        with gzip.open(file_path, 'rb') as stream:
+            yield from iter_stl_stream_blocks(_LimitedReader(stream), block_size)
+        return
+    if name.endswith('.zst'):
+        with _open_zstd(file_path) as stream:
+            yield from iter_stl_stream_blocks(_LimitedReader(stream), block_size)
+        return
+
+    count = binary_triangle_count(file_path)
+    if count is not None:
+        yield from iter_binary_stl_blocks(file_path, count, block_size)
+        return
+    with open(file_path, 'rb') as f:
+        head = f.read(1024)
+        if len(head) >= STL_HEADER_BYTES and not all(b in _TEXT_BYTES for b in head):
+            # Binary, but its size does not match the declared triangle count
+            declared = STL_HEADER_BYTES + int.from_bytes(head[80:84], 'little') * STL_RECORD_DTYPE.itemsize
+            if os.path.getsize(file_path) < declared:
+                raise ValueError("STL file is truncated")
+            raise ValueError("STL file is longer than its declared triangle count")
+        f.seek(0)
+        yield from iter_ascii_stl_blocks(f, block_size)
+
+
+def _cell_keys(ix: np.ndarray, iy: np.ndarray) -> np.ndarray:
+    """Pack support grid cell indices into one int64 key"""
+    return (ix + _CELL_OFFSET) * (2 * _CELL_OFFSET) + (iy + _CELL_OFFSET)
+
+
+class FingerprintAccumulator:
+    """Area-weighted centroid moments of a mesh, accumulated block by block"""
+
+    def __init__(self):
+        self.triangles = 0
+        # Moments are taken about the first vertex seen to keep the sums small
+        self.origin = None
+        self.m0 = 0.0
+        self.m1 = np.zeros(3)
+        self.m2 = np.zeros((3, 3))
+        self.m3 = np.zeros((3, 3, 3))
+
+    def add(self, tris: np.ndarray, double_area: np.ndarray):
+        if len(tris) == 0:
+            return
+        if self.origin is None:
+            self.origin = tris[0, 0].astype(np.float64)
+        g = (tris[:, 0] + tris[:, 1] + tris[:, 2]) / 3.0 - self.origin
+        a = double_area / 2.0
+        ag = g * a[:, None]
+        self.triangles += len(tris)
+        self.m0 += float(a.sum())
+        self.m1 += ag.sum(axis=0)
+        agg = (ag[:, :, None] * g[:, None, :]).reshape(-1, 9)
+        self.m2 += agg.sum(axis=0).reshape(3, 3)
+        self.m3 += (agg.T @ g).reshape(3, 3, 3)
+
+    def result(self, volume_mm3: float) -> dict:
+        if self.m0 <= 0:
+            return None
+        mean = self.m1 / self.m0
+        second = self.m2 / self.m0
+        third = self.m3 / self.m0
+        # Central moments from the raw ones
+        c2 = second - np.outer(mean, mean)
+        c3 = (third
+              - np.einsum('i,jk->ijk', mean, second)
+              - np.einsum('j,ik->ijk', mean, second)
+              - np.einsum('k,ij->ijk', mean, second)
+              + 2 * np.einsum('i,j,k->ijk', mean, mean, mean))
+        radius = float(np.sqrt(max(np.trace(c2), 0.0))) or 1.0
+        upper2 = c2[np.triu_indices(3)]
+        upper3 = c3[[0, 0, 0, 0, 0, 0, 1, 1, 1, 2],
+                    [0, 0, 0, 1, 1, 2, 1, 1, 2, 2],
+                    [0, 1, 2, 1, 2, 2, 1, 2, 2, 2]]
+        invariants = np.concatenate([[self.m0 / radius ** 2, volume_mm3 / radius ** 3],
+                                     upper2 / radius ** 2, upper3 / radius ** 3])
+        return {
+            'triangles': self.triangles,
+            'radius': radius,
+            'centroid': (self.origin + mean).tolist(),
+            'invariants': invariants.tolist()
+        }
+
+
+def fingerprints_match(a: dict, b: dict) -> bool:
+    """Same triangle count, RMS radius and shape invariants (within FINGERPRINT_TOLERANCE)"""
+    if not a or not b or a['triangles'] != b['triangles']:
+        return False
+    if abs(a['radius'] - b['radius']) > FINGERPRINT_TOLERANCE * max(a['radius'], b['radius']):
+        return False
+    return bool(np.all(np.abs(np.subtract(a['invariants'], b['invariants'])) <= FINGERPRINT_TOLERANCE))
+
+
+def rebase_stats(stats: dict, fingerprint: dict) -> dict:
+    """Stats of a matching model moved to the position of the model with this fingerprint"""
+    shift = np.subtract(fingerprint['centroid'], stats['fingerprint']['centroid'])
+    rebased = dict(stats, fingerprint=fingerprint)
+    rebased['bbox'] = {'min': (np.asarray(stats['bbox']['min']) + shift).tolist(),
+                       'max': (np.asarray(stats['bbox']['max']) + shift).tolist()}
+    if 'layers' in stats:
+        rebased['layers'] = dict(stats['layers'], z0=stats['layers']['z0'] + float(shift[2]))
+    return rebased
+
+
+class SupportGrid:
+    """
+    Per-cell face aggregates for support estimation, indexed by sorted cell key.
+    Facing is by the normal's z sign in file orientation: column 0 faces down, 1 up.
+    Steep faces are kept in two kinds (last axis): 0 overhangs, 1 bed contact,
+    i.e. faces within SUPPORT_MIN_GAP_MM of the lowest point seen so far.
+    """
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.int64)
+        self.steep_area = np.zeros((0, 2, 2))    # projected area of steep faces
+        self.steep_area_z = np.zeros((0, 2, 2))  # the same, times height
+        self.steep_true_area = np.zeros((0, 2, 2))
+        self.steep_min_z = np.zeros((0, 2, 2))
+        self.min_z = np.zeros((0, 2))            # any non-vertical face
+        self.max_z = np.zeros((0, 2))
+        self.bed_z = np.inf
+
+    def _lower_bed(self, bed_z: float):
+        """Move bed contact cells that the new, lower bed level leaves hanging to the overhangs"""
+        self.bed_z = bed_z
+        lifted = self.steep_min_z[:, :, 1] > bed_z
+        if not lifted.any():
+            return
+        for column in (self.steep_area, self.steep_area_z, self.steep_true_area):
+            column[:, :, 0] += np.where(lifted, column[:, :, 1], 0.0)
+            column[:, :, 1][lifted] = 0.0
+        np.minimum(self.steep_min_z[:, :, 0], np.where(lifted, self.steep_min_z[:, :, 1], np.inf),
+                   out=self.steep_min_z[:, :, 0])
+        self.steep_min_z[:, :, 1][lifted] = np.inf
+
+    def add(self, keys, z, weight, cos, bed_z):
+        """
+        Fold one block of samples (cell key, height, projected area share, normal cosine) in.
+        Steep samples at or below bed_z are kept apart as bed contact.
+        """
+        if bed_z < self.bed_z:
+            self._lower_bed(bed_z)
+        if len(keys) == 0:
+            return
+        cells, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        z = z.astype(np.float64)
+        weight = weight.astype(np.float64)
+        up = (cos > 0).astype(np.int64)
+        steep = np.abs(cos) > np.cos(np.radians(OVERHANG_ANGLE))
+        slot = inverse * 2 + up
+        size = len(cells) * 2
+        steep_slot = (slot * 2 + (z <= bed_z))[steep]
+        steep_z = z[steep]
+        steep_weight = weight[steep]
+
+        block_area = np.bincount(steep_slot, weights=steep_weight, minlength=size * 2)
+        block_area_z = np.bincount(steep_slot, weights=steep_weight * steep_z, minlength=size * 2)
+        block_true = np.bincount(steep_slot, weights=steep_weight / np.abs(cos[steep]), minlength=size * 2)
+        block_steep_min = np.full(size * 2, np.inf)
+        np.minimum.at(block_steep_min, steep_slot, steep_z)
+        block_min = np.full(size, np.inf)
+        np.minimum.at(block_min, slot, z)
+        block_max = np.full(size, -np.inf)
+        np.maximum.at(block_max, slot, z)
+
+        merged = np.union1d(self.keys, cells)
+        old = np.searchsorted(merged, self.keys)
+        new = np.searchsorted(merged, cells)
+
+        def combine(current, block, fill, reduce):
+            column = np.full((len(merged),) + current.shape[1:], fill)
+            column[old] = current
+            column[new] = reduce(column[new], block.reshape((-1,) + current.shape[1:]))
+            return column
+
+        self.steep_area = combine(self.steep_area, block_area, 0.0, np.add)
+        self.steep_area_z = combine(self.steep_area_z, block_area_z, 0.0, np.add)
+        self.steep_true_area = combine(self.steep_true_area, block_true, 0.0, np.add)
+        self.steep_min_z = combine(self.steep_min_z, block_steep_min, np.inf, np.minimum)
+        self.min_z = combine(self.min_z, block_min, np.inf, np.minimum)
+        self.max_z = combine(self.max_z, block_max, -np.inf, np.maximum)
+        self.keys = merged
+
+    def support(self, orientation: float, z_base: float) -> dict:
+        """Overhang area, support area and volume; orientation -1 for inverted meshes"""
+        down, up = (0, 1) if orientation > 0 else (1, 0)
+        overhang_area = float(self.steep_true_area[:, down, 0].sum())
+        area = self.steep_area[:, down, 0]
+        cells = area > 0
+        if not cells.any():
+            return {'overhangArea': overhang_area, 'supportArea': 0.0, 'supportVolume': 0.0}
+        area = area[cells]
+        height = self.steep_area_z[cells, down, 0] / area
+        lowest = self.steep_min_z[cells, down, 0]
+        top, bottom = self.max_z[cells, up], self.min_z[cells, up]
+
+        # Upward surface entirely below the overhang: stand on its top; partly below: on its lowest point
+        floor = np.where(top < lowest, top, np.where(bottom < lowest, bottom, z_base))
+        gap = height - floor
+        needs = gap > SUPPORT_MIN_GAP_MM
+        return {
+            'overhangArea': overhang_area,
+            'supportArea': float(area[needs].sum()),
+            'supportVolume': float((area * gap)[needs].sum())
+        }
+
+
+class MeshAccumulator:
+    """Accumulates geometry statistics over triangle blocks"""
+
+    def __init__(self):
+        self.triangles = 0
+        self.signed_volume = 0.0
+        self.area = 0.0
+        self.mins = np.full(3, np.inf)
+        self.maxs = np.full(3, -np.inf)
+        self.support_grid = SupportGrid()
+        self.fingerprint = FingerprintAccumulator()
+
+    def add(self, tris: np.ndarray):
+        if len(tris) == 0:
+            return
+        v0, v1, v2 = tris[:, 0], tris[:, 1], tris[:, 2]
+        cross = np.cross(v1 - v0, v2 - v0)
+
+        # Signed tetrahedron volumes against the origin: v0 . (v1 x v2) / 6
+        self.signed_volume += float(np.einsum('ij,ij->', v0, np.cross(v1, v2))) / 6.0
+        double_area = np.sqrt(np.einsum('ij,ij->i', cross, cross))
+        self.area += float(double_area.sum()) / 2.0
+
+        flat = tris.reshape(-1, 3)
+        np.minimum(self.mins, flat.min(axis=0), out=self.mins)
+        np.maximum(self.maxs, flat.max(axis=0), out=self.maxs)
+        self.triangles += len(tris)
+
+        self._add_overhang_samples(tris, cross[:, 2], double_area)
+        self.fingerprint.add(tris, double_area)
+
+    def _add_overhang_samples(self, tris, nz, double_area):
+        cos = np.divide(nz, double_area, out=np.zeros_like(nz), where=double_area > 0)
+
+        a, b, c = tris[:, 0], tris[:, 1], tris[:, 2]
+        scale = 1.0 / SUPPORT_CELL_MM
+        lo = np.floor(np.minimum(np.minimum(a[:, :2], b[:, :2]), c[:, :2]) * scale).astype(np.int64)
+        hi = np.floor(np.maximum(np.maximum(a[:, :2], b[:, :2]), c[:, :2]) * scale).astype(np.int64)
+        z = ((a[:, 2] + b[:, 2] + c[:, 2]) / 3.0).astype(np.float32)
+        projected = (np.abs(nz) / 2.0).astype(np.float32)
+        cos = cos.astype(np.float32)
+
+        # Vertical faces neither need nor give support
+        keep = np.abs(cos) > 1e-3
+        # Most faces of a fine mesh fall into one cell; only larger faces are expanded
+        span = hi - lo + 1
+        counts = span[:, 0] * span[:, 1]
+        single = keep & (counts == 1)
+        samples = [(_cell_keys(lo[single, 0], lo[single, 1]), z[single], projected[single], cos[single])]
+
+        multi = np.flatnonzero(keep & (counts > 1))
+        if len(multi):
+            n = counts[multi]
+            face = np.repeat(multi, n)
+            offsets = np.arange(len(face)) - np.repeat(np.cumsum(n) - n, n)
+            width = span[face, 0]
+            samples.append((
+                _cell_keys(lo[face, 0] + offsets % width, lo[face, 1] + offsets // width),
+                z[face], projected[face] / counts[face], cos[face]
+            ))
+        bed_z = self.mins[2] + SUPPORT_MIN_GAP_MM
+        self.support_grid.add(*(np.concatenate(column) for column in zip(*samples)), bed_z)
+
+    def _support(self) -> dict:
+        # Outward normals point the other way on inverted (negative volume) meshes
+        orientation = 1.0 if self.signed_volume >= 0 else -1.0
+        return {
+            'overhangAngle': OVERHANG_ANGLE,
+            **self.support_grid.support(orientation, self.mins[2])
+        }
+
+    def result(self) -> dict:
+        if self.triangles == 0:
+            raise ValueError("Mesh contains no triangles")
+        size = self.maxs - self.mins
+        volume_mm3 = abs(self.signed_volume)
+        return {
+            'version': ANALYSIS_VERSION,
+            'triangles': self.triangles,
+            'volume_mm3': volume_mm3,
+            'volume_cm3': volume_mm3 / 1000,
+            'signed_volume_mm3': self.signed_volume,
+            'area_mm2': self.area,
+            'bbox': {'min': self.mins.tolist(), 'max': self.maxs.tolist()},
+            'dimensions': {'x': float(size[0]), 'y': float(size[1]), 'z': float(size[2])},
+            'support': self._support(),
+            'fingerprint': self.fingerprint.result(volume_mm3),
+        }
+
+
+def analyze_blocks(blocks) -> dict:
+    """Run the fused geometry pass over an iterable of triangle blocks"""
+    acc = MeshAccumulator()
+    for tris in blocks:
+        acc.add(tris)
+    return acc.result()
+
+
+def analyze_mesh(file_path: str, block_size: int = BLOCK_TRIANGLES) -> dict:
+    """
+    Analyze a model file with bounded memory
+    Args:
+        file_path: Path to STL (binary/ASCII, .gz, .zst), 3MF or OBJ file (units: mm)
+        block_size: Number of triangles processed per vectorized step
+    Returns:
+        dict with triangles, volume_mm3, volume_cm3, area_mm2, bbox, dimensions, support,
+        fingerprint
+    """
+    return analyze_blocks(iter_triangle_blocks(file_path, block_size))
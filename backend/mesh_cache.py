@@ -0,0 +1,161 @@
+"""
+Content-addressed cache of mesh analysis results.
+
+Entries are keyed by the SHA-256 of the uploaded bytes and hold geometry
+only (volume, area, bbox, triangle count, layer profile...), never prices,
+so one entry serves every material / scale / infill combination.
+
+Lookups go to an in-process LRU first and then to the `mesh_analysis`
+Mongo collection, which is trimmed by total entry size (least recently
+used entries are evicted first). Hits served from memory still refresh
+lastUsed in Mongo, at most once per MESH_CACHE_TOUCH_SECONDS per entry, so
+entries that are popular in one process are not evicted as unused. The
+collection size is kept as a running total of this process's writes; it is
+recounted from Mongo every RECOUNT_WRITES writes (other processes write
+too) and before anything is evicted.
+
+Entries also carry the geometric fingerprint of their mesh (see
+mesh_analysis); `stats.fingerprint.triangles` is indexed (db_indexes) so
+re-exported copies of a model can be found without comparing every entry.
+
+Configuration (environment):
+    MESH_CACHE_MEMORY_BYTES  in-process LRU budget (default: 32 MB)
+    MESH_CACHE_STORE_BYTES   Mongo collection budget (default: 512 MB)
+    MESH_CACHE_TOUCH_SECONDS least interval between lastUsed writes for memory hits (default: 300)
+"""
+import os
+from datetime import datetime
+
+import bson
+from cachetools import LRUCache, TTLCache
+from pymongo import ReturnDocument
+
+MEMORY_BYTES = int(os.environ.get('MESH_CACHE_MEMORY_BYTES', 32 * 1024 * 1024))
+STORE_BYTES = int(os.environ.get('MESH_CACHE_STORE_BYTES', 512 * 1024 * 1024))
+TOUCH_SECONDS = int(os.environ.get('MESH_CACHE_TOUCH_SECONDS', 300))
+RECOUNT_WRITES = 100
+
+
+def _entry_size(entry: dict) -> int:
+    return len(bson.encode(entry))
+
+
+class MeshCache:
+    def __init__(self, memory_bytes: int = MEMORY_BYTES, store_bytes: int = STORE_BYTES):
+        self.collection = None
+        self.store_bytes = store_bytes
+        self.memory = LRUCache(maxsize=memory_bytes, getsizeof=_entry_size)
+        # Digests whose lastUsed was written recently
+        self.touched = TTLCache(maxsize=10000, ttl=TOUCH_SECONDS)
+        self.stored_bytes = None  # running total of the collection's entry sizes
+        self.writes = 0
+
+    def set_db(self, database):
+        self.collection = database.mesh_analysis
+
+    async def get(self, digest: str):
+        """Return the cached entry for a file hash, or None"""
+        entry = self.memory.get(digest)
+        if entry is not None:
+            if self.collection is not None and digest not in self.touched:
+                self.touched[digest] = True
+                await self.collection.update_one({"_id": digest}, {"$set": {"lastUsed": datetime.utcnow()}})
+            return entry
+        if self.collection is None:
+            return None
+        doc = await self.collection.find_one_and_update(
+            {"_id": digest},
+            {"$set": {"lastUsed": datetime.utcnow()}},
+            projection={"_id": 0, "size": 0, "lastUsed": 0, "createdAt": 0}
+        )
+        if doc is not None:
+            self.touched[digest] = True
+            self._remember(digest, doc)
+        return doc
+
+    async def put(self, digest: str, entry: dict):
+        """Store a new entry (stats, fileUrl, ...) for a file hash"""
+        self._remember(digest, entry)
+        if self.collection is None:
+            return
+        now = datetime.utcnow()
+        size = _entry_size(entry)
+        old = await self.collection.find_one_and_update(
+            {"_id": digest},
+            {"$set": {**entry, "size": size, "lastUsed": now},
+             "$setOnInsert": {"createdAt": now}},
+            projection={"size": 1},
+            upsert=True
+        )
+        self.touched[digest] = True
+        await self._account(size - ((old or {}).get('size') or 0))
+
+    async def update(self, digest: str, fields: dict):
+        """Add derived results (e.g. a layer profile) to an existing entry"""
+        entry = self.memory.get(digest)
+        if entry is not None:
+            self._remember(digest, {**entry, **fields})
+        if self.collection is not None:
+            doc = await self.collection.find_one_and_update(
+                {"_id": digest}, {"$set": fields},
+                projection={"_id": 0, "lastUsed": 0, "createdAt": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            if doc is not None:
+                old_size = doc.pop('size', None) or 0
+                size = _entry_size(doc)
+                await self.collection.update_one({"_id": digest}, {"$set": {"size": size}})
+                await self._account(size - old_size)
+
+    async def fingerprint_candidates(self, triangles: int, limit: int = 50) -> list:
+        """(digest, entry) pairs whose mesh has this many triangles, most recently used first"""
+        if self.collection is None:
+            return [(digest, entry) for digest, entry in list(self.memory.items())
+                    if (entry['stats'].get('fingerprint') or {}).get('triangles') == triangles][:limit]
+        cursor = self.collection.find(
+            {"stats.fingerprint.triangles": triangles},
+            {"size": 0, "lastUsed": 0, "createdAt": 0}
+        ).sort("lastUsed", -1).limit(limit)
+        return [(doc.pop('_id'), doc) async for doc in cursor]
+
+    def _remember(self, digest: str, entry: dict):
+        try:
+            self.memory[digest] = entry
+        except ValueError:
+            # Larger than the whole in-memory budget: keep it in Mongo only
+            pass
+
+    async def _count_bytes(self) -> int:
+        totals = await self.collection.aggregate(
+            [{"$group": {"_id": None, "bytes": {"$sum": "$size"}}}]
+        ).to_list(1)
+        return totals[0]['bytes'] if totals else 0
+
+    async def _account(self, added: int):
+        """Track the collection size after a write of `added` bytes; evict when over budget"""
+        self.writes += 1
+        if self.stored_bytes is None or self.writes % RECOUNT_WRITES == 0:
+            self.stored_bytes = await self._count_bytes()
+        else:
+            self.stored_bytes += added
+            if self.stored_bytes > self.store_bytes:
+                # Evict on the exact total: the running one misses other processes' writes and deletes
+                self.stored_bytes = await self._count_bytes()
+        if self.stored_bytes > self.store_bytes:
+            await self._evict(self.stored_bytes - self.store_bytes)
+
+    async def _evict(self, excess: int):
+        """Drop least recently used entries totalling at least `excess` bytes"""
+        victims = []
+        async for doc in self.collection.find({}, {"size": 1}).sort("lastUsed", 1):
+            victims.append(doc['_id'])
+            excess -= doc.get('size', 0)
+            self.stored_bytes -= doc.get('size', 0)
+            if excess <= 0:
+                break
+        await self.collection.delete_many({"_id": {"$in": victims}})
+        for digest in victims:
+            self.memory.pop(digest, None)
+
+
+mesh_cache = MeshCache()
@@ -0,0 +1,112 @@
+"""
+Mesh integrity checks.
+
+Vertices are welded by quantizing them relative to the bounding box minimum
+to INTEGRITY_QUANT_MM (coarser for parts over ~2 m, so that every vertex
+packs into one int64 key). Every triangle contributes its three directed
+edges, and sorting the undirected edge keys (np.unique) counts how many
+faces share each edge:
+
+- 1 face: open boundary (hole in the surface)
+- more than 2 faces: non-manifold edge
+- 2 faces walking the edge in the same direction: inconsistent winding
+
+Triangles with repeated welded vertices or zero area are degenerate and
+are left out of the edge checks. Everything is sort based, O(n log n).
+"""
+import numpy as np
+
+from mesh_analysis import BLOCK_TRIANGLES, iter_triangle_blocks
+
+# Vertex welding grid (mm): exporters round coordinates differently
+INTEGRITY_QUANT_MM = 0.001
+# Bits per axis of a packed vertex key
+_AXIS_BITS = 21
+_AXIS_MAX = (1 << _AXIS_BITS) - 1
+# Twice the triangle area (mm²) below which a triangle is degenerate
+DEGENERATE_AREA = 1e-9
+
+
+def _welding_step(bbox: dict) -> float:
+    """Quantization step (mm) that keeps every vertex of the bounding box within _AXIS_BITS"""
+    extent = float(np.max(np.subtract(bbox['max'], bbox['min']), initial=0))
+    return max(INTEGRITY_QUANT_MM, extent / _AXIS_MAX)
+
+
+def _vertex_keys(tris: np.ndarray, origin: np.ndarray, step: float) -> np.ndarray:
+    """Pack quantized vertex coordinates (relative to origin) into int64 keys, shape (n, 3)"""
+    q = np.rint((tris - origin) / step).astype(np.int64)
+    # Only guards against rounding at the bounding box faces
+    np.clip(q, 0, _AXIS_MAX, out=q)
+    return (q[..., 0] << (2 * _AXIS_BITS)) | (q[..., 1] << _AXIS_BITS) | q[..., 2]
+
+
+def check_integrity(file_path: str, bbox: dict, block_size: int = BLOCK_TRIANGLES) -> dict:
+    """
+    Boundary, non-manifold, winding and degenerate-triangle counts
+    Args:
+        file_path: Mesh file readable by mesh_analysis
+        bbox: Bounding box from analyze_mesh (origin and size of the welding grid)
+    Returns:
+        dict with vertices, edges, boundaryEdges, nonManifoldEdges, flippedEdges,
+        degenerateTriangles, watertight, consistentWinding, ok
+    """
+    origin = np.asarray(bbox['min'], dtype=np.float64)
+    step = _welding_step(bbox)
+    keys = []
+    degenerate = 0
+    for tris in iter_triangle_blocks(file_path, block_size):
+        cross = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+        flat = np.einsum('ij,ij->i', cross, cross) <= DEGENERATE_AREA ** 2
+        k = _vertex_keys(tris, origin, step)
+        collapsed = (k[:, 0] == k[:, 1]) | (k[:, 1] == k[:, 2]) | (k[:, 2] == k[:, 0])
+        bad = flat | collapsed
+        degenerate += int(bad.sum())
+        keys.append(k[~bad])
+
+    faces = np.concatenate(keys) if keys else np.empty((0, 3), dtype=np.int64)
+    del keys
+    vertex_keys, ids = np.unique(faces, return_inverse=True)
+    vertices = len(vertex_keys)
+    # Only the welded vertex ids are needed from here on, at half the size
+    del faces, vertex_keys
+    ids = ids.reshape(-1, 3).astype(np.int32 if vertices < 2 ** 31 else np.int64)
+
+    # Directed edges a->b of every face, keyed by the unordered pair
+    start = ids.reshape(-1)
+    end = ids[:, [1, 2, 0]].reshape(-1)
+    low = np.minimum(start, end)
+    forward = start < end
+    edge_keys, inverse, counts = np.unique(low.astype(np.int64) * vertices + np.maximum(start, end),
+                                           return_inverse=True, return_counts=True)
+    forward_counts = np.bincount(inverse.reshape(-1), weights=forward, minlength=len(edge_keys))
+
+    boundary = int((counts == 1).sum())
+    non_manifold = int((counts > 2).sum())
+    # A properly oriented shared edge is walked once in each direction
+    flipped = int(((counts == 2) & (forward_counts != 1)).sum())
+    return {
+        "vertices": vertices,
+        "edges": len(edge_keys),
+        "boundaryEdges": boundary,
+        "nonManifoldEdges": non_manifold,
+        "flippedEdges": flipped,
+        "degenerateTriangles": degenerate,
+        "watertight": boundary == 0 and non_manifold == 0,
+        "consistentWinding": flipped == 0,
+        "ok": boundary == 0 and non_manifold == 0 and flipped == 0
+    }
+
+
+def describe_problems(integrity: dict) -> list:
+    """Human-readable (Russian) list of integrity problems for the operator"""
+    problems = []
+    if integrity.get('boundaryEdges'):
+        problems.append(f"открытые края: {integrity['boundaryEdges']}")
+    if integrity.get('nonManifoldEdges'):
+        problems.append(f"неманифолдные рёбра: {integrity['nonManifoldEdges']}")
+    if integrity.get('flippedEdges'):
+        problems.append(f"перевёрнутые нормали: {integrity['flippedEdges']}")
+    if integrity.get('degenerateTriangles'):
+        problems.append(f"вырожденные треугольники: {integrity['degenerateTriangles']}")
+    return problems
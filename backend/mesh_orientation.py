@@ -0,0 +1,271 @@
+"""
+Print orientation search.
+
+A part can only rest stably on a face of its convex hull, so the candidate
+"up" directions are the current orientation plus the reverse normals of the
+FACE_CANDIDATES largest hull faces (laying that face on the bed). The hull
+is taken over the vertices that are extreme along HULL_DIRECTIONS sampled
+directions: a few dozen points found in one streaming pass, whose hull is
+then built exactly; coplanar hull triangles are merged into one face.
+
+Every candidate is scored at once: each triangle block is projected onto all
+candidate frames with one matrix product, accumulating per candidate extents
+(build-volume fit and height), support volume to the bed and bed contact
+area. The winner is then analyzed in full (stats, supports, layer profile)
+in its new orientation.
+"""
+import itertools
+
+import numpy as np
+
+from mesh_analysis import OVERHANG_ANGLE, iter_triangle_blocks
+from mesh_slicing import analyze_with_layers
+import pricing
+
+# Printer build volume (mm)
+BUILD_VOLUME = (300.0, 300.0, 330.0)
+
+FACE_CANDIDATES = 16
+HULL_DIRECTIONS = 64
+# Triples of hull points tested per matrix product
+HULL_TRIPLES_CHUNK = 8192
+
+# Candidate matrices are (block × candidates); keep the blocks smaller than for analysis
+ORIENT_BLOCK = 16384
+
+# Bed contact and hull coplanarity tolerance (mm)
+CONTACT_TOLERANCE_MM = 0.1
+# Faces within this angle of straight down can rest on the bed
+CONTACT_ANGLE = 5
+
+# Orientations with less bed contact than this tend to detach mid-print
+MIN_CONTACT_MM2 = 25.0
+LOW_CONTACT_PENALTY_SECONDS = 600.0
+SCORE_LAYER_HEIGHT = 0.2
+# Keep the uploaded orientation unless another one is this much better
+MIN_GAIN = 0.05
+
+
+def fibonacci_directions(count: int) -> np.ndarray:
+    """Roughly uniform unit vectors on the sphere, shape (count, 3)"""
+    i = np.arange(count) + 0.5
+    z = 1 - 2 * i / count
+    r = np.sqrt(1 - z * z)
+    phi = np.pi * (1 + 5 ** 0.5) * i
+    return np.stack([r * np.cos(phi), r * np.sin(phi), z], axis=1)
+
+
+def rotations_for(up: np.ndarray) -> np.ndarray:
+    """Rotation matrices (K, 3, 3) whose rows are new x, y, z axes; row z is up"""
+    up = up / np.linalg.norm(up, axis=1, keepdims=True)
+    helper = np.where(np.abs(up[:, :1]) > 0.9, [[0.0, 1.0, 0.0]], [[1.0, 0.0, 0.0]])
+    e1 = helper - np.sum(helper * up, axis=1, keepdims=True) * up
+    e1 /= np.linalg.norm(e1, axis=1, keepdims=True)
+    e2 = np.cross(up, e1)
+    return np.stack([e1, e2, up], axis=1)
+
+
+def _hull_points(file_path: str, block_size: int):
+    """
+    Pass 1: the vertices extreme along HULL_DIRECTIONS (points of the convex
+    hull), the mesh orientation sign and the bounding box diagonal
+    """
+    directions = fibonacci_directions(HULL_DIRECTIONS)
+    directions32 = directions.astype(np.float32)
+    points = np.empty((0, 3))
+    signed_volume = 0.0
+    mins = np.full(3, np.inf)
+    maxs = np.full(3, -np.inf)
+    for tris in iter_triangle_blocks(file_path, block_size):
+        v0, v1, v2 = tris[:, 0], tris[:, 1], tris[:, 2]
+        signed_volume += float(np.einsum('ij,ij->', v0, np.cross(v1, v2))) / 6.0
+        flat = tris.reshape(-1, 3)
+        # (directions × vertices): argmax along contiguous rows
+        extreme = flat[np.unique((directions32 @ flat.astype(np.float32).T).argmax(axis=1))]
+        points = np.concatenate([points, extreme])
+        points = points[np.unique((directions @ points.T).argmax(axis=1))]
+        np.minimum(mins, flat.min(axis=0), out=mins)
+        np.maximum(maxs, flat.max(axis=0), out=maxs)
+    return points, 1.0 if signed_volume >= 0 else -1.0, float(np.linalg.norm(maxs - mins))
+
+
+def _polygon_area(points: np.ndarray, normal: np.ndarray) -> float:
+    """Area of the convex hull of coplanar points (monotone chain in the plane)"""
+    plane = (points @ rotations_for(normal[None])[0][:2].T).tolist()
+    plane.sort()
+
+    def half(sequence):
+        chain = []
+        for p in sequence:
+            while len(chain) >= 2 and ((chain[-1][0] - chain[-2][0]) * (p[1] - chain[-2][1])
+                                       - (chain[-1][1] - chain[-2][1]) * (p[0] - chain[-2][0])) <= 0:
+                chain.pop()
+            chain.append(p)
+        return chain[:-1]
+
+    ring = np.array(half(plane) + half(plane[::-1]))
+    if len(ring) < 3:
+        return 0.0
+    x, y = ring[:, 0], ring[:, 1]
+    return float(abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2.0)
+
+
+def hull_faces(points: np.ndarray):
+    """
+    Faces of the convex hull of a small point set, largest first
+    Returns:
+        (outward unit normals (F, 3), areas (F,))
+    """
+    normals, offsets, on_plane = [], [], []
+    if len(points) >= 4:
+        triples = np.array(list(itertools.combinations(range(len(points)), 3)))
+        # A triangle of points is on the hull when no point lies beyond its plane
+        for chunk in np.array_split(triples, -(-len(triples) // HULL_TRIPLES_CHUNK)):
+            a, b, c = points[chunk[:, 0]], points[chunk[:, 1]], points[chunk[:, 2]]
+            cross = np.cross(b - a, c - a)
+            length = np.linalg.norm(cross, axis=1)
+            valid = length > 1e-9 * max(float(length.max()), 1e-300)
+            normal = cross[valid] / length[valid, None]
+            offset = np.einsum('ij,ij->i', normal, a[valid])
+            side = points @ normal.T - offset
+            below = (side <= CONTACT_TOLERANCE_MM).all(axis=0)
+            above = (side >= -CONTACT_TOLERANCE_MM).all(axis=0)
+            hull = below ^ above
+            sign = np.where(below, 1.0, -1.0)[hull]
+            normals.append(normal[hull] * sign[:, None])
+            offsets.append(offset[hull] * sign)
+            on_plane.append(np.packbits(np.abs(side[:, hull].T) <= CONTACT_TOLERANCE_MM, axis=1))
+    if not sum(len(n) for n in normals):
+        return np.empty((0, 3)), np.empty(0)
+
+    # Coplanar hull triangles (more than three points on one plane) form one face
+    _, first = np.unique(np.concatenate(on_plane), axis=0, return_index=True)
+    face_normals = np.concatenate(normals)[first]
+    face_offsets = np.concatenate(offsets)[first]
+    areas = np.array([_polygon_area(points[np.abs(points @ n - o) <= CONTACT_TOLERANCE_MM], n)
+                      for n, o in zip(face_normals, face_offsets)])
+    order = np.argsort(areas)[::-1]
+    return face_normals[order], areas[order]
+
+
+def _candidate_ups(file_path: str, block_size: int):
+    points, orientation, diagonal = _hull_points(file_path, block_size)
+    normals, areas = hull_faces(points)
+    normals = normals[areas > 0][:FACE_CANDIDATES]
+    # Put the face on the bed: up is opposite to its outward normal
+    ups = np.concatenate([[[0.0, 0.0, 1.0]], -normals])
+    return ups, orientation, diagonal
+
+
+def _score_candidates(file_path: str, rotations: np.ndarray, orientation: float,
+                      footprint: bool, block_size: int) -> dict:
+    """
+    Pass 2: extents, support volume and bed contact for every candidate at once
+    footprint: also measure X/Y extents (only needed when the model may not fit the bed)
+    """
+    k = len(rotations)
+    axes = rotations if footprint else rotations[:, 2:]
+    frames = axes.reshape(-1, 3).T.astype(np.float32)  # (3, K·axes)
+    ups = rotations[:, 2].T.astype(np.float32)  # (3, K)
+    mins = np.full(frames.shape[1], np.inf)
+    maxs = np.full(frames.shape[1], -np.inf)
+    # Support volume = Σ A·h − h_min·Σ A over overhangs (heights measured from any origin)
+    weighted_height = np.zeros(k)
+    overhang_area = np.zeros(k)
+    # Near-horizontal downward faces: (candidate, highest vertex, area), bed contact is decided at the end
+    resting = []
+
+    steep = np.float32(np.cos(np.radians(OVERHANG_ANGLE)))
+    flat = np.float32(np.cos(np.radians(CONTACT_ANGLE)))
+    for tris in iter_triangle_blocks(file_path, block_size):
+        tris = tris.astype(np.float32)
+        projected = tris.reshape(-1, 3) @ frames
+        np.minimum(mins, projected.min(axis=0), out=mins)
+        np.maximum(maxs, projected.max(axis=0), out=maxs)
+
+        cross = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0]) * np.float32(orientation)
+        double_area = np.sqrt(np.einsum('ij,ij->i', cross, cross))
+        up_component = cross @ ups  # (n, K) = 2·area·cos
+
+        over = np.where(up_component < -steep * double_area[:, None], up_component, 0)
+        centroid_height = ((tris[:, 0] + tris[:, 1] + tris[:, 2]) / 3) @ ups
+        weighted_height -= np.einsum('nk,nk->k', over, centroid_height) / 2.0
+        overhang_area -= over.sum(axis=0) / 2.0
+
+        down = up_component < -flat * double_area[:, None]
+        rows = np.flatnonzero(down.any(axis=1))
+        if len(rows):
+            face, candidate = np.nonzero(down[rows])
+            face = rows[face]
+            top = np.einsum('fvj,jf->fv', tris[face], ups[:, candidate]).max(axis=1)
+            resting.append((candidate, top, double_area[face] / 2.0))
+
+    extents = (maxs - mins).reshape(k, -1)
+    bottom = mins.reshape(k, -1)[:, -1]
+    contact = np.zeros(k)
+    if resting:
+        candidate, top, area = (np.concatenate(column) for column in zip(*resting))
+        on_bed = top <= bottom[candidate] + CONTACT_TOLERANCE_MM
+        contact = np.bincount(candidate[on_bed], weights=area[on_bed], minlength=k)
+    return {
+        "size": extents if footprint else np.column_stack([np.zeros((k, 2)), extents]),
+        "supportVolume": np.maximum(weighted_height - bottom * overhang_area, 0.0),
+        "contactArea": contact
+    }
+
+
+def _fits(size: np.ndarray, scale: float) -> np.ndarray:
+    """Build-volume fit; footprint sizes of zero mean the footprint fits in any orientation"""
+    footprint = np.sort(size[:, :2] * scale, axis=1)
+    bed = sorted(BUILD_VOLUME[:2])
+    return (footprint[:, 0] <= bed[0]) & (footprint[:, 1] <= bed[1]) & (size[:, 2] * scale <= BUILD_VOLUME[2])
+
+
+def _score(metrics: dict, scale: float) -> np.ndarray:
+    """Estimated seconds spent on supports and layer changes; lower is better"""
+    h = SCORE_LAYER_HEIGHT
+    support = (metrics['supportVolume'] * scale ** 3 * pricing.SUPPORT_DENSITY
+               / (pricing.LINE_WIDTH * h) / pricing.INFILL_SPEED)
+    layers = metrics['size'][:, 2] * scale / h * pricing.LAYER_CHANGE_SECONDS
+    penalty = np.where(metrics['contactArea'] * scale ** 2 < MIN_CONTACT_MM2, LOW_CONTACT_PENALTY_SECONDS, 0.0)
+    return support + layers + penalty
+
+
+def _summary(metrics: dict, fits: np.ndarray, score: np.ndarray, i: int) -> dict:
+    return {
+        "fits": bool(fits[i]),
+        "height": float(metrics['size'][i, 2]),
+        "supportVolume": float(metrics['supportVolume'][i]),
+        "contactArea": float(metrics['contactArea'][i]),
+        "score": float(score[i])
+    }
+
+
+def orient_mesh(file_path: str, scale: float = 1.0, block_size: int = ORIENT_BLOCK) -> dict:
+    """
+    Find the print orientation with the least support and layer time that fits the printer
+    Returns:
+        dict with rotation (rows: new x, y, z axes), up, candidates, best and original
+        summaries, and stats (full analysis in the chosen orientation)
+    """
+    ups, orientation, diagonal = _candidate_ups(file_path, block_size)
+    rotations = rotations_for(ups)
+    footprint = diagonal * scale > min(BUILD_VOLUME[:2])
+    metrics = _score_candidates(file_path, rotations, orientation, footprint, block_size)
+    fits = _fits(metrics['size'], scale)
+    score = _score(metrics, scale)
+
+    # Prefer orientations that fit; candidate 0 is the uploaded orientation
+    best = int(np.argmin(np.where(fits, score, score + 1e12)))
+    if fits[0] and score[best] > score[0] * (1 - MIN_GAIN):
+        best = 0
+    rotation = np.eye(3) if best == 0 else rotations[best]
+    return {
+        "scale": scale,
+        "rotation": rotation.tolist(),
+        "up": ups[best].tolist(),
+        "candidates": len(ups),
+        "best": _summary(metrics, fits, score, best),
+        "original": _summary(metrics, fits, score, 0),
+        "stats": analyze_with_layers(file_path, None if best == 0 else rotation)
+    }
@@ -0,0 +1,180 @@
+"""
+Decimated preview meshes for the browser viewer.
+
+Vertices are quantized to 16 bits per axis over the bounding box, then
+clustered on a uniform grid whose resolution is chosen (by binary search on
+a sample of triangles) so that the triangles spanning three different cells
+fit the PREVIEW_TRIANGLES budget. Each cluster is replaced by the mean of its
+vertices; triangles collapsed by clustering are dropped.
+
+The mesh is streamed twice, one triangle block at a time: the first pass
+draws a uniform sample (the triangles with the lowest random priorities),
+the second clusters each block and merges its per-cell coordinate sums into
+a cell map. A preview built before the mesh was analyzed first measures the
+bounding box in a pass of its own. Only the sample, the cell map and the surviving triangles (both
+bounded by the budget) are kept, never the whole mesh.
+
+Binary format (little endian):
+    header   32 bytes: magic 'SPV1', flags (bit 0: 32-bit indices),
+             vertex count, triangle count, origin xyz (float32), step (float32)
+    vertices int16 × 3 per vertex; position in mm = origin + value × step
+    padding  to a multiple of 4 bytes
+    indices  uint16 (or uint32 with flag bit 0) × 3 per triangle
+"""
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from mesh_analysis import BLOCK_TRIANGLES, iter_triangle_blocks
+
+PREVIEW_MAGIC = b'SPV1'
+PREVIEW_TRIANGLES = 60000
+PREVIEW_HEADER = struct.Struct('<4sIII3ff')
+FLAG_UINT32_INDICES = 1
+
+# Triangles sampled when searching the grid resolution
+SEARCH_SAMPLE = 200000
+MAX_GRID = 1 << 16
+
+
+def measure_bbox(file_path: str, block_size: int = BLOCK_TRIANGLES) -> dict:
+    """Bounding box of a mesh file in one streaming pass"""
+    mins = np.full(3, np.inf)
+    maxs = np.full(3, -np.inf)
+    for tris in iter_triangle_blocks(file_path, block_size):
+        flat = tris.reshape(-1, 3)
+        np.minimum(mins, flat.min(axis=0), out=mins)
+        np.maximum(maxs, flat.max(axis=0), out=maxs)
+    if not np.isfinite(mins).all():
+        raise ValueError("Mesh contains no triangles")
+    return {'min': mins.tolist(), 'max': maxs.tolist()}
+
+
+def _grid_origin(bbox: dict):
+    """Origin and step (mm) of the 16-bit grid over the bounding box"""
+    origin = np.asarray(bbox['min'], dtype=np.float64)
+    extent = float(np.max(np.asarray(bbox['max']) - origin))
+    return origin, extent / (MAX_GRID - 1) if extent > 0 else 1.0
+
+
+def _quantized_blocks(file_path: str, origin: np.ndarray, step: float, block_size: int):
+    """Triangle blocks as uint16 grid coordinates, shape (n, 3, 3)"""
+    for tris in iter_triangle_blocks(file_path, block_size):
+        yield np.rint((tris - origin) / step).astype(np.uint16)
+
+
+def _sample(blocks, size: int, seed: int = 0):
+    """Uniform sample of at most `size` triangles and the total triangle count"""
+    rng = np.random.default_rng(seed)
+    sample = np.empty((0, 3, 3), dtype=np.uint16)
+    priority = np.empty(0)
+    total = 0
+    for q in blocks:
+        total += len(q)
+        sample = np.concatenate([sample, q])
+        priority = np.concatenate([priority, rng.random(len(q))])
+        if len(sample) > size:
+            keep = np.argpartition(priority, size)[:size]
+            sample, priority = sample[keep], priority[keep]
+    return sample, total
+
+
+def _cell_keys(q: np.ndarray, grid: int) -> np.ndarray:
+    cells = (q.astype(np.int64) * grid) >> 16
+    return (cells[..., 0] * grid + cells[..., 1]) * grid + cells[..., 2]
+
+
+def _surviving(keys: np.ndarray) -> np.ndarray:
+    """Triangles whose vertices fall into three different cells"""
+    return (keys[:, 0] != keys[:, 1]) & (keys[:, 1] != keys[:, 2]) & (keys[:, 2] != keys[:, 0])
+
+
+def _choose_grid(sample: np.ndarray, total: int, budget: int) -> int:
+    """Finest grid resolution whose (estimated) surviving triangle count fits the budget"""
+    if total <= budget:
+        return MAX_GRID
+    factor = total / len(sample)
+    lo, hi = 2, MAX_GRID
+    while lo < hi:
+        grid = (lo + hi + 1) // 2
+        if _surviving(_cell_keys(sample, grid)).sum() * factor <= budget:
+            lo = grid
+        else:
+            hi = grid - 1
+    return lo
+
+
+def _cluster(blocks, grid: int):
+    """
+    Vertex clusters of the triangles that survive clustering on this grid
+    Returns:
+        (sorted cell keys, coordinate sums (n, 3), vertex counts, surviving triangles as (m, 3) cell keys)
+    """
+    cells = np.empty(0, dtype=np.int64)
+    sums = np.empty((0, 3))
+    counts = np.empty(0, dtype=np.int64)
+    triangles = []
+    for q in blocks:
+        keys = _cell_keys(q, grid)
+        keep = _surviving(keys)
+        q, keys = q[keep], keys[keep]
+        if not len(keys):
+            continue
+        triangles.append(keys)
+        # Dedupe the block's vertices into its cells before merging into the map
+        block_cells, inverse = np.unique(keys.reshape(-1), return_inverse=True)
+        inverse = inverse.reshape(-1)
+        flat = q.reshape(-1, 3).astype(np.float64)
+        block_sums = np.stack([np.bincount(inverse, weights=flat[:, axis], minlength=len(block_cells))
+                               for axis in range(3)], axis=1)
+        block_counts = np.bincount(inverse, minlength=len(block_cells))
+
+        merged = np.union1d(cells, block_cells)
+        merged_sums = np.zeros((len(merged), 3))
+        merged_counts = np.zeros(len(merged), dtype=np.int64)
+        for part_cells, part_sums, part_counts in ((cells, sums, counts), (block_cells, block_sums, block_counts)):
+            index = np.searchsorted(merged, part_cells)
+            merged_sums[index] += part_sums
+            merged_counts[index] += part_counts
+        cells, sums, counts = merged, merged_sums, merged_counts
+    triangles = np.concatenate(triangles) if triangles else np.empty((0, 3), dtype=np.int64)
+    return cells, sums, counts, triangles
+
+
+def build_preview(file_path: str, bbox: dict = None, budget: int = PREVIEW_TRIANGLES,
+                  block_size: int = BLOCK_TRIANGLES) -> bytes:
+    """Encode a vertex-clustered preview of the mesh in the SPV1 format (bbox None: measure it)"""
+    origin, step = _grid_origin(bbox or measure_bbox(file_path, block_size))
+    sample, total = _sample(_quantized_blocks(file_path, origin, step, block_size), SEARCH_SAMPLE)
+    grid = _choose_grid(sample, total, budget)
+    del sample
+    clusters, sums, counts, triangles = _cluster(_quantized_blocks(file_path, origin, step, block_size), grid)
+
+    mean = sums / np.maximum(counts, 1)[:, None]
+    # Shift to the signed range: position = origin + (value + 32768) × step
+    vertices = (np.rint(mean) - 32768).clip(-32768, 32767).astype('<i2')
+
+    wide = len(clusters) > 0xFFFF
+    indices = np.searchsorted(clusters, triangles.reshape(-1)).astype('<u4' if wide else '<u2')
+    header = PREVIEW_HEADER.pack(
+        PREVIEW_MAGIC, FLAG_UINT32_INDICES if wide else 0, len(clusters), len(triangles),
+        *(origin + 32768 * step).astype(np.float32), step
+    )
+    body = vertices.tobytes()
+    return header + body + b'\0' * (-len(body) % 4) + indices.tobytes()
+
+
+def write_preview(file_path: str, dest_path: str, bbox: dict = None, budget: int = PREVIEW_TRIANGLES) -> int:
+    """Build the preview and write it atomically; returns its size in bytes"""
+    data = build_preview(file_path, bbox, budget)
+    # A unique temporary name: threads of one process may build the same preview at once
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(dest_path), suffix='.tmp', delete=False) as f:
+        f.write(data)
+    try:
+        os.replace(f.name, dest_path)
+    except OSError:
+        os.remove(f.name)
+        raise
+    return len(data)
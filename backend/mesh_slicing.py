@@ -0,0 +1,180 @@
+"""
+Slicer-lite: per-layer cross-section area and perimeter of a mesh.
+
+All triangles are intersected with every horizontal layer plane in batched
+numpy operations: each (triangle, plane) pair yields one segment of the
+cross-section contour. Segment lengths summed per layer give the perimeter;
+segments oriented by the face normal give the enclosed area by the
+shoelace formula (holes subtract automatically). Below and above its middle
+vertex a triangle's segments are parallel, so their contributions are
+evaluated from polynomial coefficients computed once per triangle.
+
+The profile is sampled once at a fine pitch and summarized into integrals
+that do not depend on the print layer height, so pricing can derive shell,
+infill and extrusion path length for any layer height / infill / scale.
+"""
+import numpy as np
+
+from mesh_analysis import BLOCK_TRIANGLES, analyze_blocks, iter_triangle_blocks
+from mesh_integrity import check_integrity
+
+# Sampling pitch (mm) and cap on the number of sampled layers
+PROFILE_PITCH = 0.1
+MAX_PROFILE_LAYERS = 2000
+
+# Triangles sliced at once: the ~60 temporary columns of a batch stay in cache
+SLICE_TRIANGLES = 8192
+# Upper bound on (piece, layer) pairs expanded at once (~50 bytes each per array)
+MAX_PAIRS = 1 << 21
+
+
+def _by_z(p, q):
+    """Vertices p, q (x, y, z columns) ordered so that the first is lower"""
+    swap = p[2] > q[2]
+    return (tuple(np.where(swap, b, a) for a, b in zip(p, q)),
+            tuple(np.where(swap, a, b) for a, b in zip(p, q)))
+
+
+def _slice_pieces(first, count, lo, hi, s, e, nx, ny, z0, pitch, layers, areas, perimeters):
+    """
+    Accumulate the planes [first, first + count) of one piece per triangle:
+    its segments run from edge lo-hi to edge s-e. Within a piece all segments
+    are parallel, so with t the height above its first plane the shoelace
+    term is quadratic and the segment length linear in t; the coefficients
+    are computed once per piece.
+    """
+    zf = z0 + (first + 0.5) * pitch
+    # Horizontal slopes (mm per mm of z) of both edges; a flat s-e edge only
+    # meets a plane at s
+    inv1 = 1 / np.where(hi[2] > lo[2], hi[2] - lo[2], np.inf)
+    inv2 = 1 / np.where(e[2] > s[2], e[2] - s[2], np.inf)
+    d1x, d1y = (hi[0] - lo[0]) * inv1, (hi[1] - lo[1]) * inv1
+    d2x, d2y = (e[0] - s[0]) * inv2, (e[1] - s[1]) * inv2
+    p1x, p1y = lo[0] + d1x * (zf - lo[2]), lo[1] + d1y * (zf - lo[2])
+    p2x, p2y = s[0] + d2x * (zf - s[2]), s[1] + d2y * (zf - s[2])
+
+    # Orient segments counter-clockwise around the solid (outward normal on the right)
+    span = np.maximum(count - 1, 0) * pitch
+    vx, vy, wx, wy = p2x - p1x, p2y - p1y, d2x - d1x, d2y - d1y
+    half = span / 2
+    sign = np.copysign(0.5, (vx + wx * half) * -ny + (vy + wy * half) * nx)
+    c0 = sign * (p1x * p2y - p1y * p2x)
+    c1 = sign * (p1x * d2y - p1y * d2x + d1x * p2y - d1y * p2x)
+    c2 = sign * (d1x * d2y - d1y * d2x)
+    l0 = np.sqrt(vx * vx + vy * vy)
+    ex, ey = vx + wx * span, vy + wy * span
+    l1 = (np.sqrt(ex * ex + ey * ey) - l0) / np.where(span > 0, span, np.inf)
+
+    # First plane of every piece, then the (piece, later plane) pairs
+    used = count > 0
+    areas += np.bincount(first[used], weights=c0[used], minlength=layers)
+    perimeters += np.bincount(first[used], weights=l0[used], minlength=layers)
+    pieces = np.flatnonzero(count > 1)
+    extra = count[pieces] - 1
+    ends = np.cumsum(extra)
+    start = 0
+    while start < len(pieces):
+        # Split so that one expansion stays under MAX_PAIRS
+        stop = max(int(np.searchsorted(ends, (ends[start - 1] if start else 0) + MAX_PAIRS, 'right')), start + 1)
+        c = extra[start:stop]
+        total = int(c.sum())
+        piece = np.repeat(pieces[start:stop], c)
+        offsets = np.arange(1, total + 1) - np.repeat(np.cumsum(c) - c, c)
+        k = first[piece] + offsets
+        t = offsets * pitch
+        areas += np.bincount(k, weights=c0[piece] + t * (c1[piece] + t * c2[piece]), minlength=layers)
+        perimeters += np.bincount(k, weights=l0[piece] + t * l1[piece], minlength=layers)
+        start = stop
+
+
+def _slice_batch(tris: np.ndarray, z0: float, pitch: float, layers: int,
+                 areas: np.ndarray, perimeters: np.ndarray):
+    """Accumulate area and perimeter contributions of a triangle batch"""
+    # Coordinate columns: x[i] is the x of every triangle's vertex i
+    x, y, z = (np.ascontiguousarray(tris[:, :, axis].T) for axis in range(3))
+    ux, uy, uz = x[1] - x[0], y[1] - y[0], z[1] - z[0]
+    vx, vy, vz = x[2] - x[0], y[2] - y[0], z[2] - z[0]
+    nx, ny = uy * vz - uz * vy, uz * vx - ux * vz
+
+    # Each triangle's vertices by z: lo, mid, hi
+    lo, mid = _by_z((x[0], y[0], z[0]), (x[1], y[1], z[1]))
+    mid, hi = _by_z(mid, (x[2], y[2], z[2]))
+    lo, mid = _by_z(lo, mid)
+
+    # Layer k samples the plane z0 + (k + 0.5) * pitch. Edge lo-hi crosses
+    # every plane of the triangle; the other crossing is on lo-mid below the
+    # mid vertex and on mid-hi from it up.
+    k_first = np.maximum(np.ceil((lo[2] - z0) / pitch - 0.5), 0).astype(np.int64)
+    k_last = np.minimum(np.floor((hi[2] - z0) / pitch - 0.5), layers - 1).astype(np.int64)
+    k_last = np.where(hi[2] > lo[2], k_last, k_first - 1)
+    k_mid = np.clip(np.ceil((mid[2] - z0) / pitch - 0.5).astype(np.int64), k_first, k_last + 1)
+    _slice_pieces(k_first, k_mid - k_first, lo, hi, lo, mid, nx, ny, z0, pitch, layers, areas, perimeters)
+    _slice_pieces(k_mid, k_last + 1 - k_mid, lo, hi, mid, hi, nx, ny, z0, pitch, layers, areas, perimeters)
+
+
+def iter_oriented_blocks(file_path: str, rotation=None, block_size: int = BLOCK_TRIANGLES):
+    """Triangle blocks, rotated by a 3×3 matrix (rows: new x, y, z axes) when given"""
+    if rotation is None:
+        yield from iter_triangle_blocks(file_path, block_size)
+        return
+    transposed = np.asarray(rotation, dtype=np.float64).T
+    for tris in iter_triangle_blocks(file_path, block_size):
+        yield tris @ transposed
+
+
+def layer_profile(file_path: str, bbox: dict, block_size: int = BLOCK_TRIANGLES,
+                  rotation=None) -> dict:
+    """
+    Cross-section area and perimeter per sampled layer
+    Args:
+        file_path: Mesh file readable by mesh_analysis
+        bbox: Bounding box from analyze_mesh (gives the z range)
+        rotation: Optional print orientation (see iter_oriented_blocks)
+    Returns:
+        dict with pitch, z0, areas (mm²), perimeters (mm) and the summary
+        integrals used by pricing: height, perimeterIntegral (mm²),
+        horizontalArea (mm²)
+    """
+    z0, z1 = bbox['min'][2], bbox['max'][2]
+    height = max(z1 - z0, 0.0)
+    pitch = max(PROFILE_PITCH, height / MAX_PROFILE_LAYERS)
+    layers = max(int(np.ceil(height / pitch)), 1)
+
+    areas = np.zeros(layers)
+    perimeters = np.zeros(layers)
+    for tris in iter_oriented_blocks(file_path, rotation, block_size):
+        for start in range(0, len(tris), SLICE_TRIANGLES):
+            _slice_batch(tris[start:start + SLICE_TRIANGLES], z0, pitch, layers, areas, perimeters)
+
+    areas = np.abs(areas)
+    # Exposed horizontal surface: area that appears or disappears between layers
+    horizontal = float(np.abs(np.diff(areas, prepend=0, append=0)).sum())
+    return {
+        "pitch": pitch,
+        "z0": z0,
+        "areas": np.round(areas, 3).tolist(),
+        "perimeters": np.round(perimeters, 3).tolist(),
+        "height": height,
+        "perimeterIntegral": float(perimeters.sum() * pitch),
+        "horizontalArea": horizontal
+    }
+
+
+def complete_analysis(file_path: str, stats: dict, rotation=None) -> dict:
+    """
+    Add the layer profile to stats from the fused pass (analyze_mesh) and, in
+    the uploaded orientation, the mesh integrity report
+    """
+    stats = dict(stats)
+    stats['layers'] = layer_profile(file_path, stats['bbox'], rotation=rotation)
+    if rotation is None:
+        stats['integrity'] = check_integrity(file_path, stats['bbox'])
+    return stats
+
+
+def analyze_with_layers(file_path: str, rotation=None) -> dict:
+    """
+    Geometry stats plus layer profile, optionally reoriented; in the uploaded
+    orientation also the mesh integrity report
+    """
+    return complete_analysis(file_path, analyze_blocks(iter_oriented_blocks(file_path, rotation)), rotation)
@@ -0,0 +1,45 @@
+"""
+Opaque tokens for analyzed meshes.
+
+Clients refer to an analyzed mesh (quotes, previews, ordering) by a random
+token rather than by the SHA-256 of its file: the digest would tell anyone
+holding a copy of a model whether it was uploaded, and would open its
+preview to them. Tokens live in the `mesh_tokens` collection, map to the
+file digest server-side and stop resolving MESH_TOKEN_TTL seconds (default:
+7 days) after they were issued; a TTL index (db_indexes) deletes them.
+"""
+import os
+import re
+import secrets
+from datetime import datetime, timedelta
+
+TOKEN_TTL = timedelta(seconds=int(os.environ.get('MESH_TOKEN_TTL', 7 * 24 * 3600)))
+TOKEN_BYTES = 24
+_TOKEN_RE = re.compile(r'[A-Za-z0-9_-]{32}')
+
+db = None
+
+
+def set_db(database):
+    global db
+    db = database
+
+
+def is_token(value: str) -> bool:
+    return bool(_TOKEN_RE.fullmatch(value))
+
+
+async def issue(digest: str) -> str:
+    """A new token for the mesh with this file digest"""
+    token = secrets.token_urlsafe(TOKEN_BYTES)
+    now = datetime.utcnow()
+    await db.mesh_tokens.insert_one({"_id": token, "digest": digest, "createdAt": now, "expiresAt": now + TOKEN_TTL})
+    return token
+
+
+async def resolve(token: str):
+    """The file digest of a token, or None if it is unknown or has expired"""
+    if not is_token(token):
+        return None
+    doc = await db.mesh_tokens.find_one({"_id": token, "expiresAt": {"$gt": datetime.utcnow()}}, {"digest": 1})
+    return doc['digest'] if doc else None
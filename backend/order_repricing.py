@@ -0,0 +1,156 @@
+"""
+Background repricing of open orders after a material price or print settings change.
+
+Open orders (REPRICE_STATUSES) whose pricingVersion differs from the
+current pricing snapshot are streamed with a projection, priced in
+batches as numpy arrays (pricing.cost_breakdown, the same rules as new
+orders) and written back with unordered bulk_write. Orders whose cost
+changes also get an entry in the `order_price_audit` collection with the
+old and new cost; the rest only get the new pricingVersion, so a rerun
+skips them. Operator prices (finalCost) are never touched.
+
+A pause after every batch hands the event loop and Mongo back to live
+requests. Changes arriving while a run is in progress are merged and
+handled by one more run afterwards.
+
+Configuration (environment):
+    REPRICE_BATCH_SIZE     orders per bulk_write (default: 1000)
+    REPRICE_PAUSE_SECONDS  pause after each batch (default: 0.05)
+"""
+import asyncio
+import os
+from datetime import datetime
+
+import numpy as np
+from pymongo import UpdateOne
+
+import pricing
+from pricing_snapshot import pricing_store
+
+BATCH_SIZE = int(os.environ.get('REPRICE_BATCH_SIZE', 1000))
+PAUSE_SECONDS = float(os.environ.get('REPRICE_PAUSE_SECONDS', 0.05))
+REPRICE_STATUSES = ["pending", "approved"]
+
+
+def reprice_batch(orders: list, snapshot) -> list:
+    """
+    New estimatedCost of every order and of each of its parts
+    Returns:
+        list of (order total or None, [part costs] or None), in order
+    """
+    # One row per priced item: single-file orders and every part of multi-part orders
+    priced, weight, print_time, price = [], [], [], []
+    for order in orders:
+        material = snapshot.material(order.get('materialId'))
+        items = order.get('parts') or [order]
+        for item in items:
+            ok = material is not None and item.get('weight') is not None and item.get('printTime') is not None
+            priced.append(ok)
+            if ok:
+                weight.append(item['weight'])
+                print_time.append(item['printTime'])
+                price.append(material.get('price', pricing.DEFAULT_MATERIAL_PRICE))
+            else:
+                weight.append(0.0)
+                print_time.append(0.0)
+                price.append(0.0)
+
+    costs = pricing.cost_breakdown(np.asarray(weight, dtype=np.float64), np.asarray(print_time, dtype=np.float64),
+                                   np.asarray(price, dtype=np.float64), snapshot.settings)['totalCost']
+    costs = np.broadcast_to(costs, (len(priced),)).tolist()
+
+    results = []
+    row = 0
+    for order in orders:
+        count = len(order.get('parts') or [order])
+        rows = range(row, row + count)
+        row += count
+        part_costs = [costs[r] if priced[r] else None for r in rows]
+        known = [cost for cost in part_costs if cost is not None]
+        total = sum(known) if known else None
+        results.append((total, part_costs if order.get('parts') else None))
+    return results
+
+
+class OrderRepricer:
+    def __init__(self):
+        self.db = None
+        self.task = None
+        self.pending = None  # material ids to reprice next; "all" for every material
+        self.status = {"running": False, "lastRun": None}
+
+    def set_db(self, database):
+        self.db = database
+
+    def schedule(self, material_ids: list = None):
+        """Queue repricing of open orders of these materials (None: all of them)"""
+        if material_ids is None or self.pending == "all":
+            self.pending = "all"
+        else:
+            self.pending = (self.pending or set()) | set(material_ids)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        while self.pending is not None:
+            scope, self.pending = self.pending, None
+            try:
+                await self.run(pricing_store.snapshot, None if scope == "all" else sorted(scope))
+            except Exception as e:
+                print(f"Order repricing error: {e}")
+
+    async def run(self, snapshot, material_ids: list = None) -> dict:
+        """Reprice open orders not priced with this snapshot; returns counts"""
+        query = {"status": {"$in": REPRICE_STATUSES}, "pricingVersion": {"$ne": snapshot.version}}
+        if material_ids is not None:
+            query["materialId"] = {"$in": material_ids}
+        projection = {"materialId": 1, "weight": 1, "printTime": 1, "estimatedCost": 1, "pricingVersion": 1,
+                      "parts.weight": 1, "parts.printTime": 1}
+        stats = {"running": True, "startedAt": datetime.utcnow(), "pricingVersion": snapshot.version,
+                 "materialIds": material_ids, "processed": 0, "changed": 0}
+        self.status = {**stats, "lastRun": self.status.get("lastRun")}
+
+        cursor = self.db.orders.find(query, projection).batch_size(BATCH_SIZE)
+        batch = []
+        async for order in cursor:
+            batch.append(order)
+            if len(batch) >= BATCH_SIZE:
+                await self._write(batch, snapshot, stats)
+                batch = []
+                await asyncio.sleep(PAUSE_SECONDS)
+        if batch:
+            await self._write(batch, snapshot, stats)
+
+        stats.update(running=False, finishedAt=datetime.utcnow())
+        self.status = {"running": False, "lastRun": stats}
+        return stats
+
+    async def _write(self, orders: list, snapshot, stats: dict):
+        now = datetime.utcnow()
+        updates = []
+        audit = []
+        for order, (total, part_costs) in zip(orders, reprice_batch(orders, snapshot)):
+            fields = {"pricingVersion": snapshot.version}
+            old = order.get('estimatedCost')
+            if total is not None and (old is None or round(old, 2) != round(total, 2)):
+                fields.update(estimatedCost=total, repricedAt=now)
+                for index, cost in enumerate(part_costs or []):
+                    fields[f"parts.{index}.estimatedCost"] = cost
+                audit.append({
+                    "orderId": str(order['_id']),
+                    "oldCost": old,
+                    "newCost": total,
+                    "oldPricingVersion": order.get('pricingVersion'),
+                    "pricingVersion": snapshot.version,
+                    "createdAt": now
+                })
+            updates.append(UpdateOne({"_id": order['_id']}, {"$set": fields}))
+
+        await self.db.orders.bulk_write(updates, ordered=False)
+        if audit:
+            await self.db.order_price_audit.insert_many(audit, ordered=False)
+        stats["processed"] += len(updates)
+        stats["changed"] += len(audit)
+
+
+order_repricer = OrderRepricer()
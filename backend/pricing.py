@@ -0,0 +1,224 @@
+"""
+Weight, print time and cost estimation from cached mesh geometry.
+
+All functions are plain arithmetic on their arguments, so they accept
+Python floats as well as numpy arrays (and broadcast over them).
+
+When the analysis carries a layer profile (mesh_slicing), weight and time
+come from the extruded shell + infill volume and the resulting path
+length; otherwise the flat shell-fraction / g-per-hour model is used.
+"""
+import numpy as np
+
+# Map material types to densities (g/cm³)
+MATERIAL_DENSITIES = {
+    'PLA': 1.24,
+    'ABS': 1.04,
+    'PETG': 1.27,
+    'TPU': 1.21,
+    'Nylon': 1.14,
+    'ASA': 1.07
+}
+DEFAULT_DENSITY = 1.24
+DEFAULT_MATERIAL_PRICE = 290  # MDL per kg
+
+# Print speed (g/hour) by layer height
+PRINT_SPEEDS = {
+    '0.15': 15, '0.2': 25, '0.28': 35, '0.32': 45
+}
+DEFAULT_PRINT_SPEED = 25
+
+DEFAULT_SETTINGS = {
+    "electricityCost": 3.15,  # Lei per 1000 Watts
+    "printerPower": 300,      # Watts
+    "markup": 2,              # Multiplier
+    "laborCost": 10           # Depreciation per hour
+}
+
+# Walls and top/bottom layers are always solid: weight = solid * (0.15 + 0.85 * infill)
+SHELL_FRACTION = 0.15
+
+# Slicer defaults for the layer-profile model
+LINE_WIDTH = 0.4             # mm
+WALL_THICKNESS = 0.8         # mm, 2 perimeters
+SKIN_THICKNESS = 0.8         # mm, top and bottom
+WALL_SPEED = 40              # mm/s
+INFILL_SPEED = 60            # mm/s
+LAYER_CHANGE_SECONDS = 1.0
+
+# Support structures are printed as sparse columns at this fill ratio
+SUPPORT_DENSITY = 0.15
+DEFAULT_LAYER_HEIGHT = 0.2
+
+
+def material_density(material: dict = None) -> float:
+    if not material:
+        return DEFAULT_DENSITY
+    return MATERIAL_DENSITIES.get(material.get('type', 'PLA'), DEFAULT_DENSITY)
+
+
+def print_speed(layer_height) -> float:
+    """Print speed in g/hour for a layer height given as '0.2' or 0.2"""
+    try:
+        key = f"{float(layer_height):g}"
+    except (TypeError, ValueError):
+        return DEFAULT_PRINT_SPEED
+    return PRINT_SPEEDS.get(key, DEFAULT_PRINT_SPEED)
+
+
+def layer_height_mm(layer_height) -> float:
+    """Layer height in mm for '0.2' or 0.2"""
+    try:
+        value = float(layer_height)
+    except (TypeError, ValueError):
+        return DEFAULT_LAYER_HEIGHT
+    return value if value > 0 else DEFAULT_LAYER_HEIGHT
+
+
+def estimate_weight(volume_cm3, density, scale=1.0, infill=20):
+    """Printed weight in grams; solid volume scales with scale³"""
+    fill = SHELL_FRACTION + (1 - SHELL_FRACTION) * np.asarray(infill) / 100
+    return volume_cm3 * np.asarray(scale) ** 3 * density * fill
+
+
+def estimate_print_time(weight_g, speed_g_per_hour):
+    """Print time in hours"""
+    return weight_g / speed_g_per_hour
+
+
+def estimate_from_layers(layers: dict, volume_cm3, density, scale=1.0, infill=20,
+                         layer_height=DEFAULT_LAYER_HEIGHT):
+    """
+    Weight (g) and print time (h) from a layer profile summary
+    Shell = perimeter walls + top/bottom skins (capped by the solid volume),
+    the rest is filled at the infill ratio; path length = volume / (line width × layer height)
+    """
+    scale = np.asarray(scale, dtype=np.float64)
+    layer_height = np.asarray(layer_height, dtype=np.float64)
+    solid = volume_cm3 * 1000 * scale ** 3
+    walls = np.minimum(layers['perimeterIntegral'] * scale ** 2 * WALL_THICKNESS, solid)
+    skins = np.minimum(layers['horizontalArea'] * scale ** 2 * SKIN_THICKNESS, solid - walls)
+    shell = walls + skins
+    sparse = (solid - shell) * np.asarray(infill) / 100
+
+    weight = (shell + sparse) / 1000 * density
+    section = LINE_WIDTH * layer_height
+    seconds = (shell / section / WALL_SPEED + sparse / section / INFILL_SPEED
+               + layers['height'] * scale / layer_height * LAYER_CHANGE_SECONDS)
+    return weight, seconds / 3600
+
+
+def estimate_support(stats: dict, density, scale=1.0, layer_height='0.2'):
+    """Weight (g) and print time (h) of the support material estimated by mesh analysis"""
+    support = stats.get('support')
+    if not support:
+        return 0.0, 0.0
+    extruded = support['supportVolume'] * np.asarray(scale, dtype=np.float64) ** 3 * SUPPORT_DENSITY
+    weight = extruded / 1000 * density
+    if stats.get('layers'):
+        heights = np.vectorize(layer_height_mm, otypes=[np.float64])(layer_height)
+        return weight, extruded / (LINE_WIDTH * heights) / INFILL_SPEED / 3600
+    speed = np.vectorize(print_speed, otypes=[np.float64])(layer_height)
+    return weight, estimate_print_time(weight, speed)
+
+
+def estimate(stats: dict, density, scale=1.0, infill=20, layer_height='0.2'):
+    """
+    Weight (g) and print time (h) including supports, from the layer profile
+    when the analysis has one
+    layer_height: '0.2' / 0.2 or an array of those (broadcast like the other arguments)
+    """
+    layers = stats.get('layers')
+    if layers:
+        heights = np.vectorize(layer_height_mm, otypes=[np.float64])(layer_height)
+        weight, print_time = estimate_from_layers(layers, stats['volume_cm3'], density, scale, infill, heights)
+    else:
+        speed = np.vectorize(print_speed, otypes=[np.float64])(layer_height)
+        weight = estimate_weight(stats['volume_cm3'], density, scale, infill)
+        print_time = estimate_print_time(weight, speed)
+    support_weight, support_time = estimate_support(stats, density, scale, layer_height)
+    return weight + support_weight, print_time + support_time
+
+
+def cost_breakdown(weight_g, print_time_h, material_price, settings: dict) -> dict:
+    """Cost components using the Excel formula (material + electricity + depreciation) × markup"""
+    # Material cost = weight (kg) × price per kg
+    material_cost = weight_g / 1000 * material_price
+    # Electricity: (Watts / 1000) * hours * rate
+    electricity_cost = settings['printerPower'] / 1000 * print_time_h * settings['electricityCost']
+    depreciation_cost = print_time_h * settings['laborCost']
+
+    subtotal = material_cost + electricity_cost + depreciation_cost
+    markup = np.asarray(settings['markup'])
+    multiplier = np.where(markup >= 1, markup, 2)
+    total_cost = subtotal * multiplier
+    return {
+        "materialCost": material_cost,
+        "electricityCost": electricity_cost,
+        "laborCost": depreciation_cost,
+        "subtotal": subtotal,
+        "markup": total_cost - subtotal,
+        "totalCost": total_cost
+    }
+
+
+def part_estimates(stats: dict, density, scale=1.0, infill=20, layer_height='0.2') -> dict:
+    """Order fields of one analyzed model file: weight (g), printTime (h), supportWeight (g)"""
+    weight, print_time = estimate(stats, density, scale, infill, layer_height)
+    return {
+        "weight": float(weight),
+        "printTime": float(print_time),
+        "supportWeight": float(estimate_support(stats, density, scale, layer_height)[0])
+    }
+
+
+def quote(stats: dict, material: dict = None, settings: dict = None,
+          scale: float = 1.0, infill: float = 20, layer_height='0.2') -> dict:
+    """Weight, time and cost for analyzed geometry; O(1) in mesh size"""
+    settings = settings or DEFAULT_SETTINGS
+    density = material_density(material)
+    weight, print_time = estimate(stats, density, scale, infill, layer_height)
+    support_weight = estimate_support(stats, density, scale, layer_height)[0]
+    price = (material or {}).get('price', DEFAULT_MATERIAL_PRICE)
+    costs = cost_breakdown(weight, print_time, price, settings)
+    return {
+        "weight": round(float(weight), 2),
+        "printTime": round(float(print_time), 2),
+        "supportWeight": round(float(support_weight), 2),
+        "dimensions": {axis: round(size * scale, 2) for axis, size in stats['dimensions'].items()},
+        **{key: round(float(value), 2) for key, value in costs.items()},
+        "currency": "Lei"
+    }
+
+
+# Calculator slider steps
+MATRIX_INFILLS = list(range(10, 101, 10))
+MATRIX_LAYER_HEIGHTS = ['0.15', '0.2', '0.28', '0.32']
+MATRIX_SCALES = [round(0.1 * step, 1) for step in range(1, 31)]
+
+
+def price_matrix(stats: dict, materials: list, settings: dict = None,
+                 infills=MATRIX_INFILLS, layer_heights=MATRIX_LAYER_HEIGHTS,
+                 scales=MATRIX_SCALES) -> dict:
+    """
+    Weight, time and total cost for every material × infill × layer height × scale
+    Returns:
+        dict of arrays shaped (materials, infills, layer_heights, scales)
+    """
+    settings = settings or DEFAULT_SETTINGS
+    density = np.array([material_density(m) for m in materials], dtype=np.float64)
+    price = np.array([m.get('price', DEFAULT_MATERIAL_PRICE) for m in materials], dtype=np.float64)
+    shape = (len(materials), len(infills), len(layer_heights), len(scales))
+
+    # Broadcast axes: material [:, None, None, None], infill [None, :, None, None], ...
+    weight, print_time = estimate(
+        stats,
+        density[:, None, None, None],
+        np.asarray(scales, dtype=np.float64)[None, None, None, :],
+        np.asarray(infills, dtype=np.float64)[None, :, None, None],
+        np.asarray(layer_heights, dtype=object)[None, None, :, None]
+    )
+    weight = np.broadcast_to(weight, shape)
+    print_time = np.broadcast_to(print_time, shape)
+    costs = cost_breakdown(weight, print_time, price[:, None, None, None], settings)
+    return {"weight": weight, "printTime": print_time, "totalCost": costs['totalCost']}
@@ -0,0 +1,165 @@
+"""
+"What-if" repricing of historic orders under candidate print settings.
+
+Weight, print time, material and status of every analyzed order are kept
+as numpy columns. New orders are appended on each use (orders are read
+past the last seen _id); a full reload every FULL_RELOAD_SECONDS also
+picks up orders whose weight or time changed later (re-analysis, operator
+edits).
+
+All candidate settings are evaluated in one broadcast pass: costs are
+(candidates × orders) arrays from pricing.cost_breakdown, per-material
+sums one bincount over combined (candidate, material) codes. Prices use
+the current material prices; the baseline is the current print settings,
+so deltas show only the effect of the settings change.
+
+Configuration (environment):
+    SIMULATION_FULL_RELOAD_SECONDS  full column reload interval (default: 900)
+"""
+import asyncio
+import os
+import time
+
+import numpy as np
+from bson import ObjectId
+
+import pricing
+
+FULL_RELOAD_SECONDS = int(os.environ.get('SIMULATION_FULL_RELOAD_SECONDS', 15 * 60))
+SETTINGS_FIELDS = tuple(pricing.DEFAULT_SETTINGS)
+PERCENTILES = [10, 25, 50, 75, 90]
+LOAD_BATCH_SIZE = 10000
+
+
+class OrderColumns:
+    def __init__(self):
+        self.db = None
+        self.weight = np.empty(0)
+        self.print_time = np.empty(0)
+        self.material = np.empty(0, dtype=np.int64)  # index into material_ids
+        self.status = np.empty(0, dtype=np.int64)    # index into statuses
+        self.material_ids = []
+        self.statuses = []
+        self.last_id = None  # highest _id loaded so far
+        self.loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def set_db(self, database):
+        self.db = database
+
+    async def refresh(self, full: bool = False):
+        """Append orders created since the last refresh; reload everything when due"""
+        async with self._lock:
+            full = full or not self.loaded_at or time.monotonic() - self.loaded_at > FULL_RELOAD_SECONDS
+            query = {"weight": {"$ne": None}, "printTime": {"$ne": None}}
+            if not full:
+                query["_id"] = {"$gt": self.last_id}
+            cursor = self.db.orders.find(
+                query, {"weight": 1, "printTime": 1, "materialId": 1, "status": 1}
+            ).sort("_id", 1).batch_size(LOAD_BATCH_SIZE)
+            docs = await cursor.to_list(None)
+            if full:
+                self.material_ids, self.statuses = [], []
+                self.last_id = ObjectId("0" * 24)
+
+            material_codes = {value: index for index, value in enumerate(self.material_ids)}
+            status_codes = {value: index for index, value in enumerate(self.statuses)}
+            for codes, values, key in ((material_codes, self.material_ids, 'materialId'),
+                                       (status_codes, self.statuses, 'status')):
+                for doc in docs:
+                    value = doc.get(key)
+                    if value not in codes:
+                        codes[value] = len(values)
+                        values.append(value)
+
+            weight = np.array([doc['weight'] for doc in docs], dtype=np.float64)
+            print_time = np.array([doc['printTime'] for doc in docs], dtype=np.float64)
+            material = np.array([material_codes[doc.get('materialId')] for doc in docs], dtype=np.int64)
+            status = np.array([status_codes[doc.get('status')] for doc in docs], dtype=np.int64)
+            if full:
+                self.weight, self.print_time, self.material, self.status = weight, print_time, material, status
+                self.loaded_at = time.monotonic()
+            else:
+                self.weight = np.concatenate([self.weight, weight])
+                self.print_time = np.concatenate([self.print_time, print_time])
+                self.material = np.concatenate([self.material, material])
+                self.status = np.concatenate([self.status, status])
+            if docs:
+                self.last_id = docs[-1]['_id']
+            return self
+
+
+def simulate(columns: OrderColumns, snapshot, candidates: list, statuses: list = None) -> dict:
+    """
+    Revenue of the selected historic orders under the current and each candidate settings
+    Args:
+        columns: loaded OrderColumns
+        snapshot: PricingSnapshot with the current material prices and settings
+        candidates: partial print settings dicts; missing fields keep their current value
+        statuses: order statuses to include (default: all)
+    """
+    selected = np.ones(len(columns.weight), dtype=bool)
+    if statuses is not None:
+        wanted = [index for index, status in enumerate(columns.statuses) if status in statuses]
+        selected = np.isin(columns.status, wanted)
+    weight = columns.weight[selected]
+    print_time = columns.print_time[selected]
+    material = columns.material[selected]
+
+    # Orders priced with a material that no longer exists use the default price, grouped as None
+    material_ids = [material_id if snapshot.material(material_id) else None for material_id in columns.material_ids]
+    group_ids = list(dict.fromkeys(material_ids))
+    group = np.array([group_ids.index(material_id) for material_id in material_ids], dtype=np.int64)[material]
+    prices = snapshot.material_prices(material_ids)
+    prices = np.where(np.isnan(prices), pricing.DEFAULT_MATERIAL_PRICE, prices)[material]
+
+    # Row 0 is the current settings, then one row per candidate
+    rows = [dict(snapshot.settings)] + [{**snapshot.settings, **candidate} for candidate in candidates]
+    settings = {field: np.array([row[field] for row in rows], dtype=np.float64)[:, None] for field in SETTINGS_FIELDS}
+    total = pricing.cost_breakdown(weight, print_time, prices, settings)['totalCost']
+    total = np.broadcast_to(total, (len(rows), len(weight)))
+
+    revenue = total.sum(axis=1)
+    groups = len(group_ids)
+    by_material = np.bincount((np.arange(len(rows))[:, None] * groups + group).ravel(),
+                              weights=total.ravel(), minlength=len(rows) * groups).reshape(len(rows), groups)
+    if len(weight):
+        quantiles = np.percentile(total, PERCENTILES, axis=1).T
+        change = np.percentile((total[1:] - total[0]) / np.maximum(total[0], 1e-9) * 100, PERCENTILES, axis=1).T
+    else:
+        quantiles = np.zeros((len(rows), len(PERCENTILES)))
+        change = np.zeros((len(candidates), len(PERCENTILES)))
+
+    def distribution(values) -> dict:
+        return {f"p{q}": round(float(value), 2) for q, value in zip(PERCENTILES, values)}
+
+    def material_names(values) -> list:
+        return [{"materialId": material_id,
+                 "name": (snapshot.material(material_id) or {}).get('name'),
+                 "revenue": round(float(value), 2)}
+                for material_id, value in zip(group_ids, values)]
+
+    baseline = {
+        "settings": rows[0],
+        "revenue": round(float(revenue[0]), 2),
+        "byMaterial": material_names(by_material[0]),
+        "priceDistribution": distribution(quantiles[0])
+    }
+    results = []
+    for index, candidate in enumerate(rows[1:], start=1):
+        results.append({
+            "settings": candidate,
+            "revenue": round(float(revenue[index]), 2),
+            "revenueDelta": round(float(revenue[index] - revenue[0]), 2),
+            "revenueDeltaPercent": round(float((revenue[index] - revenue[0]) / revenue[0] * 100), 2) if revenue[0] else None,
+            "byMaterial": [{**item, "revenueDelta": round(float(value - base), 2)}
+                           for item, value, base in zip(material_names(by_material[index]),
+                                                        by_material[index], by_material[0])],
+            "priceDistribution": distribution(quantiles[index]),
+            "priceChangePercent": distribution(change[index - 1])
+        })
+    return {"orders": int(len(weight)), "baseline": baseline, "candidates": results,
+            "pricingVersion": snapshot.version, "currency": "Lei"}
+
+
+order_columns = OrderColumns()
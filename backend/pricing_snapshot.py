@@ -0,0 +1,102 @@
+"""
+In-memory snapshot of everything prices depend on: materials and print settings.
+
+Quote paths price from the current snapshot and never read Mongo. A
+snapshot is immutable (read-only mappings) and replaced as a whole, so a
+request that took one keeps consistent materials and settings even while
+an admin edit rebuilds it. The admin endpoints that write materials or
+print settings call reload(); refresh_loop() also reloads periodically so
+that edits made through another worker process show up there.
+
+The version is a hash of the snapshot content: identical data gives the
+same version in every process and across restarts, and orders record the
+version they were priced with.
+
+Configuration (environment):
+    PRICING_REFRESH_SECONDS  periodic reload interval (default: 60)
+"""
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime
+from types import MappingProxyType
+from typing import Optional
+
+import numpy as np
+
+import pricing
+
+REFRESH_SECONDS = int(os.environ.get('PRICING_REFRESH_SECONDS', 60))
+
+
+class PricingSnapshot:
+    """Read-only materials and print settings, with a content version"""
+
+    def __init__(self, materials: list, settings: Optional[dict]):
+        settings = {field: (settings or {}).get(field, default)
+                    for field, default in pricing.DEFAULT_SETTINGS.items()}
+        content = json.dumps([[dict(m) for m in materials], settings], sort_keys=True, default=str)
+        self.version = hashlib.sha256(content.encode()).hexdigest()[:12]
+        self.materials = tuple(MappingProxyType(dict(m)) for m in materials)
+        self.settings = MappingProxyType(settings)
+        self.builtAt = datetime.utcnow()
+        self._by_id = MappingProxyType({str(m['_id']): m for m in self.materials})
+
+    def material(self, material_id: Optional[str]):
+        """Material document by id, or None"""
+        return self._by_id.get(material_id) if material_id else None
+
+    def material_prices(self, material_ids: list) -> np.ndarray:
+        """Price per kg of every material id; NaN where the id is unknown"""
+        prices = {material_id: material.get('price', pricing.DEFAULT_MATERIAL_PRICE)
+                  for material_id, material in self._by_id.items()}
+        return np.array([prices.get(material_id, np.nan) for material_id in material_ids], dtype=np.float64)
+
+    def cost(self, weight_g, print_time_h, material=None) -> dict:
+        """Cost components (see pricing.cost_breakdown) with this snapshot's settings"""
+        price = (material or {}).get('price', pricing.DEFAULT_MATERIAL_PRICE)
+        return pricing.cost_breakdown(weight_g, print_time_h, price, self.settings)
+
+    def order_cost(self, weight_g, print_time_h, material=None) -> float:
+        return float(self.cost(weight_g, print_time_h, material)['totalCost'])
+
+    def quote(self, stats: dict, material=None, scale: float = 1.0, infill: float = 20,
+              layer_height='0.2') -> dict:
+        return {**pricing.quote(stats, material, self.settings, scale, infill, layer_height),
+                "pricingVersion": self.version}
+
+    def price_matrix(self, stats: dict, scales=pricing.MATRIX_SCALES) -> dict:
+        return pricing.price_matrix(stats, self.materials, self.settings, scales=scales)
+
+
+class PricingStore:
+    def __init__(self):
+        self.db = None
+        self.snapshot = PricingSnapshot([], None)
+        self._lock = asyncio.Lock()
+
+    def set_db(self, database):
+        self.db = database
+
+    async def reload(self) -> PricingSnapshot:
+        """Rebuild the snapshot from Mongo and swap it in"""
+        # Serialized, so the last reload to finish read the latest writes
+        async with self._lock:
+            materials = await self.db.materials.find().to_list(None)
+            settings = await self.db.print_settings.find_one()
+            snapshot = PricingSnapshot(materials, settings)
+            if snapshot.version != self.snapshot.version:
+                self.snapshot = snapshot
+            return self.snapshot
+
+    async def refresh_loop(self):
+        while True:
+            await asyncio.sleep(REFRESH_SECONDS)
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f"Pricing snapshot reload error: {e}")
+
+
+pricing_store = PricingStore()
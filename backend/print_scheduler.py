@@ -0,0 +1,231 @@
+"""
+Print-farm scheduler: which printer prints which committed order, and when.
+
+Planning is a greedy longest-processing-time-first list schedule: queued
+jobs are taken longest first and each goes to the printer where it would
+finish earliest, counting a filament swap (MATERIAL_SWAP_HOURS) whenever the
+printer's loaded material or colour differs. Jobs that already print stay
+where they are and only delay their printer. LPT keeps the makespan within
+4/3 of optimal on identical printers; the swap cost makes printers keep
+their material when that costs little. Each printer's queue is then
+ordered so jobs of the same filament run back to back, which removes swaps
+without delaying the printer. A few hundred jobs plan in milliseconds, so
+the whole queue is re-planned on every event (order confirmed / approved /
+started / finished, printer changed) and every REFRESH_SECONDS, so queued
+slots move on with the clock. Slots are stored on the orders as absolute
+times and only rewritten when the printer changes or a time moves by more
+than SLOT_TOLERANCE; reading the schedule never re-plans.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+MATERIAL_SWAP_HOURS = 0.25
+# Heat-up and part removal between jobs
+JOB_SETUP_HOURS = 0.1
+# Estimated print speed when an order has a weight but no time (g/hour)
+FALLBACK_GRAMS_PER_HOUR = 25.0
+DEFAULT_JOB_HOURS = 2.0
+# Re-planning later shifts idle-printer slots by the elapsed time; smaller shifts are not written
+SLOT_TOLERANCE = timedelta(minutes=5)
+REFRESH_SECONDS = SLOT_TOLERANCE.total_seconds()
+
+# Orders the customer or the operator has committed to, waiting for a printer
+QUEUED_STATUSES = ["approved", "price_changed", "ordered"]
+PRINTING_STATUS = "printing"
+SCHEDULED_STATUSES = QUEUED_STATUSES + [PRINTING_STATUS]
+
+
+def _seconds(moment: datetime) -> datetime:
+    # Mongo keeps milliseconds; whole seconds let stored slots compare equal
+    return moment.replace(microsecond=0)
+
+
+def _filament(item: dict) -> tuple:
+    return ((item.get('material') or '').lower(), (item.get('color') or '').lower())
+
+
+def _fits(printer: dict, job: dict) -> bool:
+    size = job.get('size')
+    if not size:
+        return True
+    volume = printer.get('buildVolume') or {}
+    footprint = sorted(size[:2])
+    bed = sorted((volume.get('x', 300.0), volume.get('y', 300.0)))
+    return footprint[0] <= bed[0] and footprint[1] <= bed[1] and size[2] <= volume.get('z', 330.0)
+
+
+def _sequence(queue: list, loaded: tuple) -> list:
+    """Run jobs of the same filament back to back, the loaded filament first"""
+    groups = {}
+    for job in queue:
+        groups.setdefault(_filament(job), []).append(job)
+    order = sorted(groups, key=lambda key: key != loaded)
+    return [job for key in order for job in groups[key]]
+
+
+def plan_schedule(printers: list, jobs: list, now: datetime) -> dict:
+    """
+    Assign jobs to printers
+    Args:
+        printers: dicts with id, name, buildVolume {x, y, z}, material, color,
+                  available (bool) and optional busyUntil (datetime)
+        jobs: dicts with id, hours, material, color, size (x, y, z mm or None),
+              and for jobs already printing: printerId, startedAt
+    Returns:
+        dict with slots {job id: {printerId, printerName, start, finish, swap}},
+        unassigned job ids and the makespan (datetime)
+    """
+    def hours_from_now(moment):
+        return (moment - now).total_seconds() / 3600
+
+    # Times are hours from now while planning
+    state = {}
+    for printer in printers:
+        if not printer.get('available', True):
+            continue
+        busy = printer.get('busyUntil')
+        ready = max(hours_from_now(busy), 0.0) if busy else 0.0
+        state[printer['id']] = {
+            "printer": printer,
+            "ready": ready,
+            "free": ready,
+            "filament": _filament(printer),
+            "queue": []
+        }
+
+    slots = {}
+    queued = []
+    for job in jobs:
+        printer_state = state.get(job.get('printerId'))
+        if job.get('startedAt') and printer_state:
+            # Running jobs are pinned to their printer
+            start = hours_from_now(job['startedAt'])
+            finish = max(start + job['hours'], 0.0)
+            slots[job['id']] = (printer_state, start, finish, False)
+            printer_state.update(free=max(printer_state['free'], finish), filament=_filament(job))
+        else:
+            queued.append(job)
+    printer_states = list(state.values())
+    loaded = {id(printer_state): printer_state['filament'] for printer_state in printer_states}
+
+    unassigned = []
+    # Longest first; ties keep arrival order
+    for job in sorted(queued, key=lambda job: -job['hours']):
+        filament = _filament(job)
+        best = None
+        for printer_state in printer_states:
+            if not _fits(printer_state['printer'], job):
+                continue
+            swap = printer_state['filament'] != filament
+            finish = printer_state['free'] + JOB_SETUP_HOURS + (MATERIAL_SWAP_HOURS if swap else 0) + job['hours']
+            if best is None or (finish, swap) < (best[1], best[2]):
+                best = (printer_state, finish, swap)
+        if best is None:
+            unassigned.append(job['id'])
+            continue
+        printer_state, finish, swap = best
+        printer_state['queue'].append(job)
+        printer_state.update(free=finish, filament=filament)
+
+    # Grouping a printer's jobs by filament only removes swaps, so the printer finishes no later
+    for printer_state in printer_states:
+        clock = max([printer_state['ready']] + [slot[2] for slot in slots.values() if slot[0] is printer_state])
+        filament = loaded[id(printer_state)]
+        for job in _sequence(printer_state['queue'], filament):
+            swap = _filament(job) != filament
+            start = clock + JOB_SETUP_HOURS + (MATERIAL_SWAP_HOURS if swap else 0)
+            clock = start + job['hours']
+            filament = _filament(job)
+            slots[job['id']] = (printer_state, start, clock, swap)
+
+    result = {}
+    for job_id, (printer_state, start, finish, swap) in slots.items():
+        result[job_id] = {"printerId": printer_state['printer']['id'],
+                          "printerName": printer_state['printer'].get('name'),
+                          "start": _seconds(now + timedelta(hours=start)),
+                          "finish": _seconds(now + timedelta(hours=finish)),
+                          "swap": swap}
+    makespan = max([finish for _, _, finish, _ in slots.values()], default=0.0)
+    return {"slots": result, "unassigned": unassigned, "makespan": _seconds(now + timedelta(hours=makespan))}
+
+
+def order_job(order: dict) -> dict:
+    """Scheduler job for an order document"""
+    hours = order.get('printTime')
+    if not hours and order.get('weight'):
+        hours = order['weight'] / FALLBACK_GRAMS_PER_HOUR
+    scale = _parse_scale(order.get('scale'))
+    sizes = [part.get('dimensions') for part in (order.get('parts') or [order]) if part.get('dimensions')]
+    size = [max(d[axis] for d in sizes) * scale for axis in 'xyz'] if sizes else None
+    return {
+        "id": str(order['_id']),
+        "hours": float(hours or DEFAULT_JOB_HOURS),
+        "material": order.get('materialName'),
+        "color": order.get('materialColor'),
+        "size": size,
+        "printerId": order.get('printerId'),
+        "startedAt": order.get('printStartedAt') if order.get('status') == PRINTING_STATUS else None
+    }
+
+
+def slot_changed(old, new) -> bool:
+    """Whether a stored slot differs from a new one by more than rounding and elapsed time"""
+    if not old or not new:
+        return old != new
+    return (old.get('printerId') != new['printerId'] or old.get('swap') != new['swap']
+            or abs(old['start'] - new['start']) > SLOT_TOLERANCE
+            or abs(old['finish'] - new['finish']) > SLOT_TOLERANCE)
+
+
+def _parse_scale(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class PrintScheduler:
+    def __init__(self):
+        self.db = None
+        self.plan = None
+        self._lock = asyncio.Lock()
+
+    def set_db(self, database):
+        self.db = database
+
+    async def replan(self) -> dict:
+        """Re-plan every queued and running order; writes only the slots that changed"""
+        async with self._lock:
+            printers = [{**{k: v for k, v in p.items() if k != '_id'}, "id": str(p['_id'])}
+                        for p in await self.db.printers.find().to_list(None)]
+            orders = await self.db.orders.find(
+                {"status": {"$in": SCHEDULED_STATUSES}},
+                {"printTime": 1, "weight": 1, "materialName": 1, "materialColor": 1, "scale": 1,
+                 "dimensions": 1, "parts.dimensions": 1, "status": 1, "printerId": 1,
+                 "printStartedAt": 1, "schedule": 1}
+            ).sort("uploadDate", 1).to_list(None)
+            plan = plan_schedule(printers, [order_job(order) for order in orders], datetime.utcnow())
+
+            updates = []
+            for order in orders:
+                order_id = str(order['_id'])
+                slot = plan['slots'].get(order_id)
+                if slot_changed(order.get('schedule'), slot):
+                    updates.append(UpdateOne({"_id": order['_id']}, {"$set": {"schedule": slot}}))
+            if updates:
+                await self.db.orders.bulk_write(updates, ordered=False)
+            self.plan = plan
+            return plan
+
+    async def refresh_loop(self):
+        while True:
+            await asyncio.sleep(REFRESH_SECONDS)
+            try:
+                await self.replan()
+            except Exception as e:
+                print(f"Scheduler refresh error: {e}")
+
+
+scheduler = PrintScheduler()
@@ -0,0 +1,202 @@
+"""
+Resumable chunked uploads for large models.
+
+A client creates a session (file name, total size, chunk size), PUTs
+numbered chunks in any order, each with its SHA-256, asks which chunks
+the server has, and finalizes once everything arrived. Sessions live in
+the `upload_sessions` collection; each chunk is staged in its own file,
+checked against its length and SHA-256, and only then copied to its final
+offset in a preallocated file under UPLOAD_DIR/partial, so a bad retry of
+a chunk that already arrived cannot overwrite good data.
+
+Sessions that see no activity for UPLOAD_SESSION_TTL seconds
+(default: 24 hours) are removed together with their partial file; until
+the collector gets to them, expired sessions are treated as missing.
+Finalizing moves a session from "uploading" to "finalizing" in one
+conditional update, so only one of two concurrent finalize calls proceeds
+and no chunk is accepted while the file is assembled.
+"""
+import asyncio
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import aiofiles
+from pymongo import ReturnDocument
+
+from upload_ingest import MAX_UPLOAD_BYTES, UploadRejected
+
+SESSION_TTL = timedelta(seconds=int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 3600)))
+GC_INTERVAL_SECONDS = 15 * 60
+MIN_CHUNK_BYTES = 256 * 1024
+MAX_CHUNK_BYTES = 32 * 1024 * 1024
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+COPY_BYTES = 1024 * 1024
+UPLOADING_STATUS = "uploading"
+FINALIZING_STATUS = "finalizing"
+
+db = None
+partial_dir = None
+
+
+def set_db(database, upload_dir: Path):
+    global db, partial_dir
+    db = database
+    partial_dir = upload_dir / "partial"
+    partial_dir.mkdir(exist_ok=True)
+
+
+def part_path(session_id: str) -> Path:
+    return partial_dir / f"{session_id}.part"
+
+
+def chunk_path(session_id: str, index: int) -> Path:
+    # Unique per request: two retries of one chunk may arrive at the same time
+    return partial_dir / f"{session_id}.{index}.{uuid.uuid4().hex}.chunk"
+
+
+async def create_session(file_name: str, total_size: int, chunk_size: int = DEFAULT_CHUNK_BYTES) -> dict:
+    if total_size <= 0:
+        raise UploadRejected("File is empty")
+    if total_size > MAX_UPLOAD_BYTES:
+        raise UploadRejected("File is too large", status_code=413)
+    if not MIN_CHUNK_BYTES <= chunk_size <= MAX_CHUNK_BYTES:
+        raise UploadRejected(f"Chunk size must be between {MIN_CHUNK_BYTES} and {MAX_CHUNK_BYTES} bytes")
+
+    session_id = uuid.uuid4().hex
+    # Sparse preallocation: chunks are written at their final offsets
+    with open(part_path(session_id), 'wb') as f:
+        f.truncate(total_size)
+
+    now = datetime.utcnow()
+    session = {
+        "_id": session_id,
+        "fileName": file_name,
+        "totalSize": total_size,
+        "chunkSize": chunk_size,
+        "chunkCount": -(-total_size // chunk_size),
+        "received": [],
+        "status": UPLOADING_STATUS,
+        "createdAt": now,
+        "expiresAt": now + SESSION_TTL
+    }
+    await db.upload_sessions.insert_one(session)
+    return session
+
+
+def _live(session_id: str, **conditions) -> dict:
+    """Query for a session that has not expired"""
+    return {"_id": session_id, "expiresAt": {"$gt": datetime.utcnow()}, **conditions}
+
+
+async def get_session(session_id: str):
+    """The session, or None if it does not exist or has expired"""
+    return await db.upload_sessions.find_one(_live(session_id))
+
+
+def chunk_length(session: dict, index: int) -> int:
+    if index == session['chunkCount'] - 1:
+        return session['totalSize'] - index * session['chunkSize']
+    return session['chunkSize']
+
+
+async def write_chunk(session: dict, index: int, stream, checksum: str):
+    """Stage one chunk from an async byte stream, verify it, then write it at its offset and record it"""
+    if session.get('status') == FINALIZING_STATUS:
+        raise UploadRejected("Upload is already being finalized", status_code=409)
+    if not 0 <= index < session['chunkCount']:
+        raise UploadRejected("Chunk index out of range")
+    expected = chunk_length(session, index)
+    sha256 = hashlib.sha256()
+    written = 0
+    staged = chunk_path(session['_id'], index)
+    try:
+        async with aiofiles.open(staged, 'wb') as f:
+            async for data in stream:
+                written += len(data)
+                if written > expected:
+                    raise UploadRejected(f"Chunk {index} must be {expected} bytes")
+                sha256.update(data)
+                await f.write(data)
+        if written != expected:
+            raise UploadRejected(f"Chunk {index} must be {expected} bytes")
+        if sha256.hexdigest() != checksum.lower():
+            raise UploadRejected(f"Checksum mismatch for chunk {index}")
+
+        async with aiofiles.open(staged, 'rb') as src, aiofiles.open(part_path(session['_id']), 'r+b') as dst:
+            await dst.seek(index * session['chunkSize'])
+            while data := await src.read(COPY_BYTES):
+                await dst.write(data)
+    finally:
+        staged.unlink(missing_ok=True)
+
+    result = await db.upload_sessions.update_one(
+        _live(session['_id'], status={"$ne": FINALIZING_STATUS}),
+        {"$addToSet": {"received": index},
+         "$set": {"expiresAt": datetime.utcnow() + SESSION_TTL}}
+    )
+    if not result.matched_count:
+        raise UploadRejected("Upload session not found or expired", status_code=404)
+
+
+def missing_chunks(session: dict) -> list:
+    received = set(session['received'])
+    return [i for i in range(session['chunkCount']) if i not in received]
+
+
+async def begin_finalize(session_id: str):
+    """
+    Claim a session for finalizing
+    Returns:
+        the session, or None if it is missing, expired or already being finalized
+    """
+    return await db.upload_sessions.find_one_and_update(
+        # Sessions created before statuses existed have none: they are still uploading
+        _live(session_id, status={"$ne": FINALIZING_STATUS}),
+        {"$set": {"status": FINALIZING_STATUS, "expiresAt": datetime.utcnow() + SESSION_TTL}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def cancel_finalize(session_id: str):
+    """Let the client upload again after a finalize that could not proceed"""
+    await db.upload_sessions.update_one({"_id": session_id, "status": FINALIZING_STATUS},
+                                        {"$set": {"status": UPLOADING_STATUS}})
+
+
+async def complete_session(session: dict, dest_path: Path):
+    """Move the assembled file to dest_path and drop the session"""
+    os.replace(part_path(session['_id']), dest_path)
+    await db.upload_sessions.delete_one({"_id": session['_id']})
+
+
+async def remove_session(session_id: str):
+    await db.upload_sessions.delete_one({"_id": session_id})
+    try:
+        os.remove(part_path(session_id))
+    except FileNotFoundError:
+        pass
+
+
+async def collect_garbage():
+    """Delete expired sessions, and partial files and staged chunks that no session owns"""
+    now = datetime.utcnow()
+    async for session in db.upload_sessions.find({"expiresAt": {"$lt": now}}, {"_id": 1}):
+        await remove_session(session['_id'])
+
+    cutoff = (now - SESSION_TTL).timestamp()
+    for part in [*partial_dir.glob("*.part"), *partial_dir.glob("*.chunk")]:
+        session_id = part.name.split('.')[0]
+        if part.stat().st_mtime < cutoff and not await db.upload_sessions.find_one({"_id": session_id}, {"_id": 1}):
+            part.unlink(missing_ok=True)
+
+
+async def gc_loop():
+    while True:
+        try:
+            await collect_garbage()
+        except Exception as e:
+            print(f"Upload session GC error: {e}")
+        await asyncio.sleep(GC_INTERVAL_SECONDS)
@@ -3,6 +3,7 @@ from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
@@ -70,9 +71,18 @@ app.include_router(api_router)
 
 # Include new consolidated routes
 import api_routes
+import analysis_pool
+import resumable_uploads
+import db_indexes
+from pricing_snapshot import pricing_store
+from print_scheduler import scheduler
 api_routes.set_db(db)
 app.include_router(api_routes.router)
 
+# Reject oversize uploads while the body is still being received
+from upload_ingest import UploadSizeLimitMiddleware
+app.add_middleware(UploadSizeLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -88,6 +98,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_analysis_pool():
+    # Pre-warm mesh analysis workers before the first upload arrives
+    await analysis_pool.start()
+    try:
+        db_indexes.print_report(await db_indexes.ensure_indexes(db))
+    except Exception as e:
+        logger.error(f"Index build failed: {e}")
+    # Quotes price from memory; load materials and print settings once
+    await pricing_store.reload()
+    asyncio.create_task(pricing_store.refresh_loop())
+    # Stored print slots may predate printer or order changes made while down
+    await api_routes.reschedule()
+    asyncio.create_task(scheduler.refresh_loop())
+    # Periodically drop abandoned resumable upload sessions
+    asyncio.create_task(resumable_uploads.gc_loop())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await analysis_pool.shutdown()
     client.close()
\ No newline at end of file
@@ -0,0 +1,436 @@
+"""
+Streaming ingest of uploaded model files.
+
+The multipart request body is parsed as it arrives (receive_form): each
+piece of a file field is written to disk and updates the SHA-256 digest and
+the STL header check, so the body is read exactly once and never spooled or
+held in memory. Malformed or oversize files are rejected as soon as that is
+detectable:
+
+- the body of an upload route is capped by UploadSizeLimitMiddleware while
+  it is being received (Content-Length is checked before reading anything):
+  one file per route, MAX_ORDER_PARTS files for a multi-part order
+- a binary STL declaring more triangles than fit in the size limit is
+  rejected after its first 84 bytes
+- a binary STL longer or shorter than its declared triangle count is
+  rejected as soon as the extra byte arrives / at the end of the stream
+
+Zip archives of several models are unpacked member by member with the same
+checks (extract_archive).
+
+Configuration (environment):
+    MAX_UPLOAD_BYTES  largest accepted model file (default: 300 MB)
+    MAX_ORDER_PARTS   most model files accepted in one order (default: 50)
+"""
+import hashlib
+import os
+import zipfile
+from pathlib import PurePosixPath
+from urllib.parse import parse_qsl
+
+import aiofiles
+from python_multipart.multipart import MultipartParser, MultipartParseError, parse_options_header
+
+from mesh_analysis import looks_like_ascii_stl, UPLOAD_EXTENSIONS, MAX_DECOMPRESSED_BYTES
+
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 300 * 1024 * 1024))
+CHUNK_BYTES = 1024 * 1024
+MAX_ORDER_PARTS = int(os.environ.get('MAX_ORDER_PARTS', 50))
+
+# Room for multipart boundaries and the other form fields
+FORM_OVERHEAD_BYTES = 64 * 1024
+MAX_FORM_FIELDS = 100
+# Routes whose bodies are multipart model uploads -> largest accepted body
+UPLOAD_LIMITS = {
+    '/api/orders/upload': MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES,
+    '/api/orders/upload-parts': MAX_UPLOAD_BYTES * MAX_ORDER_PARTS + FORM_OVERHEAD_BYTES,
+    '/api/quotes/analyze': MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES,
+    '/api/quotes/preview': MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES,
+}
+
+STL_HEADER_BYTES = 84
+STL_RECORD_BYTES = 50
+SNIFF_BYTES = 1024
+
+# Leading bytes of compressed / archived model uploads
+COMPRESSED_MAGIC = {
+    '.gz': b'\x1f\x8b',
+    '.zst': b'\x28\xb5\x2f\xfd',
+    '.3mf': b'PK\x03\x04',
+    '.zip': b'PK\x03\x04',
+}
+
+
+class UploadRejected(Exception):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+class StlSniffer:
+    """Validates an STL stream incrementally from its header"""
+
+    def __init__(self, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.max_bytes = max_bytes
+        self.head = b''
+        self.kind = None
+        self.triangles = None
+        self.expected_bytes = None
+
+    def feed(self, chunk: bytes, received: int):
+        """received: total bytes so far, including chunk"""
+        if self.kind is None:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES:
+                self._classify()
+        if self.expected_bytes is not None and received > self.expected_bytes:
+            raise UploadRejected("STL file is longer than its declared triangle count")
+
+    def finish(self, received: int):
+        if self.kind is None:
+            self._classify()
+        if self.kind == 'binary' and received > self.expected_bytes:
+            # A file shorter than SNIFF_BYTES is only classified here
+            raise UploadRejected("STL file is longer than its declared triangle count")
+        if self.kind == 'binary' and received < self.expected_bytes:
+            raise UploadRejected("STL file is truncated")
+
+    def _classify(self):
+        head = self.head
+        if looks_like_ascii_stl(head):
+            self.kind = 'ascii'
+            return
+        if len(head) < STL_HEADER_BYTES:
+            raise UploadRejected("File is not a valid STL")
+        self.kind = 'binary'
+        self.triangles = int.from_bytes(head[80:84], 'little')
+        self.expected_bytes = STL_HEADER_BYTES + self.triangles * STL_RECORD_BYTES
+        if self.triangles == 0:
+            raise UploadRejected("STL file contains no triangles")
+        if self.expected_bytes > self.max_bytes:
+            raise UploadRejected("File is too large", status_code=413)
+
+
+class MagicSniffer:
+    """Checks the leading bytes of a compressed upload"""
+
+    def __init__(self, magic: bytes):
+        self.magic = magic
+        self.head = b''
+        self.kind = 'compressed'
+        self.triangles = None
+
+    def feed(self, chunk: bytes, received: int):
+        if len(self.head) < len(self.magic):
+            self.head += chunk[:len(self.magic) - len(self.head)]
+            if len(self.head) == len(self.magic):
+                self.finish(received)
+
+    def finish(self, received: int):
+        if self.head != self.magic:
+            raise UploadRejected("File content does not match its extension")
+
+
+def make_sniffer(file_name: str, max_bytes: int = MAX_UPLOAD_BYTES):
+    name = file_name.lower()
+    if name.endswith('.stl'):
+        return StlSniffer(max_bytes)
+    for extension, magic in COMPRESSED_MAGIC.items():
+        if name.endswith(extension):
+            return MagicSniffer(magic)
+    return None
+
+
+class FileCheck:
+    """SHA-256, size limit and content sniffing of a file read chunk by chunk"""
+
+    def __init__(self, file_name: str, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.max_bytes = max_bytes
+        self.sha256 = hashlib.sha256()
+        self.sniffer = make_sniffer(file_name, max_bytes)
+        self.received = 0
+
+    def update(self, chunk: bytes):
+        self.received += len(chunk)
+        if self.received > self.max_bytes:
+            raise UploadRejected("File is too large", status_code=413)
+        if self.sniffer:
+            self.sniffer.feed(chunk, self.received)
+        self.sha256.update(chunk)
+
+    def finish(self) -> dict:
+        """
+        Returns:
+            dict with sha256, size, kind ('binary' / 'ascii' / 'compressed' / None), triangles
+        """
+        if self.sniffer:
+            self.sniffer.finish(self.received)
+        return {
+            "sha256": self.sha256.hexdigest(),
+            "size": self.received,
+            "kind": self.sniffer.kind if self.sniffer else None,
+            "triangles": self.sniffer.triangles if self.sniffer else None
+        }
+
+
+class FormReceiver:
+    """Multipart parser state; file fields are written as their data arrives"""
+
+    def __init__(self, boundary: bytes, file_path_for, max_bytes: int, max_files: int):
+        self.file_path_for = file_path_for
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.fields = {}
+        self.files = []
+        self.events = []  # filled synchronously by the parser callbacks
+        self.headers = {}
+        self.header_field = b''
+        self.header_value = b''
+        self.field_name = None
+        self.value = b''
+        self.check = None
+        self.out_file = None
+        self.parser = MultipartParser(boundary, {
+            'on_part_begin': self._on_part_begin,
+            'on_header_field': lambda data, start, end: self._add_header_bytes('header_field', data[start:end]),
+            'on_header_value': lambda data, start, end: self._add_header_bytes('header_value', data[start:end]),
+            'on_header_end': self._on_header_end,
+            'on_headers_finished': lambda: self.events.append(('begin', self.headers)),
+            'on_part_data': lambda data, start, end: self.events.append(('data', bytes(data[start:end]))),
+            'on_part_end': lambda: self.events.append(('end', None)),
+        })
+
+    def _on_part_begin(self):
+        self.headers = {}
+
+    def _add_header_bytes(self, name: str, data: bytes):
+        setattr(self, name, getattr(self, name) + data)
+
+    def _on_header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = self.header_value = b''
+
+    async def feed(self, chunk: bytes):
+        try:
+            self.parser.write(chunk)
+        except MultipartParseError:
+            raise UploadRejected("Malformed multipart body")
+        events, self.events = self.events, []
+        for kind, value in events:
+            if kind == 'begin':
+                await self._begin(value)
+            elif kind == 'data':
+                await self._data(value)
+            else:
+                await self._end()
+
+    async def _begin(self, headers: dict):
+        _, options = parse_options_header(headers.get(b'content-disposition', b''))
+        name = options.get(b'name', b'').decode('utf-8', 'replace')
+        file_name = options.get(b'filename')
+        # Browsers send an empty file field when no file was chosen
+        file_name = file_name.decode('utf-8', 'replace') if file_name else None
+        self.field_name = name
+        self.value = b''
+        if file_name is None:
+            if len(self.fields) >= MAX_FORM_FIELDS:
+                raise UploadRejected("Too many form fields")
+            return
+        if len(self.files) >= self.max_files:
+            raise UploadRejected(f"Too many model files in one order (max {self.max_files})")
+        path = self.file_path_for(file_name)
+        self.files.append({"field": name, "fileName": file_name, "path": path})
+        self.check = FileCheck(file_name, self.max_bytes)
+        self.out_file = await aiofiles.open(path, 'wb')
+
+    async def _data(self, data: bytes):
+        if self.out_file is None:
+            self.value += data
+            if len(self.value) > FORM_OVERHEAD_BYTES:
+                raise UploadRejected("Form field is too large", status_code=413)
+            return
+        self.check.update(data)
+        await self.out_file.write(data)
+
+    async def _end(self):
+        if self.out_file is None:
+            self.fields[self.field_name] = self.value.decode('utf-8', 'replace')
+            return
+        await self.out_file.close()
+        self.out_file = None
+        self.files[-1].update(self.check.finish())
+
+    async def close(self):
+        if self.out_file is not None:
+            await self.out_file.close()
+            self.out_file = None
+
+
+async def receive_form(request, file_path_for, max_bytes: int = MAX_UPLOAD_BYTES,
+                       max_files: int = MAX_ORDER_PARTS) -> tuple:
+    """
+    Parse a multipart/form-data request while it is received, streaming file fields to disk
+    Args:
+        request: Starlette request; its body is read from request.stream() exactly once
+        file_path_for: callable(file name) -> destination path; raises UploadRejected to refuse a file
+    Returns:
+        (fields: {name: value}, files: list of dicts with field, fileName, path, sha256, size, kind, triangles)
+    Raises:
+        UploadRejected (files written so far are removed)
+    """
+    content_type, options = parse_options_header(request.headers.get('content-type', ''))
+    if content_type == b'application/x-www-form-urlencoded':
+        # Fields only, e.g. an order from an already analyzed upload
+        body = b''
+        async for chunk in request.stream():
+            body += chunk
+            if len(body) > FORM_OVERHEAD_BYTES:
+                raise UploadRejected("Form is too large", status_code=413)
+        return dict(parse_qsl(body.decode('utf-8', 'replace'), keep_blank_values=True)), []
+    if content_type != b'multipart/form-data' or not options.get(b'boundary'):
+        raise UploadRejected("Expected a multipart/form-data upload")
+    receiver = FormReceiver(options[b'boundary'], file_path_for, max_bytes, max_files)
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await receiver.feed(chunk)
+        receiver.parser.finalize()
+        if receiver.out_file is not None:
+            raise UploadRejected("Malformed multipart body")
+    except BaseException:
+        await receiver.close()
+        for file in receiver.files:
+            if os.path.exists(file['path']):
+                os.remove(file['path'])
+        raise
+    return receiver.fields, receiver.files
+
+
+def inspect_file(file_path, file_name: str, max_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """Hash and validate a file already on disk (same checks as receive_form)"""
+    check = FileCheck(file_name, max_bytes)
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(CHUNK_BYTES):
+            check.update(chunk)
+    return check.finish()
+
+
+def _archive_models(archive: zipfile.ZipFile) -> list:
+    """Model file members of an archive, skipping folders and macOS metadata"""
+    members = []
+    for info in archive.infolist():
+        path = PurePosixPath(info.filename)
+        if (info.is_dir() or path.name.startswith('.') or '__MACOSX' in path.parts
+                or not path.name.lower().endswith(UPLOAD_EXTENSIONS)):
+            continue
+        members.append(info)
+    return members
+
+
+def extract_archive(zip_path, dest_prefix: str, max_bytes: int = MAX_UPLOAD_BYTES,
+                    max_parts: int = MAX_ORDER_PARTS) -> list:
+    """
+    Unpack the model files of a zip archive next to dest_prefix (same checks as receive_form)
+    Args:
+        zip_path: Stored archive
+        dest_prefix: Path prefix of the extracted files; the member name is appended
+    Returns:
+        list of dicts with name, path, sha256, size, kind, triangles
+    Raises:
+        UploadRejected (files extracted so far are removed)
+    """
+    extracted = []
+    total = 0
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            members = _archive_models(archive)
+            if not members:
+                raise UploadRejected("Archive contains no STL, OBJ or 3MF files")
+            if len(members) > max_parts:
+                raise UploadRejected(f"Too many model files in one order (max {max_parts})")
+            for index, info in enumerate(members):
+                # Only the base name is used: member paths may point outside the upload folder
+                name = PurePosixPath(info.filename).name
+                dest_path = f"{dest_prefix}_{index}_{name}"
+                check = FileCheck(name, max_bytes)
+                extracted.append({"name": name, "path": dest_path})
+                with archive.open(info) as source, open(dest_path, 'wb') as out_file:
+                    while chunk := source.read(CHUNK_BYTES):
+                        check.update(chunk)
+                        total += len(chunk)
+                        if total > MAX_DECOMPRESSED_BYTES:
+                            raise UploadRejected("Archive is too large when unpacked", status_code=413)
+                        out_file.write(chunk)
+                extracted[-1].update(check.finish())
+    except (UploadRejected, zipfile.BadZipFile) as e:
+        for member in extracted:
+            if os.path.exists(member['path']):
+                os.remove(member['path'])
+        if not isinstance(e, UploadRejected):
+            raise UploadRejected("Archive is damaged")
+        if extracted and 'sha256' not in extracted[-1]:
+            # Name the member that failed
+            raise UploadRejected(f"{extracted[-1]['name']}: {e.detail}", e.status_code)
+        raise
+    return extracted
+
+
+class UploadSizeLimitMiddleware:
+    """Reject upload request bodies over their route's limit while they are received"""
+
+    def __init__(self, app, limits: dict = UPLOAD_LIMITS):
+        self.app = app
+        self.limits = dict(limits)
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.limits.get(scope['path'].rstrip('/')) if scope['type'] == 'http' else None
+        if max_bytes is None:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get('headers') or [])
+        length = headers.get(b'content-length')
+        if length is not None and length.isdigit() and int(length) > max_bytes:
+            return await self._reject(send)
+
+        received = 0
+        too_large = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            if too_large:
+                return {'type': 'http.disconnect'}
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > max_bytes:
+                    # Stop reading: the app sees a disconnected client
+                    too_large = True
+                    return {'type': 'http.disconnect'}
+            return message
+
+        async def limited_send(message):
+            nonlocal rejected
+            if not too_large:
+                await send(message)
+            elif not rejected:
+                # Replace whatever error the app produced for the cut-off body
+                rejected = True
+                await self._reject(send)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except Exception:
+            if not too_large:
+                raise
+            if not rejected:
+                await self._reject(send)
+
+    async def _reject(self, send):
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [(b'content-type', b'application/json')]
+        })
+        await send({'type': 'http.response.body', 'body': b'{"detail":"File is too large"}'})
@@ -3,10 +3,13 @@ import { Canvas, useThree, useLoader } from '@react-three/fiber';
 import { OrbitControls, Center, Grid, Environment } from '@react-three/drei';
 import { STLLoader } from 'three/examples/jsm/loaders/STLLoader';
 import * as THREE from 'three';
+import { quotesAPI } from '../utils/api';
+import { parsePreview } from '../utils/meshPreview';
 
-// Component to load and display STL model
-function Model({ url, scale = 1, color = '#0ea5e9' }) {
-  const geometry = useLoader(STLLoader, url);
+// Larger files (and non-STL formats) are previewed from the server-side decimated mesh
+const LOCAL_PARSE_MAX_BYTES = 5 * 1024 * 1024;
+
+function ModelMesh({ geometry, scale = 1, color = '#0ea5e9' }) {
   const meshRef = useRef();
 
   useEffect(() => {
@@ -23,6 +26,15 @@ function Model({ url, scale = 1, color = '#0ea5e9' }) {
   );
 }
 
+// Component to load and display STL model
+function Model({ url, scale = 1, color = '#0ea5e9' }) {
+  const geometry = useLoader(STLLoader, url);
+  return <ModelMesh geometry={geometry} scale={scale} color={color} />;
+}
+
+const usesServerPreview = (file) =>
+  file.size > LOCAL_PARSE_MAX_BYTES || !file.name.toLowerCase().endsWith('.stl');
+
 // Auto-fit camera to model
 function AutoFitCamera({ geometry }) {
   const { camera, scene } = useThree();
@@ -41,12 +53,46 @@ function AutoFitCamera({ geometry }) {
   return null;
 }
 
-const STLViewer = ({ file, scale = 1, onDimensionsChange }) => {
+const geometryDimensions = (geometry) => {
+  geometry.computeBoundingBox();
+  const box = geometry.boundingBox;
+  return {
+    x: Math.abs(box.max.x - box.min.x),
+    y: Math.abs(box.max.y - box.min.y),
+    z: Math.abs(box.max.z - box.min.z)
+  };
+};
+
+const STLViewer = ({ file, scale = 1, onDimensionsChange, onMeshToken }) => {
   const [fileUrl, setFileUrl] = useState(null);
+  const [previewGeometry, setPreviewGeometry] = useState(null);
   const [error, setError] = useState(null);
   const [dimensions, setDimensions] = useState(null);
 
   useEffect(() => {
+    if (file && usesServerPreview(file)) {
+      let cancelled = false;
+      setFileUrl(null);
+      setPreviewGeometry(null);
+      (async () => {
+        try {
+          // The server answers once the preview is built; the full analysis continues behind it
+          const { meshToken } = await quotesAPI.upload(file);
+          if (onMeshToken) onMeshToken(file, meshToken);
+          const buffer = await quotesAPI.preview(meshToken);
+          if (cancelled) return;
+          const geometry = parsePreview(buffer);
+          // Within one grid step of the exact size; the order analysis measures the mesh itself
+          const dims = geometryDimensions(geometry);
+          setDimensions(dims);
+          if (onDimensionsChange) onDimensionsChange(dims);
+          setPreviewGeometry(geometry);
+        } catch (err) {
+          if (!cancelled) setError('Не удалось прочитать файл');
+        }
+      })();
+      return () => { cancelled = true; };
+    }
     if (file) {
       const url = URL.createObjectURL(file);
       setFileUrl(url);
@@ -56,14 +102,7 @@ const STLViewer = ({ file, scale = 1, onDimensionsChange }) => {
       reader.onload = (e) => {
         try {
           const loader = new STLLoader();
-          const geometry = loader.parse(e.target.result);
-          geometry.computeBoundingBox();
-          const box = geometry.boundingBox;
-          const dims = {
-            x: Math.abs(box.max.x - box.min.x),
-            y: Math.abs(box.max.y - box.min.y),
-            z: Math.abs(box.max.z - box.min.z)
-          };
+          const dims = geometryDimensions(loader.parse(e.target.result));
           setDimensions(dims);
           if (onDimensionsChange) onDimensionsChange(dims);
         } catch (err) {
@@ -75,7 +114,7 @@ const STLViewer = ({ file, scale = 1, onDimensionsChange }) => {
 
       return () => URL.revokeObjectURL(url);
     }
-  }, [file, onDimensionsChange]);
+  }, [file, onDimensionsChange, onMeshToken]);
 
   if (error) {
     return (
@@ -92,7 +131,7 @@ const STLViewer = ({ file, scale = 1, onDimensionsChange }) => {
     );
   }
 
-  if (!fileUrl) {
+  if (!fileUrl && !previewGeometry) {
     return (
       <div style={{
         background: 'var(--bg-secondary)',
@@ -102,7 +141,7 @@ const STLViewer = ({ file, scale = 1, onDimensionsChange }) => {
         textAlign: 'center',
         color: 'var(--text-muted)'
       }}>
-        📦 Загрузите STL файл для предпросмотра
+        {file ? '⏳ Подготовка предпросмотра…' : '📦 Загрузите STL файл для предпросмотра'}
       </div>
     );
   }
@@ -124,7 +163,9 @@ const STLViewer = ({ file, scale = 1, onDimensionsChange }) => {
           <directionalLight position={[-10, -10, -5]} intensity={0.5} />
           <Suspense fallback={null}>
             <Center>
-              <Model url={fileUrl} scale={scale} />
+              {previewGeometry
+                ? <ModelMesh geometry={previewGeometry} scale={scale} />
+                : <Model url={fileUrl} scale={scale} />}
             </Center>
           </Suspense>
           <OrbitControls 
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useLanguage } from '../context/LanguageContext';
-import { mockMaterials, mockOrders, mockGalleryItems } from '../mock';
+import { mockMaterials, mockGalleryItems } from '../mock';
 import { materialsAPI, galleryAPI } from '../utils/api';
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
@@ -42,7 +42,7 @@ const Admin = () => {
   });
 
   // Orders & Settings
-  const [orders, setOrders] = useState(mockOrders);
+  const [orders, setOrders] = useState([]);
   const [printSettings, setPrintSettings] = useState({ 
     electricityCost: 2.5, 
     printerPower: 0.3, 
@@ -55,6 +55,7 @@ const Admin = () => {
       loadMaterials();
       loadGallery();
       loadPrintSettings();
+      loadOrders();
     }
   }, [isLoggedIn]);
 
@@ -75,6 +76,17 @@ const Admin = () => {
     }
   };
 
+  const loadOrders = async () => {
+    try {
+      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/orders`);
+      if (response.ok) {
+        setOrders(await response.json());
+      }
+    } catch (error) {
+      console.error('Error loading orders:', error);
+    }
+  };
+
   const handleSavePrintSettings = async () => {
     try {
       const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/print-settings`, {
@@ -307,6 +319,7 @@ const Admin = () => {
             <TabsTrigger value="materials">{t('admin.materials.title')}</TabsTrigger>
             <TabsTrigger value="gallery">{language === 'ru' ? 'Галерея' : 'Galerie'}</TabsTrigger>
             <TabsTrigger value="shop">{language === 'ru' ? 'Магазин' : 'Magazin'}</TabsTrigger>
+            <TabsTrigger value="orders">{t('admin.orders.title')}</TabsTrigger>
             <TabsTrigger value="settings">{t('admin.settings.title')}</TabsTrigger>
           </TabsList>
 
@@ -496,6 +509,44 @@ const Admin = () => {
             <AdminShop />
           </TabsContent>
 
+          {/* Orders Tab */}
+          <TabsContent value="orders">
+            <div style={{ display: 'flex', flexDirection: 'column', gap: '16px' }}>
+              {orders.map((order) => (
+                <div key={order.id} style={{
+                  background: 'var(--bg-secondary)',
+                  border: '1px solid var(--border-subtle)',
+                  padding: '16px',
+                  display: 'flex',
+                  gap: '20px',
+                  alignItems: 'center'
+                }}>
+                  <div style={{ width: '96px', height: '96px', flexShrink: 0, background: 'var(--bg-primary)' }}>
+                    {order.thumbnailUrl && (
+                      <img
+                        src={`${process.env.REACT_APP_BACKEND_URL}${order.thumbnailUrl}`}
+                        alt={order.fileName}
+                        loading="lazy"
+                        style={{ width: '100%', height: '100%', objectFit: 'contain' }}
+                      />
+                    )}
+                  </div>
+                  <div>
+                    <p className="body-medium" style={{ color: 'var(--text-muted)' }}>
+                      {t('admin.orders.file')}: <span style={{ color: 'var(--text-primary)' }}>{order.fileName}</span>
+                    </p>
+                    <p className="body-medium" style={{ color: 'var(--text-muted)' }}>
+                      {t('admin.orders.material')}: <span style={{ color: 'var(--text-primary)' }}>{order.materialName || '—'}</span>
+                    </p>
+                    <p className="body-small" style={{ color: 'var(--text-muted)' }}>
+                      {order.status} · {new Date(order.uploadDate).toLocaleString()}
+                    </p>
+                  </div>
+                </div>
+              ))}
+            </div>
+          </TabsContent>
+
           {/* Settings Tab */}
           <TabsContent value="settings">
             <div style={{
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, lazy, Suspense } from 'react';
+import React, { useState, useEffect, useCallback, lazy, Suspense } from 'react';
 import { useLanguage } from '../context/LanguageContext';
 import { mockMaterials } from '../mock';
 import { materialsAPI } from '../utils/api';
@@ -44,6 +44,9 @@ const Calculator = () => {
   const [orderHistory, setOrderHistory] = useState([]);
   const [scale, setScale] = useState(1);
   const [dimensions, setDimensions] = useState(null);
+  // Token of a file the viewer already uploaded for its preview: { file, meshToken }
+  const [previewToken, setPreviewToken] = useState(null);
+  const handleMeshToken = useCallback((file, meshToken) => setPreviewToken({ file, meshToken }), []);
   const [showAuthModal, setShowAuthModal] = useState(false);
   const [currentOrderId, setCurrentOrderId] = useState(null);
   const [orderStatus, setOrderStatus] = useState(null); // null, 'pending', 'approved', 'price_changed'
@@ -278,7 +281,6 @@ const Calculator = () => {
       
       for (const file of selectedFiles) {
         const formData = new FormData();
-        formData.append('file', file);
         formData.append('operatorChoice', operatorChoice);
         formData.append('scale', scale.toString());
         formData.append('infill', infill);
@@ -301,10 +303,18 @@ const Calculator = () => {
         if (purpose) formData.append('purpose', purpose);
         if (loads) formData.append('loads', loads);
 
-        const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/orders/upload`, {
-          method: 'POST',
-          body: formData
-        });
+        const send = (source) => {
+          const body = new FormData();
+          for (const [key, value] of formData.entries()) body.append(key, value);
+          body.append(...source);
+          return fetch(`${process.env.REACT_APP_BACKEND_URL}/api/orders/upload`, { method: 'POST', body });
+        };
+        // A file the viewer already uploaded is ordered by its token; upload it again only if the token expired
+        const uploaded = previewToken && previewToken.file === file;
+        let response = await send(uploaded ? ['meshToken', previewToken.meshToken] : ['file', file]);
+        if (uploaded && response.status === 404) {
+          response = await send(['file', file]);
+        }
 
         if (response.ok) {
           const data = await response.json();
@@ -410,7 +420,7 @@ const Calculator = () => {
                   <Loader2 className="animate-spin" size={32} color="var(--brand-primary)" />
                 </div>
               }>
-                <STLViewer file={selectedFiles[0]} scale={scale} onDimensionsChange={setDimensions} />
+                <STLViewer file={selectedFiles[0]} scale={scale} onDimensionsChange={setDimensions} onMeshToken={handleMeshToken} />
               </Suspense>
 
               {/* Scale Control */}
@@ -168,3 +168,74 @@ export const calculatorAPI = {
     }
   }
 };
+
+// Quotes API (analyze a model once, then re-price it by token)
+export const quotesAPI = {
+  analyze: async (file) => {
+    try {
+      const formData = new FormData();
+      formData.append('file', file);
+      const response = await axios.post(`${API}/quotes/analyze`, formData);
+      return response.data;
+    } catch (error) {
+      console.error('Error analyzing model:', error);
+      throw error;
+    }
+  },
+  
+  price: async (data) => {
+    try {
+      const response = await axios.post(`${API}/quotes/price`, data);
+      return response.data;
+    } catch (error) {
+      console.error('Error pricing model:', error);
+      throw error;
+    }
+  },
+  
+  // Store a model and build its preview; resolves with { meshToken } before the analysis finishes
+  upload: async (file) => {
+    try {
+      const formData = new FormData();
+      formData.append('file', file);
+      const response = await axios.post(`${API}/quotes/preview`, formData);
+      return response.data;
+    } catch (error) {
+      console.error('Error uploading model:', error);
+      throw error;
+    }
+  },
+  
+  // Columnar grid of prices for every material × infill × layer height × scale
+  matrix: async (meshToken, scales) => {
+    try {
+      const response = await axios.post(`${API}/quotes/matrix`, { meshToken, scales });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching price matrix:', error);
+      throw error;
+    }
+  },
+  
+  // Best print orientation (least support / print time that fits the build volume)
+  orient: async (data) => {
+    try {
+      const response = await axios.post(`${API}/quotes/orient`, data);
+      return response.data;
+    } catch (error) {
+      console.error('Error orienting model:', error);
+      throw error;
+    }
+  },
+  
+  // Decimated preview mesh (SPV1 binary, see utils/meshPreview.js)
+  preview: async (meshToken) => {
+    try {
+      const response = await axios.get(`${API}/mesh/${meshToken}/preview`, { responseType: 'arraybuffer' });
+      return response.data;
+    } catch (error) {
+      console.error('Error loading preview:', error);
+      throw error;
+    }
+  }
+};
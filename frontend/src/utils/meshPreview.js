@@ -0,0 +1,35 @@
+import * as THREE from 'three';
+
+const HEADER_BYTES = 32;
+const FLAG_UINT32_INDICES = 1;
+
+// Decode an SPV1 preview mesh into an indexed BufferGeometry (positions in mm)
+export const parsePreview = (buffer) => {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== 'SPV1') {
+    throw new Error('Unknown preview format');
+  }
+  const flags = view.getUint32(4, true);
+  const vertexCount = view.getUint32(8, true);
+  const triangleCount = view.getUint32(12, true);
+  const origin = [view.getFloat32(16, true), view.getFloat32(20, true), view.getFloat32(24, true)];
+  const step = view.getFloat32(28, true);
+
+  const quantized = new Int16Array(buffer, HEADER_BYTES, vertexCount * 3);
+  const positions = new Float32Array(vertexCount * 3);
+  for (let i = 0; i < positions.length; i++) {
+    positions[i] = origin[i % 3] + quantized[i] * step;
+  }
+
+  let offset = HEADER_BYTES + vertexCount * 6;
+  offset += (4 - (offset % 4)) % 4;
+  const IndexArray = flags & FLAG_UINT32_INDICES ? Uint32Array : Uint16Array;
+  const indices = new IndexArray(buffer, offset, triangleCount * 3);
+
+  const geometry = new THREE.BufferGeometry();
+  geometry.setAttribute('position', new THREE.BufferAttribute(positions, 3));
+  geometry.setIndex(new THREE.BufferAttribute(indices, 1));
+  geometry.computeVertexNormals();
+  return geometry;
+};
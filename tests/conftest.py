@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Backend modules import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """In-memory Mongo wired into every backend module"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from mongomock.collection import BulkOperationBuilder
+    import api_routes
+    from mesh_cache import MeshCache
+
+    # mongomock's bulk builder does not know pymongo's newer UpdateOne(sort=...) argument
+    add_update = BulkOperationBuilder.add_update
+    monkeypatch.setattr(BulkOperationBuilder, "add_update",
+                        lambda self, *args, sort=None, **kwargs: add_update(self, *args, **kwargs))
+    # No analysis cached in memory by an earlier test
+    monkeypatch.setattr(api_routes, "mesh_cache", MeshCache())
+    database = mongomock_motor.AsyncMongoMockClient()["test"]
+    api_routes.set_db(database)
+    return database
+
+
+@pytest.fixture
+def upload_dir(db, tmp_path, monkeypatch):
+    """Uploads, previews and thumbnails go to a temporary directory"""
+    import api_routes
+    import resumable_uploads
+
+    for name, path in (("UPLOAD_DIR", tmp_path), ("PREVIEW_DIR", tmp_path / "previews"),
+                       ("THUMBNAIL_DIR", tmp_path / "thumbnails")):
+        path.mkdir(exist_ok=True)
+        monkeypatch.setattr(api_routes, name, path)
+    resumable_uploads.set_db(db, tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def client(db, upload_dir):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import api_routes
+
+    app = FastAPI()
+    app.include_router(api_routes.router)
+    with TestClient(app) as test_client:
+        yield test_client
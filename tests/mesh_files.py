@@ -0,0 +1,108 @@
+"""Small meshes written in every upload format"""
+import gzip
+import struct
+import zipfile
+
+import numpy as np
+
+# Unit cube corners and its faces as outward (counter-clockwise) quads
+CUBE_CORNERS = np.array([
+    [0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+    [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1],
+], dtype=np.float64)
+CUBE_QUADS = [
+    [0, 3, 2, 1],  # bottom
+    [4, 5, 6, 7],  # top
+    [0, 1, 5, 4],
+    [1, 2, 6, 5],
+    [2, 3, 7, 6],
+    [3, 0, 4, 7],
+]
+
+
+def box(lo, hi) -> np.ndarray:
+    """Closed, outward-wound axis-aligned box between corners lo and hi as (12, 3, 3) triangles"""
+    lo = np.asarray(lo, dtype=np.float64)
+    corners = lo + CUBE_CORNERS * (np.asarray(hi, dtype=np.float64) - lo)
+    faces = [(q[0], q[i], q[i + 1]) for q in CUBE_QUADS for i in (1, 2)]
+    return corners[np.array(faces)]
+
+
+def cube(size: float = 10.0) -> np.ndarray:
+    """Closed, outward-wound cube of side `size` mm"""
+    return box((0, 0, 0), (size, size, size))
+
+
+def prism(profile, depth: float) -> np.ndarray:
+    """
+    Closed mesh of a counter-clockwise (x, z) profile extruded along y from 0 to depth.
+    The end caps are fan-triangulated, which is only exact in signed volume for
+    non-convex profiles; they are vertical and play no part in support estimation.
+    """
+    points = np.asarray(profile, dtype=np.float64)
+    near = np.column_stack([points[:, 0], np.zeros(len(points)), points[:, 1]])
+    far = near + [0, depth, 0]
+    tris = []
+    for i in range(len(points)):
+        j = (i + 1) % len(points)
+        tris += [(near[i], far[i], far[j]), (near[i], far[j], near[j])]
+    for i in range(1, len(points) - 1):
+        tris += [(near[0], near[i], near[i + 1]), (far[0], far[i + 1], far[i])]
+    return np.array(tris)
+
+
+def sphere(radius: float, rings: int, segments: int) -> np.ndarray:
+    """Closed, outward-wound UV sphere centred on the origin, 2 * rings * segments triangles"""
+    polar = np.linspace(0, np.pi, rings + 1)
+    azimuth = np.linspace(0, 2 * np.pi, segments + 1)
+    p, a = np.meshgrid(polar, azimuth, indexing='ij')
+    grid = radius * np.stack([np.sin(p) * np.cos(a), np.sin(p) * np.sin(a), np.cos(p)], axis=-1)
+    v00, v01, v10, v11 = grid[:-1, :-1], grid[:-1, 1:], grid[1:, :-1], grid[1:, 1:]
+    # Triangles at the poles collapse to segments, which keeps the mesh closed
+    tris = np.concatenate([np.stack([v00, v10, v11], axis=2), np.stack([v00, v11, v01], axis=2)])
+    return tris.reshape(-1, 3, 3)
+
+
+STL_RECORD = np.dtype([('normal', '<f4', 3), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+
+
+def stl_bytes(tris: np.ndarray) -> bytes:
+    records = np.zeros(len(tris), dtype=STL_RECORD)
+    records['vertices'] = tris
+    return b'\0' * 80 + struct.pack('<I', len(tris)) + records.tobytes()
+
+
+def ascii_stl_bytes(tris: np.ndarray) -> bytes:
+    lines = ["solid test"]
+    for t in tris:
+        lines += ["facet normal 0 0 0", "outer loop"]
+        lines += [f"vertex {x:.6f} {y:.6f} {z:.6f}" for x, y, z in t]
+        lines += ["endloop", "endfacet"]
+    lines.append("endsolid test")
+    return "\n".join(lines).encode()
+
+
+def write(path, data: bytes):
+    path.write_bytes(data)
+    return str(path)
+
+
+def write_gz(path, data: bytes):
+    with gzip.open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def write_3mf(path, vertices: np.ndarray, triangles, unit: str = 'millimeter'):
+    vertex_xml = ''.join(f'<vertex x="{x}" y="{y}" z="{z}"/>' for x, y, z in vertices)
+    triangle_xml = ''.join(f'<triangle v1="{a}" v2="{b}" v3="{c}"/>' for a, b, c in triangles)
+    model = (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<model unit="{unit}" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">'
+        f'<resources><object id="1" type="model"><mesh>'
+        f'<vertices>{vertex_xml}</vertices><triangles>{triangle_xml}</triangles>'
+        f'</mesh></object></resources><build><item objectid="1"/></build></model>'
+    )
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('3D/3dmodel.model', model)
+    return str(path)
@@ -0,0 +1,64 @@
+import asyncio
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import analysis_pool
+
+
+def sleep_job(file_path, seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def crash_job(file_path):
+    os._exit(1)
+
+
+@pytest.fixture
+def pool():
+    asyncio.run(analysis_pool.start(workers=2))
+    yield analysis_pool
+    asyncio.run(analysis_pool.shutdown())
+
+
+def worker_pids(count=8):
+    # Compressed and OBJ files always run in the pool
+    async def ping_all():
+        return await asyncio.gather(*[analysis_pool.run_analysis(sleep_job, "mesh.obj", 0.2) for _ in range(count)])
+    return set(asyncio.run(ping_all()))
+
+
+def test_small_stl_runs_inline(tmp_path):
+    path = tmp_path / "small.stl"
+    path.write_bytes(b"\0" * 84)
+    assert analysis_pool.runs_inline(str(path))
+    assert not analysis_pool.runs_inline(str(tmp_path / "small.stl.gz"))
+    assert not analysis_pool.runs_inline("mesh.obj")
+
+
+def test_timeout_stops_only_its_own_job(pool):
+    before = worker_pids()
+
+    async def both():
+        slow = analysis_pool.run_analysis(sleep_job, "slow.obj", 30, timeout=0.5)
+        fast = analysis_pool.run_analysis(sleep_job, "fast.obj", 1.0, timeout=5)
+        return await asyncio.gather(slow, fast, return_exceptions=True)
+
+    slow, fast = asyncio.run(both())
+    assert isinstance(slow, (asyncio.TimeoutError, TimeoutError))
+    assert fast in before
+    # The timed-out job stopped itself; the same warm workers serve the next jobs
+    time.sleep(0.5)
+    assert worker_pids() == before
+
+
+def test_broken_pool_is_replaced(pool):
+    before = worker_pids()
+    with pytest.raises(BrokenProcessPool):
+        asyncio.run(analysis_pool.run_analysis(crash_job, "mesh.obj"))
+    after = worker_pids()
+    assert len(after) == 2
+    assert not after & before
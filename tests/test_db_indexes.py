@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import sys
+import types
+
+import pytest
+from pymongo import ASCENDING
+
+import db_indexes
+from db_indexes import HOT_QUERIES, ensure_indexes, check_plans
+
+
+class PlannedCursor:
+    """find() cursor whose explain() is what the Mongo planner makes of the collection's indexes"""
+
+    def __init__(self, collection, query):
+        self.collection = collection
+        self.query = query
+        self.sort_keys = None
+
+    def sort(self, keys):
+        self.sort_keys = keys
+        return self
+
+    async def explain(self):
+        indexes = [index async for index in self.collection.list_indexes() if index['name'] != '_id_']
+
+        def filtered_prefix(index):
+            fields = 0
+            for field in index['key']:
+                if field not in self.query:
+                    break
+                fields += 1
+            return fields
+
+        # An index serves the filter through its leading fields, or an unfiltered
+        # sort on its first field unless it is partial
+        usable = [index for index in indexes if filtered_prefix(index)]
+        if not usable and self.sort_keys:
+            usable = [index for index in indexes if list(index['key'])[0] == self.sort_keys[0][0]
+                      and 'partialFilterExpression' not in index]
+        if usable:
+            best = max(usable, key=filtered_prefix)
+            plan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": best['name']}}
+        else:
+            plan = {"stage": "COLLSCAN"}
+            if self.sort_keys:
+                plan = {"stage": "SORT", "inputStage": plan}
+        if self.collection.name == "mesh_analysis":
+            # Slot-based engine explain output (MongoDB 7)
+            plan = {"queryPlan": plan, "slotBasedPlan": {}}
+        return {"queryPlanner": {"winningPlan": plan}}
+
+
+class PlannedCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def find(self, query):
+        return PlannedCursor(self.collection, query)
+
+
+class PlannedDb:
+    def __init__(self, db):
+        self.db = db
+
+    def __getitem__(self, name):
+        return PlannedCollection(self.db[name])
+
+
+class FakeClient:
+    def __init__(self, db):
+        self.db = db
+        self.closed = False
+
+    def __getitem__(self, name):
+        return PlannedDb(self.db)
+
+    def close(self):
+        self.closed = True
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_indexes_are_built_once(db):
+    report = run(ensure_indexes(db))
+    declared = sum(len(indexes) for indexes in db_indexes.INDEXES.values())
+    assert len(report["created"]) == declared
+    assert "mesh_analysis.fingerprint_lastUsed" in report["created"]
+    assert run(ensure_indexes(db)) == {"created": [], "dropped": [], "conflicts": {}, "extra": []}
+
+
+def test_drift_and_extra_indexes(db):
+    run(db.orders.create_index([("uploadDate", ASCENDING)], name="uploadDate"))
+    run(db.orders.create_index([("customerName", ASCENDING)], name="customerName"))
+    report = run(ensure_indexes(db))
+    assert list(report["conflicts"]) == ["orders.uploadDate"]
+    assert report["extra"] == ["orders.customerName"]
+    # Drifted indexes are left alone, undeclared ones dropped on request
+    assert run(ensure_indexes(db, drop_extra=True))["extra"] == ["orders.customerName"]
+    report = run(ensure_indexes(db))
+    assert report["extra"] == []
+    assert list(report["conflicts"]) == ["orders.uploadDate"]
+
+
+def test_superseded_fingerprint_index_is_dropped(db):
+    # Built by the mesh cache before the indexes were declared in db_indexes
+    run(db.mesh_analysis.create_index("stats.fingerprint.triangles", sparse=True))
+    report = run(ensure_indexes(db))
+    assert report["dropped"] == ["mesh_analysis.stats.fingerprint.triangles_1"]
+    assert report["extra"] == []
+    assert "mesh_analysis.fingerprint_lastUsed" in report["created"]
+
+
+def test_plan_stages_walk_every_plan_shape():
+    plan = {"stage": "SORT_MERGE", "inputStages": [
+        {"stage": "IXSCAN", "indexName": "a"},
+        {"queryPlan": {"stage": "FETCH", "inputStage": {"stage": "COLLSCAN"}}},
+    ]}
+    assert list(db_indexes._plan_stages(plan)) == [
+        ("SORT_MERGE", None), ("IXSCAN", "a"), (None, None), ("FETCH", None), ("COLLSCAN", None)]
+
+
+def test_every_hot_query_uses_a_declared_index(db):
+    run(ensure_indexes(db))
+    results = run(check_plans(PlannedDb(db)))
+    assert [description for description, _, _ in results] == [query[0] for query in HOT_QUERIES]
+    assert all(ok for _, ok, _ in results), results
+    used = {description: indexes for description, _, indexes in results}
+    assert used["completed orders count"] == ["customerEmail_status"]
+    assert used["print schedule queue"] == ["status_uploadDate"]
+    assert used["same-geometry candidates"] == ["fingerprint_lastUsed"]
+    assert used["cache eviction"] == ["lastUsed"]
+
+
+def test_missing_index_fails_the_check(db):
+    results = run(check_plans(PlannedDb(db)))
+    assert not any(ok for _, ok, _ in results)
+    assert all(indexes == [] for _, _, indexes in results)
+
+
+def check(db, monkeypatch, capsys):
+    client = FakeClient(db)
+    motor = types.ModuleType("motor")
+    motor.motor_asyncio = types.ModuleType("motor.motor_asyncio")
+    motor.motor_asyncio.AsyncIOMotorClient = lambda url: client
+    monkeypatch.setitem(sys.modules, "motor", motor)
+    monkeypatch.setitem(sys.modules, "motor.motor_asyncio", motor.motor_asyncio)
+    monkeypatch.setenv("MONGO_URL", "mongodb://localhost:27017")
+    monkeypatch.setenv("DB_NAME", "test")
+    status = run(db_indexes.main(argparse.Namespace(check=True, drop_extra=False)))
+    assert client.closed
+    return status, capsys.readouterr().out.splitlines()
+
+
+def test_check_command(db, monkeypatch, capsys):
+    status, lines = check(db, monkeypatch, capsys)
+    assert status == 0
+    assert "ok   print schedule queue: status_uploadDate" in lines
+    assert not [line for line in lines if line.startswith("SCAN")]
+
+
+def test_check_command_fails_on_collection_scan(db, monkeypatch, capsys):
+    indexes = dict(db_indexes.INDEXES)
+    indexes["orders"] = [index for index in indexes["orders"] if index[0] != "status_uploadDate"]
+    monkeypatch.setattr(db_indexes, "INDEXES", indexes)
+    status, lines = check(db, monkeypatch, capsys)
+    assert status == 1
+    assert "SCAN repricing queue: no index" in lines
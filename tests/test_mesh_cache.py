@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from mesh_cache import MeshCache, _entry_size
+
+
+def entry(triangles: int = 12, padding: int = 0) -> dict:
+    return {"stats": {"triangles": triangles, "fingerprint": {"triangles": triangles}, "pad": "x" * padding},
+            "fileUrl": "/uploads/part.stl"}
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def cache(db):
+    cache = MeshCache()
+    cache.set_db(db)
+    return cache
+
+
+async def age(db, digest: str, days: int):
+    await db.mesh_analysis.update_one({"_id": digest}, {"$set": {"lastUsed": datetime.utcnow() - timedelta(days=days)}})
+
+
+def test_entry_survives_the_process(db, cache):
+    run(cache.put("a" * 64, entry()))
+    assert run(cache.get("a" * 64)) == entry()
+
+    restarted = MeshCache()
+    restarted.set_db(db)
+    assert run(restarted.get("a" * 64)) == entry()
+    assert run(restarted.get("b" * 64)) is None
+    stored = run(db.mesh_analysis.find_one({"_id": "a" * 64}))
+    assert stored["size"] == _entry_size(entry())
+    assert "createdAt" in stored
+
+
+def test_memory_only_without_db():
+    cache = MeshCache()
+    run(cache.put("a" * 64, entry()))
+    assert run(cache.get("a" * 64)) == entry()
+    assert run(cache.get("b" * 64)) is None
+
+
+def test_memory_hit_refreshes_last_used_once(db, cache):
+    run(cache.put("a" * 64, entry()))
+    run(age(db, "a" * 64, 10))
+    cache.touched.clear()
+    run(cache.get("a" * 64))
+    refreshed = run(db.mesh_analysis.find_one({"_id": "a" * 64}))["lastUsed"]
+    assert refreshed > datetime.utcnow() - timedelta(minutes=1)
+
+    run(age(db, "a" * 64, 10))
+    run(cache.get("a" * 64))
+    # Within MESH_CACHE_TOUCH_SECONDS the memory hit does not write again
+    assert run(db.mesh_analysis.find_one({"_id": "a" * 64}))["lastUsed"] < refreshed
+
+
+def test_update_adds_fields_and_resizes(db, cache):
+    run(cache.put("a" * 64, entry()))
+    run(cache.update("a" * 64, {"previewUrl": "/previews/a.spv"}))
+    expected = {**entry(), "previewUrl": "/previews/a.spv"}
+    assert run(cache.get("a" * 64)) == expected
+    assert run(db.mesh_analysis.find_one({"_id": "a" * 64}))["size"] == _entry_size(expected)
+
+
+def test_least_recently_used_entries_are_evicted(db):
+    size = _entry_size(entry(padding=1000))
+    cache = MeshCache(store_bytes=int(size * 3.5))
+    cache.set_db(db)
+    for digest, days in [("a", 3), ("b", 2), ("c", 1)]:
+        run(cache.put(digest * 64, entry(padding=1000)))
+        run(age(db, digest * 64, days))
+    run(cache.put("d" * 64, entry(padding=1000)))
+
+    remaining = {doc["_id"][0] for doc in run(db.mesh_analysis.find({}).to_list(None))}
+    assert remaining == {"b", "c", "d"}
+    assert "a" * 64 not in cache.memory
+    assert cache.stored_bytes == 3 * size
+
+
+def test_fingerprint_candidates(db, cache):
+    for days, (digest, triangles) in enumerate([("a", 12), ("b", 12), ("c", 20)], start=1):
+        run(cache.put(digest * 64, entry(triangles)))
+        run(age(db, digest * 64, days))
+    candidates = run(cache.fingerprint_candidates(12))
+    assert [digest[0] for digest, _ in candidates] == ["a", "b"]
+    assert candidates[0][1] == entry(12)
+
+    memory_only = MeshCache()
+    run(memory_only.put("a" * 64, entry(12)))
+    run(memory_only.put("c" * 64, entry(20)))
+    assert [digest[0] for digest, _ in run(memory_only.fingerprint_candidates(20))] == ["c"]
@@ -0,0 +1,84 @@
+import numpy as np
+
+from mesh_analysis import analyze_mesh
+from mesh_integrity import check_integrity, describe_problems
+from tests.mesh_files import box, cube, stl_bytes, write
+
+
+def integrity(tmp_path, tris) -> dict:
+    path = write(tmp_path / "mesh.stl", stl_bytes(tris))
+    return check_integrity(path, analyze_mesh(path)['bbox'])
+
+
+def test_closed_cube(tmp_path):
+    result = integrity(tmp_path, cube())
+    assert result == {
+        "vertices": 8,
+        "edges": 18,
+        "boundaryEdges": 0,
+        "nonManifoldEdges": 0,
+        "flippedEdges": 0,
+        "degenerateTriangles": 0,
+        "watertight": True,
+        "consistentWinding": True,
+        "ok": True
+    }
+    assert describe_problems(result) == []
+
+
+def test_open_cube(tmp_path):
+    # Without the top face its four rim edges are open
+    result = integrity(tmp_path, cube()[[0, 1, 4, 5, 6, 7, 8, 9, 10, 11]])
+    assert result["boundaryEdges"] == 4
+    assert result["nonManifoldEdges"] == 0
+    assert not result["watertight"]
+    assert not result["ok"]
+    assert describe_problems(result)
+
+
+def test_missing_triangle(tmp_path):
+    result = integrity(tmp_path, cube()[1:])
+    assert result["boundaryEdges"] == 3
+    assert result["consistentWinding"]
+    assert not result["watertight"]
+
+
+def test_flipped_triangle(tmp_path):
+    tris = cube()
+    tris[0] = tris[0][[0, 2, 1]]
+    result = integrity(tmp_path, tris)
+    assert result["watertight"]
+    assert result["flippedEdges"] == 3
+    assert not result["consistentWinding"]
+
+
+def test_non_manifold_edge(tmp_path):
+    # A fin sharing one of the cube's bottom edges
+    fin = np.array([[[0, 0, 0], [10, 0, 0], [5, -5, 0]]], dtype=np.float64)
+    result = integrity(tmp_path, np.concatenate([cube(), fin]))
+    assert result["nonManifoldEdges"] == 1
+    assert not result["watertight"]
+
+
+def test_degenerate_triangles_are_counted_and_ignored(tmp_path):
+    sliver = np.array([[[0, 0, 0], [10, 0, 0], [5, 0, 0]]], dtype=np.float64)
+    result = integrity(tmp_path, np.concatenate([cube(), sliver]))
+    assert result["degenerateTriangles"] == 1
+    assert result["watertight"]
+
+
+def test_nearly_coincident_vertices_are_welded(tmp_path):
+    tris = cube()
+    tris[0, 0] += 1e-5
+    assert integrity(tmp_path, tris)["ok"]
+
+
+def test_parts_beyond_two_metres(tmp_path):
+    # 3 m rail with a block near its far end, 5 m off the origin: every vertex
+    # stays distinct instead of wrapping or clipping to the edge of the grid
+    rail = box((5000, 0, 0), (8000, 10, 10))
+    block = box((7200, 0, 20), (7300, 10, 30))
+    result = integrity(tmp_path, np.concatenate([rail, block]))
+    assert result["vertices"] == 16
+    assert result["degenerateTriangles"] == 0
+    assert result["ok"]
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from mesh_orientation import BUILD_VOLUME, hull_faces, orient_mesh, rotations_for
+from tests.mesh_files import CUBE_CORNERS, box, cube, prism, stl_bytes, write
+
+# Mushroom: a 10 x 2 cap on a 2 mm stem, standing on the stem
+MUSHROOM = [(4, 0), (6, 0), (6, 8), (10, 8), (10, 10), (0, 10), (0, 8), (4, 8)]
+
+
+def orient(tmp_path, tris, **kwargs) -> dict:
+    return orient_mesh(write(tmp_path / "mesh.stl", stl_bytes(tris)), **kwargs)
+
+
+def test_rotations_are_proper():
+    ups = np.array([[0, 0, 1], [0, 0, -1], [1, 0, 0], [1, 2, 3]], dtype=np.float64)
+    rotations = rotations_for(ups)
+    for rotation, up in zip(rotations, ups):
+        np.testing.assert_allclose(rotation @ rotation.T, np.eye(3), atol=1e-12)
+        assert np.linalg.det(rotation) == pytest.approx(1)
+        np.testing.assert_allclose(rotation[2], up / np.linalg.norm(up))
+
+
+def test_hull_faces_of_a_cube():
+    normals, areas = hull_faces(CUBE_CORNERS * 10)
+    assert len(normals) == 6
+    np.testing.assert_allclose(areas, 100)
+    assert sorted(map(tuple, np.rint(normals).astype(int))) == sorted(
+        [(1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)])
+
+
+def test_cube_keeps_its_orientation(tmp_path):
+    result = orient(tmp_path, cube())
+    assert result["rotation"] == np.eye(3).tolist()
+    assert result["best"] == result["original"]
+    assert result["best"]["fits"]
+    assert result["best"]["contactArea"] == pytest.approx(100)
+
+
+def test_mushroom_is_flipped_onto_its_cap(tmp_path):
+    result = orient(tmp_path, prism(MUSHROOM, 10))
+    assert result["original"]["supportVolume"] > 0
+    assert result["best"]["supportVolume"] == pytest.approx(0, abs=1e-3)
+    assert result["best"]["contactArea"] == pytest.approx(100)
+    np.testing.assert_allclose(result["up"], [0, 0, -1], atol=1e-6)
+    # The full analysis is redone in the chosen orientation
+    assert result["stats"]["support"]["supportArea"] == pytest.approx(0, abs=1e-3)
+    assert result["stats"]["layers"]["height"] == pytest.approx(10, abs=1e-3)
+
+
+def test_plate_wider_than_the_bed_is_stood_up(tmp_path):
+    width = BUILD_VOLUME[0] + 20
+    result = orient(tmp_path, box((0, 0, 0), (width, 20, 10)))
+    assert not result["original"]["fits"]
+    assert result["best"]["fits"]
+    assert result["best"]["height"] == pytest.approx(width, abs=1e-3)
+
+
+def test_scale_is_applied_to_the_fit(tmp_path):
+    result = orient(tmp_path, box((0, 0, 0), (20, 30, 200)), scale=2)
+    assert not result["original"]["fits"]
+    assert not result["best"]["fits"]
+    assert orient(tmp_path, box((0, 0, 0), (20, 30, 200)))["best"]["fits"]
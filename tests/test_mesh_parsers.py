@@ -0,0 +1,139 @@
+import io
+
+import numpy as np
+import pytest
+
+from mesh_analysis import analyze_mesh, iter_obj_blocks, iter_triangle_blocks, looks_like_ascii_stl
+from tests.mesh_files import (CUBE_CORNERS, CUBE_QUADS, ascii_stl_bytes, cube, stl_bytes, write,
+                              write_3mf, write_gz)
+
+
+def read_all(path, block_size=65536) -> np.ndarray:
+    blocks = list(iter_triangle_blocks(path, block_size))
+    return np.concatenate(blocks) if blocks else np.empty((0, 3, 3))
+
+
+def assert_cube(stats, size=10.0):
+    assert stats['triangles'] == 12
+    assert stats['volume_mm3'] == pytest.approx(size ** 3)
+    assert stats['area_mm2'] == pytest.approx(6 * size ** 2)
+    assert stats['dimensions'] == pytest.approx({'x': size, 'y': size, 'z': size})
+
+
+def cube_obj(size=10.0, newline='\n') -> bytes:
+    lines = [f"v {x * size} {y * size} {z * size}" for x, y, z in CUBE_CORNERS]
+    lines += ["f " + " ".join(str(i + 1) for i in quad) for quad in CUBE_QUADS]
+    return newline.join(lines).encode() + newline.encode()
+
+
+def test_binary_stl(tmp_path):
+    path = write(tmp_path / "cube.stl", stl_bytes(cube()))
+    assert_cube(analyze_mesh(path))
+    np.testing.assert_allclose(read_all(path), cube())
+
+
+def test_binary_stl_across_blocks(tmp_path):
+    path = write(tmp_path / "cube.stl", stl_bytes(cube()))
+    np.testing.assert_allclose(read_all(path, block_size=5), cube())
+
+
+def test_binary_stl_truncated(tmp_path):
+    data = b"binary export".ljust(80, b"\0") + stl_bytes(cube())[80:]
+    assert not looks_like_ascii_stl(data[:1024])
+    path = write(tmp_path / "cube.stl", data[:-20])
+    with pytest.raises(ValueError, match="STL file is truncated"):
+        analyze_mesh(path)
+
+
+def test_binary_stl_trailing_bytes(tmp_path):
+    path = write(tmp_path / "cube.stl", stl_bytes(cube()) + b"\0" * 20)
+    with pytest.raises(ValueError, match="STL file is longer than its declared triangle count"):
+        analyze_mesh(path)
+
+
+def test_binary_stl_with_solid_header(tmp_path):
+    # Some exporters start binary headers with "solid" too
+    path = write(tmp_path / "cube.stl", b"solid part".ljust(80, b" ") + stl_bytes(cube())[80:])
+    assert_cube(analyze_mesh(path))
+
+
+def test_ascii_stl(tmp_path):
+    path = write(tmp_path / "cube.stl", ascii_stl_bytes(cube()))
+    assert_cube(analyze_mesh(path))
+
+
+def test_binary_stl_with_solid_header(tmp_path):
+    # Some exporters start binary headers with "solid" too
+    data = b'solid exported' + stl_bytes(cube())[14:]
+    path = write(tmp_path / "cube.stl", data)
+    assert_cube(analyze_mesh(path))
+
+
+def test_gzip_stl(tmp_path):
+    path = write_gz(tmp_path / "cube.stl.gz", stl_bytes(cube()))
+    assert_cube(analyze_mesh(path))
+
+
+def test_gzip_ascii_stl(tmp_path):
+    path = write_gz(tmp_path / "cube.stl.gz", ascii_stl_bytes(cube()))
+    assert_cube(analyze_mesh(path))
+
+
+def test_obj_ngons_are_fan_triangulated(tmp_path):
+    path = write(tmp_path / "cube.obj", cube_obj())
+    assert_cube(analyze_mesh(path))
+
+
+def test_obj_pentagon(tmp_path):
+    data = b"v 0 0 0\nv 2 0 0\nv 3 1 0\nv 1 2 0\nv -1 1 0\nf 1 2 3 4 5\n"
+    tris = read_all(write(tmp_path / "pentagon.obj", data))
+    assert len(tris) == 3
+    # Fan from the first vertex
+    np.testing.assert_array_equal(tris[:, 0], np.zeros((3, 3)))
+
+
+def test_obj_negative_indices(tmp_path):
+    lines = []
+    for quad in CUBE_QUADS:
+        # Each face re-declares its corners and refers to them relative to the end
+        lines += [f"v {x * 10} {y * 10} {z * 10}" for x, y, z in CUBE_CORNERS[quad]]
+        lines.append("f -4 -3 -2 -1")
+    path = write(tmp_path / "cube.obj", "\n".join(lines).encode())
+    assert_cube(analyze_mesh(path))
+
+
+def test_obj_crlf_and_texture_normal_refs(tmp_path):
+    lines = [f"v {x * 10} {y * 10} {z * 10}" for x, y, z in CUBE_CORNERS]
+    lines += ["vt 0 0", "vn 0 0 1", "# comment", "o cube", "s off"]
+    lines += ["f " + " ".join(f"{i + 1}/1/1" for i in quad) for quad in CUBE_QUADS]
+    path = write(tmp_path / "cube.obj", "\r\n".join(lines).encode() + b"\r\n")
+    assert_cube(analyze_mesh(path))
+
+
+def test_obj_lines_split_across_reads():
+    tris = np.concatenate(list(iter_obj_blocks(io.BytesIO(cube_obj(newline='\r\n')), chunk_bytes=7)))
+    np.testing.assert_allclose(tris, cube())
+
+
+def test_obj_undefined_vertex(tmp_path):
+    path = write(tmp_path / "bad.obj", b"v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 4\n")
+    with pytest.raises(ValueError):
+        analyze_mesh(path)
+
+
+def test_3mf(tmp_path):
+    faces = [(q[0], q[i], q[i + 1]) for q in CUBE_QUADS for i in (1, 2)]
+    path = write_3mf(tmp_path / "cube.3mf", CUBE_CORNERS * 10, faces)
+    assert_cube(analyze_mesh(path))
+
+
+def test_3mf_units(tmp_path):
+    faces = [(q[0], q[i], q[i + 1]) for q in CUBE_QUADS for i in (1, 2)]
+    path = write_3mf(tmp_path / "cube.3mf", CUBE_CORNERS, faces, unit='centimeter')
+    assert_cube(analyze_mesh(path))
+
+
+def test_3mf_undefined_vertex(tmp_path):
+    path = write_3mf(tmp_path / "bad.3mf", CUBE_CORNERS, [(0, 1, 8)])
+    with pytest.raises(ValueError):
+        analyze_mesh(path)
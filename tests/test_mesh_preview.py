@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from mesh_analysis import analyze_mesh
+from mesh_preview import FLAG_UINT32_INDICES, PREVIEW_HEADER, PREVIEW_MAGIC, build_preview, write_preview
+from tests.mesh_files import cube, sphere, stl_bytes, write
+
+
+def decode(data: bytes):
+    """(vertices in mm (n, 3), triangles (m, 3), flags) of an SPV1 preview"""
+    magic, flags, vertex_count, triangle_count, *rest = PREVIEW_HEADER.unpack_from(data)
+    assert magic == PREVIEW_MAGIC
+    origin, step = np.array(rest[:3]), rest[3]
+    offset = PREVIEW_HEADER.size
+    vertices = np.frombuffer(data, '<i2', vertex_count * 3, offset).reshape(-1, 3)
+    offset += vertices.nbytes + (-vertices.nbytes % 4)
+    index_type = '<u4' if flags & FLAG_UINT32_INDICES else '<u2'
+    triangles = np.frombuffer(data, index_type, triangle_count * 3, offset).reshape(-1, 3)
+    assert offset + triangles.nbytes == len(data)
+    return origin + vertices * step, triangles, flags
+
+
+def test_small_mesh_is_kept_whole(tmp_path):
+    path = write(tmp_path / "cube.stl", stl_bytes(cube()))
+    vertices, triangles, flags = decode(build_preview(path, analyze_mesh(path)['bbox']))
+    assert flags == 0
+    assert len(vertices) == 8
+    assert len(triangles) == 12
+    np.testing.assert_allclose(vertices[triangles], cube(), atol=1e-3)
+
+
+def test_bbox_is_measured_when_missing(tmp_path):
+    path = write(tmp_path / "cube.stl", stl_bytes(cube()))
+    assert build_preview(path) == build_preview(path, analyze_mesh(path)['bbox'])
+
+
+def test_budget(tmp_path):
+    tris = sphere(20, 100, 200)
+    path = write(tmp_path / "sphere.stl", stl_bytes(tris))
+    vertices, triangles, _ = decode(build_preview(path, budget=2000))
+    # The grid is chosen on a sample estimate
+    assert 1000 < len(triangles) <= 2400
+    assert np.abs(np.linalg.norm(vertices, axis=1) - 20).max() < 2
+    assert triangles.max() < len(vertices)
+
+
+def test_wide_indices(tmp_path):
+    path = write(tmp_path / "sphere.stl", stl_bytes(sphere(20, 200, 400)))
+    vertices, triangles, flags = decode(build_preview(path, budget=200000))
+    assert flags & FLAG_UINT32_INDICES
+    assert len(vertices) > 0xFFFF
+    assert triangles.max() == len(vertices) - 1
+
+
+def test_write_preview(tmp_path):
+    path = write(tmp_path / "cube.stl", stl_bytes(cube()))
+    dest = tmp_path / "cube.spv"
+    size = write_preview(path, str(dest))
+    assert dest.stat().st_size == size
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
+
+
+def test_unreadable_mesh(tmp_path):
+    path = write(tmp_path / "empty.stl", b"solid x\nendsolid x\n")
+    with pytest.raises(ValueError):
+        write_preview(path, str(tmp_path / "empty.spv"))
+    assert not (tmp_path / "empty.spv").exists()
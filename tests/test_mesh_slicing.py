@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+import pytest
+
+from mesh_analysis import analyze_mesh
+from mesh_slicing import analyze_with_layers, layer_profile
+from tests.mesh_files import box, prism, sphere, stl_bytes, write
+
+
+def profile(tmp_path, tris, **kwargs) -> dict:
+    path = write(tmp_path / "mesh.stl", stl_bytes(tris))
+    return layer_profile(path, analyze_mesh(path)['bbox'], **kwargs)
+
+
+def planes(result) -> np.ndarray:
+    return result['z0'] + (np.arange(len(result['areas'])) + 0.5) * result['pitch']
+
+
+def test_wedge_cross_sections(tmp_path):
+    # Right-angled 10 x 10 triangle in (x, z), 4 mm deep: the section at z is (10 - z) x 4
+    result = profile(tmp_path, prism([(0, 0), (10, 0), (0, 10)], 4))
+    z = planes(result)
+    np.testing.assert_allclose(result['areas'], (10 - z) * 4, atol=1e-3)
+    np.testing.assert_allclose(result['perimeters'], 2 * (10 - z + 4), atol=1e-3)
+
+
+def test_hole_subtracts(tmp_path):
+    outer = box((0, 0, 0), (10, 10, 5))
+    # Inward-wound inner box: a 4 x 4 hole through the middle layers
+    inner = box((3, 3, 1), (7, 7, 4))[:, ::-1]
+    result = profile(tmp_path, np.concatenate([outer, inner]))
+    z = planes(result)
+    hollow = (z > 1) & (z < 4)
+    np.testing.assert_allclose(np.array(result['areas'])[hollow], 84, atol=1e-3)
+    np.testing.assert_allclose(np.array(result['areas'])[~hollow], 100, atol=1e-3)
+    np.testing.assert_allclose(np.array(result['perimeters'])[hollow], 56, atol=1e-3)
+
+
+def test_blocks_do_not_change_profile(tmp_path):
+    tris = sphere(10, 24, 48)
+    whole = profile(tmp_path, tris)
+    blocked = profile(tmp_path, tris, block_size=7)
+    np.testing.assert_allclose(blocked['areas'], whole['areas'])
+    np.testing.assert_allclose(blocked['perimeters'], whole['perimeters'])
+
+
+def test_million_triangle_sphere(tmp_path):
+    # Regression bound for the quote path: 1M triangles, 400 layers
+    path = write(tmp_path / "sphere.stl", stl_bytes(sphere(20, 500, 1000)))
+    bbox = analyze_mesh(path)['bbox']
+    started = time.perf_counter()
+    result = layer_profile(path, bbox)
+    elapsed = time.perf_counter() - started
+
+    z = planes(result)
+    np.testing.assert_allclose(result['areas'], np.pi * (400 - z ** 2), rtol=1e-3, atol=0.5)
+    assert elapsed < 1.0, f"layer_profile took {elapsed:.2f} s"
+
+
+def test_rotated_profile(tmp_path):
+    path = write(tmp_path / "mesh.stl", stl_bytes(prism([(0, 0), (10, 0), (0, 10)], 4)))
+    # New z axis is the old y axis: every section is the 10 x 10 triangle
+    rotated = analyze_with_layers(path, rotation=[[1, 0, 0], [0, 0, -1], [0, 1, 0]])['layers']
+    assert rotated['height'] == pytest.approx(4)
+    assert rotated['areas'] == pytest.approx([50] * 40, abs=1e-3)
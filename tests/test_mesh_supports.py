@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from mesh_analysis import analyze_mesh
+from tests.mesh_files import box, prism, stl_bytes, write
+
+# A "C" seen from the side: 5 mm base plate, 5 mm spine, arm whose underside is at z=20
+C_PROFILE = [(0, 0), (30, 0), (30, 5), (5, 5), (5, 20), (30, 20), (30, 25), (0, 25)]
+
+
+def support(tmp_path, tris, **kwargs) -> dict:
+    path = write(tmp_path / "mesh.stl", stl_bytes(tris))
+    stats = analyze_mesh(path, **kwargs)
+    assert stats['signed_volume_mm3'] > 0
+    return stats['support']
+
+
+def test_cube_on_bed_needs_no_support(tmp_path):
+    result = support(tmp_path, box((0.5, 0.5, 0), (9.5, 9.5, 10)))
+    assert result['overhangArea'] == 0
+    assert result['supportArea'] == 0
+    assert result['supportVolume'] == 0
+
+
+def test_c_shape_arm_stands_on_base_plate(tmp_path):
+    # Only the 25 x 10 arm underside overhangs, 15 mm above the base plate;
+    # the base plate bottom rests on the bed
+    result = support(tmp_path, prism(C_PROFILE, 10))
+    assert result['overhangArea'] == pytest.approx(250)
+    assert result['supportArea'] == pytest.approx(250)
+    assert result['supportVolume'] == pytest.approx(3750)
+
+
+def test_stacked_boxes(tmp_path):
+    # The floating box is supported from the top of the one below, not from the bed
+    lower = box((0.5, 0.5, 0), (19.5, 19.5, 10))
+    upper = box((0.5, 0.5, 20), (19.5, 19.5, 30))
+    result = support(tmp_path, np.concatenate([lower, upper]))
+    assert result['overhangArea'] == pytest.approx(361)
+    assert result['supportArea'] == pytest.approx(361)
+    assert result['supportVolume'] == pytest.approx(3610)
+
+
+def test_overlapping_footprints(tmp_path):
+    # The upper box's projected area is spread over its cells, half of which lie over the lower box
+    lower = box((0.5, 0.5, 0), (19.5, 19.5, 10))
+    upper = box((10.5, 0.5, 20), (29.5, 19.5, 30))
+    result = support(tmp_path, np.concatenate([lower, upper]))
+    assert result['supportArea'] == pytest.approx(361)
+    assert result['supportVolume'] == pytest.approx(361 / 2 * 10 + 361 / 2 * 20)
+
+
+def test_bed_found_in_a_later_block(tmp_path):
+    # The floating box comes first, so its underside is briefly the lowest point seen
+    lower = box((0.5, 0.5, 0), (19.5, 19.5, 10))
+    upper = box((0.5, 0.5, 20), (19.5, 19.5, 30))
+    result = support(tmp_path, np.concatenate([upper, lower]), block_size=4)
+    assert result['overhangArea'] == pytest.approx(361)
+    assert result['supportVolume'] == pytest.approx(3610)
+
+
+def test_inverted_winding(tmp_path):
+    path = write(tmp_path / "mesh.stl", stl_bytes(prism(C_PROFILE, 10)[:, ::-1]))
+    result = analyze_mesh(path)['support']
+    assert result['supportArea'] == pytest.approx(250)
+    assert result['supportVolume'] == pytest.approx(3750)
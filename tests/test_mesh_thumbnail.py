@@ -0,0 +1,69 @@
+import struct
+import zlib
+
+import numpy as np
+
+from mesh_analysis import analyze_mesh
+from mesh_thumbnail import BACKGROUND, THUMB_MARGIN, encode_png, render_thumbnail, write_thumbnail
+from tests.mesh_files import cube, sphere, stl_bytes, write
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    """(h, w, 3) pixels of an 8-bit RGB PNG with unfiltered rows"""
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    offset, chunks = 8, {}
+    while offset < len(data):
+        length, = struct.unpack_from('>I', data, offset)
+        kind = data[offset + 4:offset + 8]
+        body = data[offset + 8:offset + 8 + length]
+        crc, = struct.unpack_from('>I', data, offset + 8 + length)
+        assert crc == zlib.crc32(kind + body)
+        chunks[kind] = chunks.get(kind, b'') + body
+        offset += 12 + length
+    width, height, depth, color_type = struct.unpack_from('>IIBB', chunks[b'IHDR'])
+    assert (depth, color_type) == (8, 2)
+    rows = np.frombuffer(zlib.decompress(chunks[b'IDAT']), np.uint8).reshape(height, 1 + width * 3)
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(height, width, 3)
+
+
+def thumbnail(tmp_path, tris, **kwargs) -> np.ndarray:
+    path = write(tmp_path / "mesh.stl", stl_bytes(tris))
+    return decode_png(render_thumbnail(path, analyze_mesh(path)['bbox'], **kwargs))
+
+
+def test_png_round_trip():
+    image = np.random.default_rng(0).integers(0, 256, (7, 5, 3), dtype=np.uint8)
+    np.testing.assert_array_equal(decode_png(encode_png(image)), image)
+
+
+def test_model_fills_the_frame_inside_the_margin(tmp_path):
+    image = thumbnail(tmp_path, cube(), size=100)
+    model = (image != BACKGROUND).any(axis=2)
+    rows, columns = np.nonzero(model)
+    assert model.mean() > 0.3
+    assert rows.min() >= THUMB_MARGIN - 1 and rows.max() <= 100 - THUMB_MARGIN
+    assert columns.min() >= THUMB_MARGIN - 1 and columns.max() <= 100 - THUMB_MARGIN
+    # Centred, and the top, front and side faces are shaded differently
+    assert abs((rows.min() + rows.max()) / 2 - 49.5) <= 1
+    assert len(np.unique(image[model], axis=0)) >= 3
+
+
+def test_inverted_mesh_renders_the_same(tmp_path):
+    tris = sphere(10, 12, 24)
+    np.testing.assert_array_equal(thumbnail(tmp_path, tris[:, ::-1], size=64), thumbnail(tmp_path, tris, size=64))
+
+
+def test_blocks_do_not_change_the_image(tmp_path):
+    tris = sphere(10, 12, 24)
+    np.testing.assert_array_equal(thumbnail(tmp_path, tris, size=64, block_size=5),
+                                  thumbnail(tmp_path, tris, size=64))
+
+
+def test_write_thumbnail(tmp_path):
+    path = write(tmp_path / "cube.stl", stl_bytes(cube()))
+    dest = tmp_path / "cube.png"
+    size = write_thumbnail(path, str(dest), analyze_mesh(path)['bbox'], size=32)
+    assert dest.stat().st_size == size
+    assert decode_png(dest.read_bytes()).shape == (32, 32, 3)
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+import order_repricing
+from order_repricing import OrderRepricer, reprice_batch
+from pricing_snapshot import PricingSnapshot
+
+MATERIALS = [{"_id": "pla", "name": "PLA", "price": 290}, {"_id": "petg", "name": "PETG", "price": 350}]
+SETTINGS = {"electricityCost": 3.15, "printerPower": 300, "markup": 2, "laborCost": 10}
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def repricer(db):
+    repricer = OrderRepricer()
+    repricer.set_db(db)
+    return repricer
+
+
+def test_reprice_batch_matches_single_order_pricing():
+    snapshot = PricingSnapshot(MATERIALS, SETTINGS)
+    orders = [
+        {"materialId": "pla", "weight": 40.0, "printTime": 3.0},
+        {"materialId": "petg", "parts": [{"weight": 10.0, "printTime": 1.0}, {"weight": 20.0, "printTime": 2.0}]},
+        {"materialId": "missing", "weight": 40.0, "printTime": 3.0},
+        {"materialId": "pla", "parts": [{"weight": 10.0, "printTime": 1.0}, {"weight": None, "printTime": 2.0}]},
+    ]
+    single, multi, unknown, partial = reprice_batch(orders, snapshot)
+
+    assert single == (pytest.approx(snapshot.order_cost(40.0, 3.0, snapshot.material("pla"))), None)
+    petg = snapshot.material("petg")
+    parts = [snapshot.order_cost(10.0, 1.0, petg), snapshot.order_cost(20.0, 2.0, petg)]
+    assert multi[1] == pytest.approx(parts)
+    assert multi[0] == pytest.approx(sum(parts))
+    assert unknown == (None, None)
+    assert partial[1][1] is None
+    assert partial[0] == pytest.approx(partial[1][0])
+
+
+def test_run_updates_open_orders_and_audits_changes(db, repricer, monkeypatch):
+    monkeypatch.setattr(order_repricing, "BATCH_SIZE", 2)
+    monkeypatch.setattr(order_repricing, "PAUSE_SECONDS", 0)
+    old = PricingSnapshot(MATERIALS, SETTINGS)
+    new = PricingSnapshot([{**MATERIALS[0], "price": 400}, MATERIALS[1]], SETTINGS)
+    unchanged = old.order_cost(30.0, 2.0, old.material("petg"))
+    run(db.orders.insert_many([
+        {"_id": "pending", "status": "pending", "materialId": "pla", "weight": 40.0, "printTime": 3.0,
+         "estimatedCost": 1.0, "pricingVersion": old.version},
+        {"_id": "approved", "status": "approved", "materialId": "petg", "weight": 30.0, "printTime": 2.0,
+         "estimatedCost": unchanged, "pricingVersion": old.version},
+        {"_id": "parts", "status": "pending", "materialId": "pla", "estimatedCost": 1.0, "finalCost": 99.0,
+         "parts": [{"weight": 10.0, "printTime": 1.0}, {"weight": 5.0, "printTime": 0.5}]},
+        {"_id": "done", "status": "completed", "materialId": "pla", "weight": 40.0, "printTime": 3.0,
+         "estimatedCost": 1.0},
+        {"_id": "current", "status": "pending", "materialId": "pla", "weight": 40.0, "printTime": 3.0,
+         "estimatedCost": 1.0, "pricingVersion": new.version},
+    ]))
+
+    stats = run(repricer.run(new))
+    assert (stats["processed"], stats["changed"]) == (3, 2)
+    assert repricer.status == {"running": False, "lastRun": stats}
+
+    orders = {order["_id"]: order for order in run(db.orders.find({}).to_list(None))}
+    pla = new.material("pla")
+    assert orders["pending"]["estimatedCost"] == pytest.approx(new.order_cost(40.0, 3.0, pla))
+    assert orders["approved"]["estimatedCost"] == unchanged
+    assert "repricedAt" not in orders["approved"]
+    assert {orders[key]["pricingVersion"] for key in ("pending", "approved", "parts")} == {new.version}
+    part_costs = [new.order_cost(10.0, 1.0, pla), new.order_cost(5.0, 0.5, pla)]
+    assert [part["estimatedCost"] for part in orders["parts"]["parts"]] == pytest.approx(part_costs)
+    assert orders["parts"]["estimatedCost"] == pytest.approx(sum(part_costs))
+    # Operator prices and closed orders are left alone
+    assert orders["parts"]["finalCost"] == 99.0
+    assert orders["done"]["estimatedCost"] == 1.0 and "pricingVersion" not in orders["done"]
+    assert orders["current"]["estimatedCost"] == 1.0
+
+    audit = run(db.order_price_audit.find({}).to_list(None))
+    assert sorted(entry["orderId"] for entry in audit) == ["parts", "pending"]
+    assert all(entry["pricingVersion"] == new.version for entry in audit)
+    assert next(entry for entry in audit if entry["orderId"] == "pending")["oldPricingVersion"] == old.version
+
+    # A rerun with the same snapshot finds nothing left to do
+    assert run(repricer.run(new))["processed"] == 0
+
+
+def test_run_limited_to_materials(db, repricer):
+    snapshot = PricingSnapshot(MATERIALS, SETTINGS)
+    run(db.orders.insert_many([
+        {"_id": "pla", "status": "pending", "materialId": "pla", "weight": 40.0, "printTime": 3.0},
+        {"_id": "petg", "status": "pending", "materialId": "petg", "weight": 40.0, "printTime": 3.0},
+    ]))
+    assert run(repricer.run(snapshot, ["petg"]))["processed"] == 1
+    assert "estimatedCost" not in run(db.orders.find_one({"_id": "pla"}))
+    assert run(db.orders.find_one({"_id": "petg"}))["estimatedCost"] > 0
+
+
+def test_schedule_merges_changes_into_one_more_run(repricer, monkeypatch):
+    scopes = []
+
+    async def record(snapshot, material_ids=None):
+        scopes.append(material_ids)
+        await asyncio.sleep(0)
+
+    monkeypatch.setattr(repricer, "run", record)
+
+    async def scenario():
+        repricer.schedule(["pla"])
+        await asyncio.sleep(0)
+        # Arrive while the first run is in progress
+        repricer.schedule(["petg"])
+        repricer.schedule(["abs"])
+        await repricer.task
+        repricer.schedule(["pla"])
+        repricer.schedule()
+        await repricer.task
+
+    run(scenario())
+    assert scopes == [["pla"], ["abs", "petg"], None]
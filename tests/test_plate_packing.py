@@ -0,0 +1,78 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import pricing
+from plate_packing import BED_MARGIN_MM, BED_SIZE, PART_SPACING_MM, PLATE_SETUP_HOURS, plan_plates
+
+
+def part(order, width, depth, height=10.0, print_time=1.0, **group) -> dict:
+    return {"orderId": order, "fileName": f"{order}.stl", "width": width, "depth": depth, "height": height,
+            "printTime": print_time, "material": "pla", "color": "white", "layerHeight": "0.2", **group}
+
+
+# Positions and sizes are rounded to 0.1 mm
+ROUNDING = 0.2
+
+
+def placed_parts(plan) -> list:
+    return [p for group in plan["groups"] for plate in group["plates"] for p in plate["parts"]]
+
+
+def separated(a: dict, b: dict, axis: str, size: str) -> bool:
+    return (a[axis] + a[size] + PART_SPACING_MM <= b[axis] + ROUNDING
+            or b[axis] + b[size] + PART_SPACING_MM <= a[axis] + ROUNDING)
+
+
+def test_random_parts_do_not_overlap_or_leave_the_bed():
+    rng = np.random.default_rng(0)
+    parts = [part(f"o{i}", *map(float, rng.uniform(5, 120, 2))) for i in range(80)]
+    plan = plan_plates(parts)
+    assert plan["unplaceable"] == []
+    assert sorted(p["orderId"] for p in placed_parts(plan)) == sorted(p["orderId"] for p in parts)
+
+    for plate in plan["groups"][0]["plates"]:
+        for p in plate["parts"]:
+            assert p["x"] >= BED_MARGIN_MM and p["x"] + p["width"] <= BED_SIZE[0] - BED_MARGIN_MM + ROUNDING
+            assert p["y"] >= BED_MARGIN_MM and p["y"] + p["depth"] <= BED_SIZE[1] - BED_MARGIN_MM + ROUNDING
+        for a, b in itertools.combinations(plate["parts"], 2):
+            assert separated(a, b, "x", "width") or separated(a, b, "y", "depth"), (a, b)
+
+
+def test_groups_by_material_color_and_layer_height():
+    plan = plan_plates([part("a", 10, 10), part("b", 10, 10, material="petg"),
+                        part("c", 10, 10, color="black"), part("d", 10, 10, layerHeight="0.1"),
+                        part("e", 10, 10)])
+    keys = [(g["material"], g["color"], g["layerHeight"], g["plates"][0]["orders"]) for g in plan["groups"]]
+    assert sorted(keys) == [("petg", "white", "0.2", ["b"]), ("pla", "black", "0.2", ["c"]),
+                            ("pla", "white", "0.1", ["d"]), ("pla", "white", "0.2", ["a", "e"])]
+
+
+def test_parts_that_do_not_fit_the_printer():
+    plan = plan_plates([part("tall", 10, 10, height=400), part("wide", 10, 295), part("ok", 280, 280)])
+    assert plan["unplaceable"] == [{"orderId": "tall", "fileName": "tall.stl"},
+                                   {"orderId": "wide", "fileName": "wide.stl"}]
+    assert [p["orderId"] for p in placed_parts(plan)] == ["ok"]
+
+
+def test_long_part_is_turned_along_the_shelf():
+    p, = placed_parts(plan_plates([part("rail", 20, 250)]))
+    assert p["rotated"]
+    assert (p["width"], p["depth"]) == (250, 20)
+
+
+def test_overflow_opens_new_plates():
+    plates = plan_plates([part(f"o{i}", 140, 140) for i in range(5)])["groups"][0]["plates"]
+    # Four 145 mm cells fit the 295 mm usable bed
+    assert [len(plate["parts"]) for plate in plates] == [4, 1]
+
+
+def test_shared_plate_saves_setup_and_layer_changes():
+    plate, = plan_plates([part("a", 50, 50, height=10, print_time=2), part("b", 50, 50, height=20, print_time=3)]
+                         )["groups"][0]["plates"]
+    shared_layers = 10 / 0.2 * pricing.LAYER_CHANGE_SECONDS / 3600
+    assert plate["separatePrintTime"] == pytest.approx(5 + 2 * PLATE_SETUP_HOURS, abs=0.01)
+    assert plate["savedHours"] == pytest.approx(PLATE_SETUP_HOURS + shared_layers, abs=0.01)
+    assert plate["maxHeight"] == 20
+    assert plate["utilization"] == pytest.approx(5000 / (BED_SIZE[0] * BED_SIZE[1]), abs=1e-3)
@@ -0,0 +1,102 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import api_routes
+import pricing
+from api_routes import CalculateCostBatchRequest, CalculateCostRequest
+from pricing_snapshot import PricingSnapshot
+
+MATERIALS = [
+    {"_id": "pla", "name": "PLA", "price": 290, "density": 1.24},
+    {"_id": "petg", "name": "PETG", "price": 350, "density": 1.27},
+]
+SETTINGS = {"electricityCost": 3.15, "printerPower": 300, "markup": 2, "laborCost": 10}
+
+
+@pytest.fixture
+def snapshot(monkeypatch):
+    snapshot = PricingSnapshot(MATERIALS, SETTINGS)
+    monkeypatch.setattr(api_routes.pricing_store, "snapshot", snapshot)
+    return snapshot
+
+
+def test_version_depends_only_on_content():
+    reordered = [{key: m[key] for key in reversed(list(m))} for m in MATERIALS]
+    assert PricingSnapshot(MATERIALS, SETTINGS).version == PricingSnapshot(reordered, dict(SETTINGS)).version
+
+
+def test_version_changes_with_prices_and_settings():
+    base = PricingSnapshot(MATERIALS, SETTINGS).version
+    repriced = [{**MATERIALS[0], "price": 300}, MATERIALS[1]]
+    assert PricingSnapshot(repriced, SETTINGS).version != base
+    assert PricingSnapshot(MATERIALS, {**SETTINGS, "markup": 2.5}).version != base
+
+
+def test_missing_settings_use_defaults():
+    assert PricingSnapshot(MATERIALS, None).version == PricingSnapshot(MATERIALS, pricing.DEFAULT_SETTINGS).version
+    assert PricingSnapshot(MATERIALS, {"markup": 3}).settings["printerPower"] == pricing.DEFAULT_SETTINGS["printerPower"]
+
+
+def test_snapshot_is_read_only():
+    snapshot = PricingSnapshot(MATERIALS, SETTINGS)
+    with pytest.raises(TypeError):
+        snapshot.settings["markup"] = 10
+    with pytest.raises(TypeError):
+        snapshot.material("pla")["price"] = 1
+
+
+def test_material_prices():
+    prices = PricingSnapshot(MATERIALS, SETTINGS).material_prices(["petg", "missing", "pla"])
+    assert prices[0] == 350 and prices[2] == 290
+    assert np.isnan(prices[1])
+
+
+def test_quote_records_version(snapshot):
+    stats = {"volume_cm3": 10.0, "area_mm2": 1200.0, "dimensions": {"x": 20, "y": 20, "z": 25}}
+    quote = snapshot.quote(stats, snapshot.material("pla"))
+    assert quote["pricingVersion"] == snapshot.version
+
+
+def test_batch_matches_single(snapshot):
+    items = [CalculateCostRequest(materialId=material_id, weight=weight, printTime=hours)
+             for material_id, weight, hours in [("pla", 12.5, 1.2), ("petg", 250, 14.75), ("pla", 0, 0)]]
+    batch = asyncio.run(api_routes.calculate_cost_batch(CalculateCostBatchRequest(items=items)))
+    assert batch["pricingVersion"] == snapshot.version
+    for item, result in zip(items, batch["results"]):
+        single = asyncio.run(api_routes.calculate_cost(item)).model_dump()
+        assert single.pop("pricingVersion") == snapshot.version
+        single.pop("currency")
+        assert result == single
+
+
+def test_batch_item_errors(snapshot):
+    items = [CalculateCostRequest(materialId="missing", weight=10, printTime=1),
+             CalculateCostRequest(materialId="pla", weight=-1, printTime=1),
+             CalculateCostRequest(materialId="pla", weight=10, printTime=1)]
+    results = asyncio.run(api_routes.calculate_cost_batch(CalculateCostBatchRequest(items=items)))["results"]
+    assert results[0] == {"index": 0, "error": "Material not found"}
+    assert results[1] == {"index": 1, "error": "Weight and print time must be non-negative numbers"}
+    assert "totalCost" in results[2]
+
+
+def test_batch_malformed_items(snapshot):
+    items = [{"materialId": "pla", "weight": 10, "printTime": 1},
+             {"materialId": "pla", "weight": "heavy", "printTime": 1},
+             {"materialId": "pla"},
+             "pla"]
+    request = CalculateCostBatchRequest(items=items)
+    results = asyncio.run(api_routes.calculate_cost_batch(request))["results"]
+    assert "totalCost" in results[0]
+    assert [result["index"] for result in results[1:]] == [1, 2, 3]
+    assert "weight" in results[1]["error"]
+    assert "printTime" in results[2]["error"]
+
+
+def test_cost_breakdown_broadcasts():
+    weight = np.array([10.0, 20.0])
+    hours = np.array([1.0, 3.0])
+    together = pricing.cost_breakdown(weight, hours, 290, SETTINGS)["totalCost"]
+    apart = [pricing.cost_breakdown(w, h, 290, SETTINGS)["totalCost"] for w, h in zip(weight, hours)]
+    np.testing.assert_allclose(together, apart)
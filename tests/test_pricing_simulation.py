@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+import pricing_simulation
+from pricing_simulation import OrderColumns, simulate
+from pricing_snapshot import PricingSnapshot
+
+MATERIALS = [{"_id": "pla", "name": "PLA", "price": 290}, {"_id": "petg", "name": "PETG", "price": 350}]
+SETTINGS = {"electricityCost": 3.15, "printerPower": 300, "markup": 2, "laborCost": 10}
+ORDERS = [
+    {"materialId": "pla", "status": "completed", "weight": 40.0, "printTime": 3.0},
+    {"materialId": "petg", "status": "pending", "weight": 25.0, "printTime": 1.5},
+    {"materialId": "pla", "status": "pending", "weight": 10.0, "printTime": 0.5},
+    {"materialId": "retired", "status": "completed", "weight": 20.0, "printTime": 2.0},
+]
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def columns(db):
+    run(db.orders.insert_many([dict(order) for order in ORDERS] + [{"materialId": "pla", "weight": None}]))
+    columns = OrderColumns()
+    columns.set_db(db)
+    return run(columns.refresh())
+
+
+def cost(snapshot, order, **settings) -> float:
+    material = snapshot.material(order["materialId"])
+    candidate = PricingSnapshot(snapshot.materials, {**snapshot.settings, **settings})
+    return candidate.order_cost(order["weight"], order["printTime"], material)
+
+
+def test_refresh_loads_analyzed_orders(db, columns):
+    assert columns.weight.tolist() == [order["weight"] for order in ORDERS]
+    assert [columns.material_ids[code] for code in columns.material] == [order["materialId"] for order in ORDERS]
+    assert [columns.statuses[code] for code in columns.status] == [order["status"] for order in ORDERS]
+
+
+def test_refresh_appends_new_orders_and_reloads_when_due(db, columns, monkeypatch):
+    run(db.orders.insert_one({"materialId": "abs", "status": "pending", "weight": 5.0, "printTime": 0.2}))
+    # An edit to an already loaded order is only seen by the full reload
+    run(db.orders.update_many({"weight": 40.0}, {"$set": {"weight": 45.0}}))
+    run(columns.refresh())
+    assert columns.weight.tolist() == [40.0, 25.0, 10.0, 20.0, 5.0]
+    assert columns.material_ids[columns.material[-1]] == "abs"
+
+    monkeypatch.setattr(pricing_simulation, "FULL_RELOAD_SECONDS", -1)
+    run(columns.refresh())
+    assert columns.weight.tolist() == [45.0, 25.0, 10.0, 20.0, 5.0]
+
+
+def test_simulate_matches_order_pricing(columns):
+    snapshot = PricingSnapshot(MATERIALS, SETTINGS)
+    result = simulate(columns, snapshot, [{"markup": 2.5}, {"laborCost": 0, "printerPower": 200}])
+    assert result["orders"] == 4
+    assert result["pricingVersion"] == snapshot.version
+
+    baseline = sum(cost(snapshot, order) for order in ORDERS)
+    assert result["baseline"]["revenue"] == pytest.approx(baseline, abs=0.01)
+    assert result["baseline"]["settings"] == dict(snapshot.settings)
+    markup, cheaper = result["candidates"]
+    assert markup["settings"] == {**snapshot.settings, "markup": 2.5}
+    assert markup["revenue"] == pytest.approx(sum(cost(snapshot, order, markup=2.5) for order in ORDERS), abs=0.01)
+    assert markup["revenueDelta"] == pytest.approx(markup["revenue"] - baseline, abs=0.02)
+    assert markup["revenueDeltaPercent"] > 0
+    assert cheaper["revenueDelta"] < 0
+    assert cheaper["priceChangePercent"]["p90"] < 0
+
+
+def test_simulate_groups_by_material(columns):
+    snapshot = PricingSnapshot(MATERIALS, SETTINGS)
+    result = simulate(columns, snapshot, [{"markup": 3}])
+    by_material = {item["materialId"]: item for item in result["baseline"]["byMaterial"]}
+    assert set(by_material) == {"pla", "petg", None}
+    assert by_material["pla"]["name"] == "PLA"
+    assert by_material["pla"]["revenue"] == pytest.approx(cost(snapshot, ORDERS[0]) + cost(snapshot, ORDERS[2]),
+                                                          abs=0.01)
+    # Orders of a deleted material are priced at the default price
+    retired = {**ORDERS[3], "materialId": None}
+    assert by_material[None]["revenue"] == pytest.approx(cost(snapshot, retired), abs=0.01)
+    deltas = sum(item["revenueDelta"] for item in result["candidates"][0]["byMaterial"])
+    assert deltas == pytest.approx(result["candidates"][0]["revenueDelta"], abs=0.05)
+
+
+def test_simulate_filters_statuses(columns):
+    snapshot = PricingSnapshot(MATERIALS, SETTINGS)
+    result = simulate(columns, snapshot, [], statuses=["pending"])
+    assert result["orders"] == 2
+    assert result["candidates"] == []
+    assert result["baseline"]["revenue"] == pytest.approx(cost(snapshot, ORDERS[1]) + cost(snapshot, ORDERS[2]),
+                                                          abs=0.01)
+
+    empty = simulate(columns, snapshot, [{"markup": 3}], statuses=["cancelled"])
+    assert empty["orders"] == 0
+    assert empty["candidates"][0]["revenueDeltaPercent"] is None
+    assert empty["baseline"]["priceDistribution"]["p50"] == 0
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from print_scheduler import plan_schedule, scheduler, slot_changed, MATERIAL_SWAP_HOURS, JOB_SETUP_HOURS
+
+NOW = datetime(2026, 1, 1, 12, 0)
+
+
+def printer(printer_id, **fields):
+    return {"id": printer_id, "name": printer_id, "material": "PLA", "color": "white", **fields}
+
+
+def job(job_id, hours, material="PLA", color="white", **fields):
+    return {"id": job_id, "hours": hours, "material": material, "color": color, "size": None, **fields}
+
+
+def hours(moment):
+    return (moment - NOW).total_seconds() / 3600
+
+
+def test_longest_jobs_spread_over_printers():
+    plan = plan_schedule([printer("a"), printer("b")], [job("1", 1), job("2", 3), job("3", 2)], NOW)
+    slots = plan["slots"]
+    assert slots["2"]["printerId"] != slots["3"]["printerId"]
+    assert slots["1"]["printerId"] == slots["3"]["printerId"]
+    assert hours(plan["makespan"]) == pytest.approx(3 + 2 * JOB_SETUP_HOURS)
+
+
+def test_running_job_is_pinned_and_delays_its_printer():
+    running = job("run", 4, printerId="b", startedAt=NOW - timedelta(hours=1))
+    plan = plan_schedule([printer("a"), printer("b")], [running, job("next", 1)], NOW)
+    assert plan["slots"]["run"]["printerId"] == "b"
+    assert hours(plan["slots"]["run"]["finish"]) == pytest.approx(3)
+    assert plan["slots"]["next"]["printerId"] == "a"
+
+
+def test_same_filament_runs_back_to_back():
+    jobs = [job("1", 1, "PETG"), job("2", 1), job("3", 1, "PETG")]
+    plan = plan_schedule([printer("a")], jobs, NOW)
+    swaps = [slot["swap"] for slot in sorted(plan["slots"].values(), key=lambda slot: slot["start"])]
+    assert swaps == [False, True, False]
+    assert hours(plan["makespan"]) == pytest.approx(3 + 3 * JOB_SETUP_HOURS + MATERIAL_SWAP_HOURS)
+
+
+def test_job_larger_than_every_bed_is_unassigned():
+    small = printer("a", buildVolume={"x": 100, "y": 100, "z": 100})
+    plan = plan_schedule([small], [job("big", 1, size=[150, 50, 50])], NOW)
+    assert plan["unassigned"] == ["big"]
+
+
+def test_slot_changed_ignores_small_shifts():
+    slot = {"printerId": "a", "swap": False, "start": NOW, "finish": NOW + timedelta(hours=1)}
+    shifted = {**slot, "start": NOW + timedelta(minutes=2), "finish": slot["finish"] + timedelta(minutes=2)}
+    assert not slot_changed(slot, shifted)
+    assert slot_changed(slot, {**slot, "start": NOW + timedelta(minutes=30)})
+    assert slot_changed(slot, {**slot, "printerId": "b"})
+    assert slot_changed(None, slot)
+
+
+def add_order(db, status, **fields):
+    order = {"fileName": "part.stl", "status": status, "uploadDate": datetime.utcnow(), "printTime": 2.0, **fields}
+    return str(asyncio.run(db.orders.insert_one(order)).inserted_id)
+
+
+def test_confirmed_order_gets_an_eta_and_can_start(client, db):
+    printer_id = client.post("/api/printers", json={"name": "P1"}).json()["id"]
+    order_id = add_order(db, "price_changed")
+    response = client.post(f"/api/orders/{order_id}/confirm",
+                           json={"customerName": "Ana", "customerPhone": "+37300000000"})
+    assert response.status_code == 200
+
+    status = client.get(f"/api/orders/{order_id}/status").json()
+    assert status["status"] == "ordered"
+    assert status["eta"]["printer"] == "P1"
+
+    response = client.post(f"/api/orders/{order_id}/start", json={"printerId": printer_id})
+    assert response.status_code == 200
+    assert client.get(f"/api/orders/{order_id}/status").json()["status"] == "printing"
+
+
+def test_committed_statuses_are_queued(client, db):
+    client.post("/api/printers", json={"name": "P1"})
+    queued = [add_order(db, status) for status in ("approved", "price_changed", "ordered")]
+    pending = add_order(db, "pending")
+    asyncio.run(scheduler.replan())
+
+    schedule = client.get("/api/schedule").json()
+    planned = [job["orderId"] for queue in schedule["printers"] for job in queue["jobs"]]
+    assert sorted(planned) == sorted(queued)
+    assert client.get(f"/api/orders/{pending}/status").json()["eta"] is None
+
+
+def test_replan_moves_stale_slots_to_now(client, db):
+    client.post("/api/printers", json={"name": "P1"})
+    order_id = add_order(db, "approved")
+    asyncio.run(scheduler.replan())
+    # As if the slot had been planned a day ago and nothing happened since
+    slot = asyncio.run(db.orders.find_one({}))["schedule"]
+    stale = {f"schedule.{key}": slot[key] - timedelta(days=1) for key in ("start", "finish")}
+    asyncio.run(db.orders.update_one({}, {"$set": stale}))
+
+    asyncio.run(scheduler.replan())
+    start = datetime.fromisoformat(client.get(f"/api/orders/{order_id}/status").json()["eta"]["start"])
+    assert start >= datetime.utcnow() - timedelta(minutes=1)
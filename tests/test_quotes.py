@@ -0,0 +1,73 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.mesh_files import cube, stl_bytes
+
+STL = stl_bytes(cube())
+
+
+def analyze(client, data=STL, name="cube.stl"):
+    response = client.post("/api/quotes/analyze", files={"file": (name, data)})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_mesh_token_is_opaque(client):
+    quote = analyze(client)
+    assert quote["volume"] == pytest.approx(1.0)
+    assert hashlib.sha256(STL).hexdigest() not in quote["meshToken"]
+    # Every analysis hands out its own token
+    assert analyze(client)["meshToken"] != quote["meshToken"]
+
+
+def test_token_resolves_for_pricing_and_preview(client):
+    token = analyze(client)["meshToken"]
+    assert client.post("/api/quotes/price", json={"meshToken": token}).status_code == 200
+    preview = client.get(f"/api/mesh/{token}/preview")
+    assert preview.status_code == 200
+    assert preview.content[:4] == b"SPV1"
+
+
+def test_digest_is_not_a_token(client):
+    analyze(client)
+    digest = hashlib.sha256(STL).hexdigest()
+    assert client.get(f"/api/mesh/{digest}/preview").status_code == 404
+    assert client.post("/api/quotes/price", json={"meshToken": digest}).status_code == 404
+
+
+def test_expired_token(client, db):
+    token = analyze(client)["meshToken"]
+    asyncio.run(db.mesh_tokens.update_one({"_id": token}, {"$set": {"expiresAt": datetime.utcnow() - timedelta(seconds=1)}}))
+    assert client.post("/api/quotes/price", json={"meshToken": token}).status_code == 404
+
+
+def test_order_from_token_lists_thumbnail_by_order(client):
+    token = analyze(client)["meshToken"]
+    response = client.post("/api/orders/upload", data={"meshToken": token, "materialName": "PLA"})
+    assert response.status_code == 200, response.text
+    order_id = response.json()["orderId"]
+
+    [order] = client.get("/api/orders").json()
+    assert order["thumbnailUrl"] == f"/api/orders/{order_id}/thumbnail"
+    thumbnail = client.get(order["thumbnailUrl"])
+    assert thumbnail.status_code == 200
+    assert thumbnail.headers["content-type"] == "image/png"
+
+
+def test_preview_before_analysis(client):
+    response = client.post("/api/quotes/preview", files={"file": ("cube.stl", STL)})
+    assert response.status_code == 200, response.text
+    token = response.json()["meshToken"]
+    assert client.get(f"/api/mesh/{token}/preview").content[:4] == b"SPV1"
+    # Pricing waits for the background analysis
+    quote = client.post("/api/quotes/price", json={"meshToken": token}).json()
+    assert quote["totalCost"] > 0
+
+
+def test_preview_of_unreadable_file(client, upload_dir):
+    response = client.post("/api/quotes/preview", files={"file": ("broken.stl", b"solid x\nfacet normal 0 0 0\nendsolid x\n")})
+    assert response.status_code == 400
+    assert not list(upload_dir.glob("*broken.stl"))
@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+
+import pytest
+
+import resumable_uploads
+from upload_ingest import UploadRejected
+
+DATA = bytes(range(256)) * 4 + b"tail"
+CHUNK = 256
+
+
+@pytest.fixture
+def session(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(resumable_uploads, "MIN_CHUNK_BYTES", 16)
+    resumable_uploads.set_db(db, tmp_path)
+    return asyncio.run(resumable_uploads.create_session("part.stl", len(DATA), CHUNK))
+
+
+def chunk(index: int) -> bytes:
+    return DATA[index * CHUNK:(index + 1) * CHUNK]
+
+
+def put(session, index, data, checksum=None):
+    async def stream():
+        for start in range(0, len(data), 100):
+            yield data[start:start + 100]
+    checksum = checksum or hashlib.sha256(data).hexdigest()
+    asyncio.run(resumable_uploads.write_chunk(session, index, stream(), checksum))
+
+
+def stored(session) -> dict:
+    return asyncio.run(resumable_uploads.get_session(session["_id"]))
+
+
+def test_chunks_in_any_order(session):
+    for index in (4, 1, 3, 0, 2):
+        put(session, index, chunk(index))
+    assert resumable_uploads.missing_chunks(stored(session)) == []
+    assert resumable_uploads.part_path(session["_id"]).read_bytes() == DATA
+    assert not list(resumable_uploads.partial_dir.glob("*.chunk"))
+
+
+def test_missing_chunks_are_reported(session):
+    put(session, 3, chunk(3))
+    assert resumable_uploads.missing_chunks(stored(session)) == [0, 1, 2, 4]
+
+
+def test_bad_checksum_is_rejected_and_not_written(session):
+    with pytest.raises(UploadRejected, match="Checksum mismatch"):
+        put(session, 0, chunk(0), checksum="0" * 64)
+    assert stored(session)["received"] == []
+    assert resumable_uploads.part_path(session["_id"]).read_bytes() == bytes(len(DATA))
+
+
+def test_bad_retry_keeps_the_received_chunk(session):
+    put(session, 1, chunk(1))
+    corrupt = bytes(CHUNK)
+    with pytest.raises(UploadRejected, match="Checksum mismatch"):
+        put(session, 1, corrupt, checksum=hashlib.sha256(chunk(1)).hexdigest())
+    with pytest.raises(UploadRejected, match="must be"):
+        put(session, 1, chunk(1)[:-1])
+    assert stored(session)["received"] == [1]
+    assert resumable_uploads.part_path(session["_id"]).read_bytes()[CHUNK:2 * CHUNK] == chunk(1)
+    assert not list(resumable_uploads.partial_dir.glob("*.chunk"))
+
+
+def test_retry_of_a_good_chunk(session):
+    put(session, 4, chunk(4))
+    put(session, 4, chunk(4))
+    assert stored(session)["received"] == [4]
+
+
+def test_last_chunk_length(session):
+    with pytest.raises(UploadRejected, match="must be 4 bytes"):
+        put(session, 4, chunk(0))
+
+
+def test_index_out_of_range(session):
+    with pytest.raises(UploadRejected, match="out of range"):
+        put(session, 5, b"x")
+
+
+def test_no_chunks_while_finalizing(session):
+    claimed = asyncio.run(resumable_uploads.begin_finalize(session["_id"]))
+    assert asyncio.run(resumable_uploads.begin_finalize(session["_id"])) is None
+    with pytest.raises(UploadRejected) as error:
+        put(claimed, 0, chunk(0))
+    assert error.value.status_code == 409
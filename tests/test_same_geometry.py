@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+import analysis_pool
+import api_routes
+from tests.mesh_files import cube, stl_bytes
+
+
+@pytest.fixture
+def passes(monkeypatch):
+    """Names of the analysis jobs run"""
+    names = []
+    run_analysis = analysis_pool.run_analysis
+
+    async def recording(func, *args, **kwargs):
+        names.append(func.__name__)
+        return await run_analysis(func, *args, **kwargs)
+    monkeypatch.setattr(api_routes.analysis_pool, "run_analysis", recording)
+    return names
+
+
+def stats(upload_dir, name, tris):
+    path = upload_dir / name
+    path.write_bytes(stl_bytes(tris))
+    # The file name stands in for the digest the cache is keyed by
+    return asyncio.run(api_routes.get_mesh_stats(str(path), name, name))
+
+
+def test_new_model_is_read_once_per_pass(upload_dir, passes):
+    result = stats(upload_dir, "cube.stl", cube())
+    assert passes == ["analyze_mesh", "complete_analysis"]
+    assert result["layers"] and result["integrity"]["ok"]
+
+
+def test_moved_copy_reuses_the_analysis(upload_dir, passes):
+    original = stats(upload_dir, "cube.stl", cube())
+    passes.clear()
+    moved = stats(upload_dir, "moved.stl", cube()[::-1] + [5, 0, 0])
+    assert passes == ["analyze_mesh"]
+    assert moved["integrity"] == original["integrity"]
+    assert moved["bbox"]["min"] == pytest.approx([5, 0, 0])
+    entry = asyncio.run(api_routes.mesh_cache.get("moved.stl"))
+    assert entry["sameGeometryAs"] == "cube.stl"
+
+
+def test_cached_model_is_not_read_again(upload_dir, passes):
+    stats(upload_dir, "cube.stl", cube())
+    passes.clear()
+    stats(upload_dir, "cube.stl", cube())
+    assert passes == []
@@ -0,0 +1,91 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import api_routes
+from tests.mesh_files import ascii_stl_bytes, cube, stl_bytes, write
+from upload_ingest import (FORM_OVERHEAD_BYTES, MAX_ORDER_PARTS, MAX_UPLOAD_BYTES, UPLOAD_LIMITS,
+                           UploadRejected, UploadSizeLimitMiddleware, inspect_file)
+
+
+async def read_body(request):
+    return JSONResponse({"received": len(await request.body())})
+
+
+@pytest.fixture
+def limited():
+    app = Starlette(routes=[Route(path, read_body, methods=["POST"])
+                            for path in ("/single", "/parts", "/other")])
+    app.add_middleware(UploadSizeLimitMiddleware, limits={"/single": 100, "/parts": 500})
+    with TestClient(app) as client:
+        yield client
+
+
+def chunks(size: int, chunk: int = 50):
+    for start in range(0, size, chunk):
+        yield b"x" * min(chunk, size - start)
+
+
+def test_limit_per_route(limited):
+    assert limited.post("/single", content=b"x" * 100).json() == {"received": 100}
+    assert limited.post("/single", content=b"x" * 101).status_code == 413
+    # A multi-part order carries many files in one body
+    assert limited.post("/parts", content=b"x" * 400).json() == {"received": 400}
+    assert limited.post("/parts", content=b"x" * 501).status_code == 413
+    assert limited.post("/other", content=b"x" * 1000).json() == {"received": 1000}
+
+
+def test_limit_without_content_length(limited):
+    response = limited.post("/single", content=chunks(200))
+    assert response.status_code == 413
+    assert response.json() == {"detail": "File is too large"}
+    assert limited.post("/parts", content=chunks(200)).json() == {"received": 200}
+
+
+def test_order_parts_limit_scales_with_part_count():
+    assert UPLOAD_LIMITS["/api/orders/upload"] == MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES
+    assert UPLOAD_LIMITS["/api/orders/upload-parts"] == MAX_UPLOAD_BYTES * MAX_ORDER_PARTS + FORM_OVERHEAD_BYTES
+
+
+def test_upload_paths_are_unique(tmp_path, monkeypatch):
+    monkeypatch.setattr(api_routes, "UPLOAD_DIR", tmp_path)
+    paths = {api_routes.upload_path("part.stl") for _ in range(100)}
+    assert len(paths) == 100
+    assert all(path.name.endswith("_part.stl") and path.parent == tmp_path for path in paths)
+
+
+def test_inspect_binary_stl(tmp_path):
+    data = stl_bytes(cube())
+    result = inspect_file(write(tmp_path / "cube.stl", data), "cube.stl")
+    assert result["kind"] == "binary"
+    assert result["triangles"] == 12
+    assert result["size"] == len(data)
+
+
+def test_inspect_ascii_stl(tmp_path):
+    result = inspect_file(write(tmp_path / "cube.stl", ascii_stl_bytes(cube())), "cube.stl")
+    assert result["kind"] == "ascii"
+
+
+@pytest.mark.parametrize("data, message", [
+    (stl_bytes(cube())[:-10], "STL file is truncated"),
+    (stl_bytes(cube()) + b"\0", "STL file is longer than its declared triangle count"),
+    (stl_bytes(cube()[:0]), "STL file contains no triangles"),
+], ids=["truncated", "longer", "empty"])
+def test_inspect_rejects_malformed_stl(tmp_path, data, message):
+    with pytest.raises(UploadRejected, match=message):
+        inspect_file(write(tmp_path / "cube.stl", data), "cube.stl")
+
+
+def test_declared_size_over_limit(tmp_path):
+    path = write(tmp_path / "cube.stl", stl_bytes(cube()))
+    with pytest.raises(UploadRejected) as error:
+        inspect_file(path, "cube.stl", max_bytes=200)
+    assert error.value.status_code == 413
+
+
+def test_compressed_magic(tmp_path):
+    with pytest.raises(UploadRejected, match="does not match its extension"):
+        inspect_file(write(tmp_path / "cube.stl.gz", stl_bytes(cube())), "cube.stl.gz")